@@ -1,12 +1,9 @@
-import requests
-import json
+from metadatos_arcgis import cliente_arcgis
 
-url = "https://services5.arcgis.com/K90UQIB09TmTjUL8/arcgis/rest/services/R10/FeatureServer/3?f=json"
+url = "https://services5.arcgis.com/K90UQIB09TmTjUL8/arcgis/rest/services/R10/FeatureServer/3"
 
 try:
-    response = requests.get(url)
-    response.raise_for_status()
-    data = response.json()
+    data = cliente_arcgis().metadatos_capa(url)
     
     print("Analizando campos y dominios para:", data.get('name', 'Capa desconocida'))
     
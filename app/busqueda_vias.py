@@ -0,0 +1,327 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import pandas as pd
+
+try:
+    from tablas_vias import registro_tablas
+except ImportError:
+    from app.tablas_vias import registro_tablas
+
+# Similitud mínima para sumar puntos por parecido de nombre o código
+UMBRAL_SIMILITUD = 0.6
+
+# Registros que aporta como máximo cada tabla al resultado
+MAX_POR_TABLA = 5
+
+# Consultas que se puntúan juntas sobre una tabla (menos que las similitudes
+# que guarda cada IndiceSimilitud, para que candidatos y puntaje las compartan)
+TAMANO_LOTE = 128
+
+# Pool para puntuar las tablas en paralelo:
+#   VIAS_POOL=no (por defecto) | hilos | procesos
+#   VIAS_WORKERS=n (por defecto, un worker por núcleo; con 1 no hay pool)
+#   VIAS_TIMEOUT_TABLA=s (segundos que se espera la puntuación de una tabla)
+# Sin pool es lo más rápido medido (1 núcleo, VIAS_WORKERS=4: no 10.2 ms,
+# hilos 10.9 ms, procesos 20.2 ms por consulta): la puntuación difusa no
+# suelta el GIL y cada proceso carga su propia copia de tablas e índices.
+# Los procesos salen de un forkserver para no heredar locks tomados por otros
+# hilos del servidor.
+VIAS_POOL = os.environ.get("VIAS_POOL", "no").lower()
+VIAS_WORKERS = int(os.environ.get("VIAS_WORKERS", os.cpu_count() or 1))
+VIAS_TIMEOUT_TABLA = float(os.environ.get("VIAS_TIMEOUT_TABLA", "30"))
+
+_pool = None
+
+
+class PuntuacionLote:
+    """
+    Puntuación de las filas candidatas de una tabla para una o varias consultas.
+
+    Los campos de nombre, código y ubicación de la unión de los candidatos se
+    codifican una vez como (códigos, valores distintos), y cada prueba de texto
+    se hace sobre los valores distintos, no sobre las filas. Si una palabra
+    clave aparece en varias consultas del lote, su prueba "palabra dentro del
+    campo" se calcula una sola vez por valor. Los puntajes son los mismos (y
+    se suman en el mismo orden) que con la regla fila por fila.
+    """
+
+    def __init__(self, tabla, union):
+        self.tabla = tabla
+        self.union = union
+        # col -> (códigos por fila de la unión (-1 = vacío), valores distintos)
+        self.campos = {}
+        for col in (tabla.name_col, tabla.code_col, tabla.loc_col):
+            if col and col not in self.campos:
+                codigos, distintos = pd.factorize(tabla.valores_norm(col)[union])
+                self.campos[col] = (codigos, np.asarray(distintos, dtype=object))
+        # (col, palabra) -> por valor distinto: 1 contiene, 0 no, -1 sin calcular
+        self._contiene = {}
+
+    def _valores(self, col, posiciones):
+        """
+        Valores distintos del campo en las filas pedidas: (llenos, inversa,
+        códigos distintos, valores distintos). llenos marca las filas con valor
+        y valores_distintos[inversa] es el valor de cada fila llena.
+        """
+        codigos_todos, valores = self.campos[col]
+        codigos = codigos_todos[posiciones]
+        llenos = codigos >= 0
+        distintos, inversa = np.unique(codigos[llenos], return_inverse=True)
+        return llenos, inversa.reshape(-1), distintos, valores[distintos]
+
+    @staticmethod
+    def _por_fila(llenos, inversa, por_valor, tipo=bool):
+        """Extiende un resultado por valor distinto a todas las filas (0 en las vacías)."""
+        resultado = np.zeros(len(llenos), dtype=tipo)
+        resultado[llenos] = np.asarray(por_valor, dtype=tipo)[inversa]
+        return resultado
+
+    def _palabras_en(self, col, distintos, palabras_clave):
+        """Cuántas palabras clave aparecen dentro de cada valor distinto del campo."""
+        valores = self.campos[col][1]
+        total = np.zeros(len(distintos), dtype=np.int64)
+        for palabra in palabras_clave:
+            contiene = self._contiene.get((col, palabra))
+            if contiene is None:
+                contiene = self._contiene[(col, palabra)] = np.full(len(valores), -1, dtype=np.int8)
+            faltan = distintos[contiene[distintos] < 0]
+            if len(faltan):
+                contiene[faltan] = [palabra in v for v in valores[faltan]]
+            total += contiene[distintos]
+        return total
+
+    def puntuar(self, posiciones, palabras_clave, query_norm):
+        """Scores de las filas self.union[posiciones] para una consulta."""
+        tabla = self.tabla
+        scores = np.zeros(len(posiciones))
+        palabras = set(palabras_clave)
+        largo = len(query_norm) > 5
+
+        # 1. NOMBRE, CÓDIGO y OTROS IDENTIFICADORES (Prioridad Máxima)
+        # Se combinan nombre y código (ya normalizados al cargar); un campo vacío no suma.
+        for col in (tabla.name_col, tabla.code_col):
+            if not col:
+                continue
+            llenos, inversa, distintos, valores = self._valores(col, posiciones)
+
+            # Coincidencia EXACTA de código o nombre (Score muy alto)
+            exacta = self._por_fila(llenos, inversa, [v == query_norm for v in valores])
+            # Coincidencia EXACTA de una palabra clave con el target (Vital para IDs/Radicados)
+            palabra_exacta = self._por_fila(llenos, inversa, [v in palabras for v in valores])
+            # El target contiene el query (RADICADOS ASOCIADOS que pueden ser listas);
+            # solo si el query es largo (evitar matches con "1", "2")
+            contiene_query = self._por_fila(llenos, inversa, [query_norm in v for v in valores])
+            scores += np.select([exacta, palabra_exacta, contiene_query & largo], [200, 500, 150], 0)
+
+            # Similitud de secuencia de nombre/código (un campo vacío tiene similitud 0)
+            sims = tabla.similitudes(col, query_norm, UMBRAL_SIMILITUD)[self.union[posiciones]]
+            scores += np.where(sims > UMBRAL_SIMILITUD, sims * 100, 0)
+
+            # Coincidencia de subcadena general
+            contenido = self._por_fila(llenos, inversa, [v in query_norm for v in valores])
+            scores += np.where(contiene_query | contenido, 50, 0)
+
+            # Coincidencia de palabras clave
+            scores += self._por_fila(llenos, inversa, self._palabras_en(col, distintos, palabras_clave),
+                                     np.int64) * 10
+
+        # 2. UBICACIÓN (Prioridad Media)
+        if tabla.loc_col:
+            llenos, inversa, distintos, valores = self._valores(tabla.loc_col, posiciones)
+            subcadena = [query_norm in v or v in query_norm for v in valores]
+            scores += np.where(self._por_fila(llenos, inversa, subcadena), 30, 0)
+            scores += self._por_fila(llenos, inversa, self._palabras_en(tabla.loc_col, distintos, palabras_clave),
+                                     np.int64) * 5
+
+        # 3. PESO DE LA TABLA (prioridad según el catálogo)
+        return scores * tabla.peso_consulta(query_norm)
+
+
+def puntuar_tabla(tabla, palabras_clave, query_norm):
+    """
+    Calcula el score de las filas candidatas de una tabla.
+    Devuelve (posiciones de las filas candidatas, scores en el mismo orden).
+    """
+    # --- NUEVA LÓGICA DE PUNTUACIÓN BASADA EN SIMILITUD DE NOMBRE ---
+    # El usuario quiere exactitud en el nombre de la vía.
+    # Ignoramos columnas como INICIO, FIN, OBSERVACIONES para el cálculo del score.
+    # Solo se puntúan las filas candidatas (índice invertido + índice de similitud):
+    # las demás no comparten texto con la consulta ni pasan el umbral
+    # de similitud, así que quedarían con score 0.
+    candidatos = tabla.candidatos(palabras_clave, query_norm, UMBRAL_SIMILITUD)
+    if len(candidatos) == 0:
+        return candidatos, np.empty(0)
+    lote = PuntuacionLote(tabla, candidatos)
+    return candidatos, lote.puntuar(np.arange(len(candidatos)), palabras_clave, query_norm)
+
+
+def cota_tabla(tabla, palabras_clave, query_norm):
+    """
+    Cota superior del score que puede obtener una fila de la tabla en
+    puntuar_tabla, calculada con el índice y sin puntuar ninguna fila.
+    """
+    valores = tabla.indice.valores
+    if any(p in valores for p in palabras_clave):
+        mejor = 500
+    elif query_norm in valores:
+        mejor = 200
+    elif len(query_norm) > 5:
+        mejor = 150
+    else:
+        mejor = 0
+    # Por cada objetivo (nombre y código): coincidencia + similitud (<= 100) + subcadena + palabras
+    objetivos = sum(1 for col in (tabla.name_col, tabla.code_col) if col)
+    cota = objetivos * (mejor + 100 + 50 + 10 * len(palabras_clave))
+    if tabla.loc_col:
+        cota += 30 + 5 * len(palabras_clave)
+    return cota * tabla.peso_consulta(query_norm)
+
+
+def _mejores(candidatos, scores, umbral, maximo=MAX_POR_TABLA):
+    """Hasta `maximo` filas con score > umbral, de mayor a menor (empates en orden de fila)."""
+    mascara = scores > umbral
+    candidatos, scores = candidatos[mascara], scores[mascara]
+    orden = np.argsort(-scores, kind='stable')[:maximo]
+    return candidatos[orden], scores[orden]
+
+
+def mejores_de_tabla_lote(csv_file, consultas, umbrales, medir=False):
+    """
+    Puntúa una tabla para varias consultas [(palabras_clave, query_norm), ...]
+    y devuelve, por consulta, (posiciones, scores, medidas) de sus mejores filas
+    con score > su umbral, de a TAMANO_LOTE consultas. Con medir=True, medidas
+    es un dict con segundos (del lote), filas de la tabla y candidatos
+    puntuados; si no, None. Se ejecuta en el pool, por eso recibe el nombre del
+    archivo y no la tabla.
+    """
+    resultados = []
+    for i in range(0, len(consultas), TAMANO_LOTE):
+        resultados.extend(_mejores_de_lote(csv_file, consultas[i:i + TAMANO_LOTE], umbrales[i:i + TAMANO_LOTE],
+                                           medir))
+    return resultados
+
+
+def _mejores_de_lote(csv_file, consultas, umbrales, medir):
+    """
+    Mejores filas de una tabla para un lote de consultas. Los candidatos de
+    todas se juntan en una sola PuntuacionLote, así cada campo se prueba una
+    vez por valor.
+    """
+    inicio = time.perf_counter() if medir else 0.0
+    vacio = (np.empty(0, dtype=np.int32), np.empty(0))
+    tabla = registro_tablas.obtener_tabla(csv_file)
+
+    candidatos = []
+    for (palabras_clave, query_norm), umbral in zip(consultas, umbrales):
+        # Si ni la mejor fila posible de la tabla supera el umbral, no se puntúa
+        if tabla is None or cota_tabla(tabla, palabras_clave, query_norm) <= umbral:
+            candidatos.append(vacio[0])
+        else:
+            candidatos.append(tabla.candidatos(palabras_clave, query_norm, UMBRAL_SIMILITUD))
+
+    con_filas = [c for c in candidatos if len(c)]
+    union = np.unique(np.concatenate(con_filas)) if con_filas else vacio[0]
+    lote = PuntuacionLote(tabla, union) if len(union) else None
+
+    resultados = []
+    for (palabras_clave, query_norm), umbral, filas in zip(consultas, umbrales, candidatos):
+        if len(filas) == 0:
+            mejores = vacio
+        else:
+            scores = lote.puntuar(np.searchsorted(union, filas), palabras_clave, query_norm)
+            mejores = _mejores(filas, scores, umbral, tabla.maximo or MAX_POR_TABLA)
+        medidas = None
+        if medir:
+            medidas = {'segundos': time.perf_counter() - inicio,
+                       'filas': len(tabla.df) if tabla is not None else 0,
+                       'candidatos': len(filas)}
+        resultados.append(mejores + (medidas,))
+    return resultados
+
+
+def mejores_de_tabla(csv_file, palabras_clave, query_norm, umbral, medir=False):
+    """Mejores filas de una tabla para una consulta: (posiciones, scores, medidas)."""
+    return mejores_de_tabla_lote(csv_file, [(palabras_clave, query_norm)], [umbral], medir)[0]
+
+
+def obtener_pool():
+    """Pool de búsqueda del proceso (None si la búsqueda es secuencial)."""
+    global _pool
+    if _pool is None and VIAS_POOL != "no" and VIAS_WORKERS > 1:
+        if VIAS_POOL == "procesos":
+            metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=VIAS_WORKERS, mp_context=multiprocessing.get_context(metodo))
+        else:
+            _pool = ThreadPoolExecutor(max_workers=VIAS_WORKERS, thread_name_prefix="busqueda_vias")
+    return _pool
+
+
+def cerrar_pool():
+    """Cierra el pool del proceso esperando a sus workers; la próxima búsqueda crea otro si hace falta."""
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def descartar_pool(pool):
+    """Saca de servicio un pool roto; la próxima búsqueda crea uno nuevo."""
+    global _pool
+    if _pool is pool:
+        _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def puntuar_archivos_lote(archivos, consultas, umbrales, medir=False):
+    """
+    Genera (archivo, [(posiciones, scores, medidas) por consulta]) con las
+    mejores filas de cada archivo para cada consulta [(palabras_clave,
+    query_norm), ...], en el orden de `archivos` para que los empates se
+    resuelvan igual que en una búsqueda secuencial. `umbrales[i]()` es el score
+    a superar por la consulta i: sin pool se consulta antes de cada tabla (así
+    sube a medida que se llena el top); con pool, una vez al repartir las
+    tablas. Un error en una tabla se informa y esa tabla se omite; una tabla
+    que tarda más de VIAS_TIMEOUT_TABLA también. Si el pool de procesos se rompe
+    (p. ej. un worker muerto por falta de memoria) se descarta y las tablas
+    que faltan se puntúan sin pool.
+    """
+    pool = obtener_pool() if len(archivos) > 1 else None
+    if pool is not None:
+        minimos = [max(0, umbral()) for umbral in umbrales]
+        try:
+            tareas = [pool.submit(mejores_de_tabla_lote, archivo, consultas, minimos, medir)
+                      for archivo in archivos]
+        except BrokenProcessPool as e:
+            print(f"Pool de búsqueda roto ({e}); se sigue sin pool")
+            descartar_pool(pool)
+            pool = None
+
+    for i, archivo in enumerate(archivos):
+        try:
+            if pool is not None:
+                try:
+                    resultados = tareas[i].result(timeout=VIAS_TIMEOUT_TABLA)
+                except BrokenProcessPool as e:
+                    print(f"Pool de búsqueda roto ({e}); se sigue sin pool")
+                    descartar_pool(pool)
+                    pool = None
+            if pool is None:
+                resultados = mejores_de_tabla_lote(archivo, consultas, [max(0, umbral()) for umbral in umbrales],
+                                                   medir)
+        except TimeoutError:
+            print(f"Error leyendo {archivo}: la puntuación tardó más de {VIAS_TIMEOUT_TABLA:g} s")
+            continue
+        except Exception as e:
+            print(f"Error leyendo {archivo}: {e}")
+            continue
+        yield archivo, resultados
+
+
+def puntuar_archivos(archivos, palabras_clave, query_norm, umbral=lambda: 0, medir=False):
+    """Como puntuar_archivos_lote para una sola consulta: genera (archivo, (posiciones, scores, medidas))."""
+    for archivo, resultados in puntuar_archivos_lote(archivos, [(palabras_clave, query_norm)], [umbral], medir):
+        yield archivo, resultados[0]
@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Límites por defecto de las cachés de respuestas
+VIAS_CACHE_CONSULTAS = int(os.environ.get("VIAS_CACHE_CONSULTAS", 512))
+VIAS_CACHE_TTL = float(os.environ.get("VIAS_CACHE_TTL", 900))
+
+# Marca de "no hay respuesta guardada" (None o "" son respuestas válidas)
+FALTA = object()
+
+
+class CacheResultados:
+    """
+    Caché LRU con vencimiento (TTL) para las respuestas de las búsquedas.
+
+    La clave es la consulta ya normalizada más la versión de los datos de los
+    que depende la respuesta (firmas de los archivos). Cuando la versión
+    cambia se vacía la caché, así que nunca se entrega una respuesta calculada
+    con archivos viejos. Es segura entre hilos y lleva contadores de
+    aciertos y fallos.
+    """
+
+    def __init__(self, max_entradas=VIAS_CACHE_CONSULTAS, ttl=VIAS_CACHE_TTL, reloj=time.monotonic):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._reloj = reloj
+        self._entradas = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.vencidos = 0
+
+    def consultar(self, clave, version):
+        """Respuesta guardada y vigente para (clave, version), o FALTA."""
+        ahora = self._reloj()
+        with self._lock:
+            if version != self._version:
+                self._entradas.clear()
+                self._version = version
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                if ahora - entrada[0] <= self.ttl:
+                    self._entradas.move_to_end(clave)
+                    self.aciertos += 1
+                    return entrada[1]
+                del self._entradas[clave]
+                self.vencidos += 1
+            self.fallos += 1
+            return FALTA
+
+    def guardar(self, clave, version, resultado):
+        """Guarda una respuesta (se descarta si la versión cambió mientras se calculaba)."""
+        with self._lock:
+            if version == self._version and self.max_entradas > 0:
+                self._entradas[clave] = (self._reloj(), resultado)
+                self._entradas.move_to_end(clave)
+                while len(self._entradas) > self.max_entradas:
+                    self._entradas.popitem(last=False)
+
+    def obtener(self, clave, version, calcular):
+        """
+        Respuesta guardada para (clave, version) o, si no hay, calcular() guardada.
+        Si calcular() lanza una excepción no se guarda nada y la excepción sigue.
+        """
+        resultado = self.consultar(clave, version)
+        if resultado is FALTA:
+            # Se calcula fuera del lock para no frenar otras consultas
+            resultado = calcular()
+            self.guardar(clave, version, resultado)
+        return resultado
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def estadisticas(self):
+        """Contadores de uso: aciertos, fallos, vencidos, entradas y tasa de aciertos."""
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'vencidos': self.vencidos,
+                'entradas': len(self._entradas),
+                'tasa_aciertos': self.aciertos / consultas if consultas else 0.0,
+            }
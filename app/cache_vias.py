@@ -0,0 +1,290 @@
+import json
+import os
+from collections.abc import Mapping
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (solo para saber si se puede usar Feather)
+    HAY_FEATHER = True
+except ImportError:
+    HAY_FEATHER = False
+
+# Versión del formato; subirla invalida todas las cachés existentes
+FORMATO_CACHE = 1
+
+# Carpeta de la caché (por defecto, .cache dentro de la carpeta de los CSV)
+VIAS_CACHE = os.environ.get("VIAS_CACHE")
+
+
+def carpeta_cache(carpeta_csv):
+    return VIAS_CACHE or os.path.join(carpeta_csv, ".cache")
+
+
+def _tabla_cadenas(cadenas):
+    """Tabla de cadenas: todas en un solo bloque UTF-8 más sus posiciones de corte."""
+    codificadas = [c.encode('utf-8') for c in cadenas]
+    cortes = np.zeros(len(codificadas) + 1, dtype=np.int64)
+    cortes[1:] = np.cumsum([len(c) for c in codificadas])
+    return np.frombuffer(b''.join(codificadas), dtype=np.uint8), cortes
+
+
+def _leer_tabla_cadenas(bloque, cortes):
+    texto = bloque.tobytes().decode('utf-8')
+    # Los cortes están en bytes; cada byte de continuación UTF-8 (10xxxxxx) no es un carácter nuevo
+    continuacion = np.zeros(len(bloque) + 1, dtype=np.int64)
+    np.cumsum((bloque & 0xC0) == 0x80, out=continuacion[1:])
+    cortes = (cortes - continuacion[cortes]).tolist()
+    return np.array([texto[cortes[i]:cortes[i + 1]] for i in range(len(cortes) - 1)], dtype=object)
+
+
+def _codificar_texto(serie):
+    """Codifica una columna de texto como diccionario: (códigos int32, categorías). -1 = vacío."""
+    valores = serie.to_numpy(dtype=object)
+    vacios = pd.isna(valores)
+    if not all(isinstance(v, str) for v in valores[~vacios]):
+        raise TypeError(f"La columna {serie.name!r} mezcla texto con otros tipos")
+    codigos, categorias = pd.factorize(valores[~vacios])
+    todos = np.full(len(valores), -1, dtype=np.int32)
+    todos[~vacios] = codigos
+    return todos, list(categorias)
+
+
+def _decodificar_texto(codigos, categorias, dtype):
+    valores = np.empty(len(codigos), dtype=object)
+    valores[:] = np.nan
+    llenos = codigos >= 0
+    valores[llenos] = categorias[codigos[llenos]]
+    serie = pd.Series(valores, dtype=object)
+    return serie if dtype == 'object' else serie.astype(dtype)
+
+
+def guardar_npz(df, ruta):
+    """
+    Guarda un DataFrame en un .npz sin pickle: numéricos y fechas tal cual,
+    enteros con vacíos como valores + máscara, y texto y categorías como
+    diccionario (códigos + tabla de cadenas UTF-8). Devuelve la lista de columnas
+    [(nombre, dtype)] para el manifiesto.
+    """
+    arreglos = {}
+    columnas = []
+    for i, col in enumerate(df.columns):
+        serie = df[col]
+        dtype = str(serie.dtype)
+        categorica = isinstance(serie.dtype, pd.CategoricalDtype)
+        if categorica or serie.dtype == object or pd.api.types.is_string_dtype(serie.dtype):
+            if categorica:
+                codigos, categorias = serie.cat.codes.to_numpy(dtype=np.int32), [str(c) for c in serie.cat.categories]
+            else:
+                codigos, categorias = _codificar_texto(serie)
+            arreglos[f"c{i}_codigos"] = codigos
+            arreglos[f"c{i}_cadenas"], arreglos[f"c{i}_cortes"] = _tabla_cadenas(categorias)
+        elif isinstance(serie.dtype, pd.api.extensions.ExtensionDtype) and not isinstance(serie.dtype, pd.DatetimeTZDtype):
+            # Enteros con vacíos (Int64, Int8, ...)
+            arreglos[f"c{i}_valores"] = serie.to_numpy(dtype=serie.dtype.numpy_dtype, na_value=0)
+            arreglos[f"c{i}_mascara"] = serie.isna().to_numpy()
+        else:
+            arreglos[f"c{i}_valores"] = serie.to_numpy()
+        columnas.append((col, dtype))
+    np.savez(ruta, **arreglos)
+    return columnas
+
+
+def leer_npz(ruta, columnas):
+    datos = {}
+    with np.load(ruta, allow_pickle=False) as npz:
+        for i, (col, dtype) in enumerate(columnas):
+            if f"c{i}_codigos" in npz:
+                categorias = _leer_tabla_cadenas(npz[f"c{i}_cadenas"], npz[f"c{i}_cortes"])
+                if dtype == 'category':
+                    datos[col] = pd.Categorical.from_codes(npz[f"c{i}_codigos"], categorias)
+                else:
+                    datos[col] = _decodificar_texto(npz[f"c{i}_codigos"], categorias, dtype)
+            elif f"c{i}_mascara" in npz:
+                datos[col] = pd.array(npz[f"c{i}_valores"], dtype=dtype)
+                datos[col][npz[f"c{i}_mascara"]] = pd.NA
+            else:
+                datos[col] = npz[f"c{i}_valores"]
+    return pd.DataFrame(datos, columns=[col for col, _ in columnas])
+
+
+class MapaFilas(Mapping):
+    """Diccionario cadena -> filas leído de la caché: las filas se cortan recién al pedirlas."""
+
+    def __init__(self, claves, filas, cortes):
+        self._posiciones = {clave: j for j, clave in enumerate(claves)}
+        self._filas = filas
+        self._cortes = cortes
+
+    def __getitem__(self, clave):
+        j = self._posiciones[clave]
+        return self._filas[self._cortes[j]:self._cortes[j + 1]]
+
+    def __contains__(self, clave):
+        return clave in self._posiciones
+
+    def get(self, clave, defecto=None):
+        # Sin pasar por __getitem__ y KeyError (Mapping.get) en cada clave que falta
+        j = self._posiciones.get(clave)
+        return defecto if j is None else self._filas[self._cortes[j]:self._cortes[j + 1]]
+
+    def __iter__(self):
+        return iter(self._posiciones)
+
+    def __len__(self):
+        return len(self._posiciones)
+
+
+def guardar_estados(estados, ruta):
+    """
+    Guarda los estados de los índices de una tabla ({índice: {campo: valor}})
+    en un .npz sin pickle. Cada valor es un arreglo, una lista de cadenas (como
+    tabla de cadenas) o un diccionario cadena -> filas (claves como tabla de
+    cadenas y las filas de todas concatenadas, con sus cortes). Devuelve la
+    lista [(índice, campo, tipo)] para el manifiesto.
+    """
+    arreglos = {}
+    campos = []
+    for indice, estado in estados.items():
+        for campo, valor in estado.items():
+            i = len(campos)
+            if isinstance(valor, Mapping):
+                tipo = 'mapa'
+                arreglos[f"e{i}_cadenas"], arreglos[f"e{i}_cortes"] = _tabla_cadenas(list(valor))
+                filas = list(valor.values())
+                arreglos[f"e{i}_filas"] = np.concatenate(filas) if filas else np.empty(0, dtype=np.int32)
+                arreglos[f"e{i}_cortes_filas"] = np.cumsum([0] + [len(f) for f in filas])
+            elif isinstance(valor, list):
+                tipo = 'cadenas'
+                arreglos[f"e{i}_cadenas"], arreglos[f"e{i}_cortes"] = _tabla_cadenas(valor)
+            else:
+                tipo = 'arreglo'
+                arreglos[f"e{i}_valores"] = valor
+            campos.append((indice, campo, tipo))
+    np.savez(ruta, **arreglos)
+    return campos
+
+
+def leer_estados(ruta, campos):
+    estados = {}
+    with np.load(ruta, allow_pickle=False) as npz:
+        for i, (indice, campo, tipo) in enumerate(campos):
+            if tipo == 'arreglo':
+                valor = npz[f"e{i}_valores"]
+            else:
+                cadenas = _leer_tabla_cadenas(npz[f"e{i}_cadenas"], npz[f"e{i}_cortes"]).tolist()
+                if tipo == 'cadenas':
+                    valor = cadenas
+                else:
+                    valor = MapaFilas(cadenas, npz[f"e{i}_filas"], npz[f"e{i}_cortes_filas"])
+            estados.setdefault(indice, {})[campo] = valor
+    return estados
+
+
+def _escribir_atomico(ruta, escribir):
+    """Escribe en un temporal y lo renombra, para que nadie lea un archivo a medias."""
+    temporal = f"{ruta}.tmp{os.getpid()}"
+    try:
+        with open(temporal, 'wb') as f:
+            escribir(f)
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+class CacheTablas:
+    """
+    Caché binaria columnar de las tablas ya procesadas (esquema aplicado y
+    columnas *_norm calculadas) y de sus índices de búsqueda, para no volver a
+    leer y normalizar los CSV ni a construir los índices al arrancar.
+
+    Cada tabla se guarda como Feather (si está pyarrow) o como .npz con un
+    manifiesto JSON al lado: versión del formato y de pandas, versión de la
+    preparación (esquema y columnas normalizadas), firma del CSV de origen y
+    columnas con su dtype. Si algo no coincide, la entrada se ignora y se
+    reconstruye desde el CSV.
+
+    Los índices van aparte, siempre en .npz (guardar_estados), con su propio
+    manifiesto: firma del CSV y versión de los índices (que incluye la de la
+    preparación). Se leen solo si la tabla salió de la caché.
+    """
+
+    def __init__(self, carpeta):
+        self.carpeta = carpeta
+
+    def _rutas(self, nombre):
+        base = os.path.join(self.carpeta, nombre)
+        return base + (".feather" if HAY_FEATHER else ".npz"), base + ".manifest.json"
+
+    def _version(self, firma, preparacion):
+        return {
+            'formato': FORMATO_CACHE,
+            'backend': 'feather' if HAY_FEATHER else 'npz',
+            'pandas': pd.__version__,
+            'preparacion': preparacion,
+            'firma': list(firma),
+        }
+
+    def _rutas_indices(self, nombre):
+        base = os.path.join(self.carpeta, nombre)
+        return base + ".indices.npz", base + ".indices.manifest.json"
+
+    def _version_indices(self, firma, version):
+        return {'formato': FORMATO_CACHE, 'numpy': np.__version__, 'indices': version, 'firma': list(firma)}
+
+    def leer(self, nombre, firma, preparacion):
+        """DataFrame guardado para esa firma del CSV, o None si no hay uno vigente."""
+        ruta, ruta_manifiesto = self._rutas(nombre)
+        try:
+            with open(ruta_manifiesto, encoding='utf-8') as f:
+                manifiesto = json.load(f)
+            if manifiesto['version'] != self._version(firma, preparacion):
+                return None
+            if HAY_FEATHER:
+                return pd.read_feather(ruta)
+            return leer_npz(ruta, manifiesto['columnas'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def guardar(self, nombre, firma, preparacion, df):
+        """Guarda la tabla; si no se puede (disco de solo lectura, tipos mixtos) se sigue sin caché."""
+        ruta, ruta_manifiesto = self._rutas(nombre)
+        try:
+            os.makedirs(self.carpeta, exist_ok=True)
+            if HAY_FEATHER:
+                _escribir_atomico(ruta, df.to_feather)
+                columnas = [(col, str(dtype)) for col, dtype in df.dtypes.items()]
+            else:
+                columnas = []
+                _escribir_atomico(ruta, lambda f: columnas.extend(guardar_npz(df, f)))
+            manifiesto = {'version': self._version(firma, preparacion), 'columnas': columnas}
+            texto = json.dumps(manifiesto, ensure_ascii=False).encode('utf-8')
+            _escribir_atomico(ruta_manifiesto, lambda f: f.write(texto))
+        except (OSError, TypeError, ValueError) as e:
+            print(f"No se pudo guardar la caché de {nombre}: {e}")
+
+    def leer_indices(self, nombre, firma, version):
+        """Estados de los índices guardados para esa firma del CSV y esa versión, o None."""
+        ruta, ruta_manifiesto = self._rutas_indices(nombre)
+        try:
+            with open(ruta_manifiesto, encoding='utf-8') as f:
+                manifiesto = json.load(f)
+            if manifiesto['version'] != self._version_indices(firma, version):
+                return None
+            return leer_estados(ruta, manifiesto['campos'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def guardar_indices(self, nombre, firma, version, estados):
+        """Guarda los índices de la tabla; si no se puede se sigue sin ellos (se construyen al cargar)."""
+        ruta, ruta_manifiesto = self._rutas_indices(nombre)
+        try:
+            os.makedirs(self.carpeta, exist_ok=True)
+            campos = []
+            _escribir_atomico(ruta, lambda f: campos.extend(guardar_estados(estados, f)))
+            manifiesto = {'version': self._version_indices(firma, version), 'campos': campos}
+            texto = json.dumps(manifiesto, ensure_ascii=False).encode('utf-8')
+            _escribir_atomico(ruta_manifiesto, lambda f: f.write(texto))
+        except (OSError, TypeError, ValueError) as e:
+            print(f"No se pudo guardar la caché de índices de {nombre}: {e}")
@@ -0,0 +1,179 @@
+import csv
+import math
+import os
+import re
+import threading
+import pandas as pd
+
+try:
+    from tablas_vias import normalize, firma_archivo, CSV_FOLDER
+except ImportError:
+    from app.tablas_vias import normalize, firma_archivo, CSV_FOLDER
+
+# Catálogo de capas GIS (Nombre_Capa, ID, URL_Servicio y, opcionales, Alias y
+# Campos separados por ';')
+CATALOGO_CAPAS = os.path.join("data", "catalogo_capas.csv")
+
+# Capas que se devuelven como máximo por consulta, y puntaje mínimo de cada
+# una relativo a la mejor (una capa que solo comparte un campo no acompaña a
+# la que coincide por nombre)
+MAX_CAPAS = 3
+MIN_RELATIVO = 0.4
+
+# Otros nombres con los que se pide cada capa (por nombre normalizado); se
+# suman a la columna Alias del catálogo
+ALIAS_CAPAS = {
+    'red vial primaria': ['vias primarias', 'primer orden', 'carreteras principales', 'troncales', 'concesiones'],
+    'red vial secundaria': ['vias secundarias', 'segundo orden', 'vias departamentales'],
+    'red vial terciaria': ['vias terciarias', 'tercer orden', 'vias veredales', 'caminos veredales'],
+    'municipios': ['municipio', 'division politica', 'limites municipales', 'mpio'],
+    'veredas': ['vereda', 'limites veredales', 'corregimientos'],
+}
+
+# Peso de cada origen de un término: el nombre manda sobre los alias y estos
+# sobre los nombres de los campos de la capa
+PESO_NOMBRE = 3.0
+PESO_ALIAS = 2.0
+PESO_CAMPO = 1.0
+
+# Palabras que no distinguen una capa de otra
+STOP_WORDS_GIS = {'el', 'la', 'los', 'las', 'de', 'del', 'en', 'y', 'a', 'al', 'que', 'es', 'un', 'una', 'por',
+                  'con', 'para', 'sobre', 'cual', 'cuales', 'dame', 'muestrame', 'mostrar', 'ver', 'quiero',
+                  'capa', 'mapa', 'servicio', 'informacion', 'antioquia', 'id', 'fid', 'objectid', 'globalid',
+                  'shape', 'length', 'area'}
+
+_PALABRA = re.compile(r'[a-z0-9]+')
+
+
+def termino(palabra):
+    """Término de búsqueda de una palabra normalizada (sin plural: 'vias' -> 'via')."""
+    if len(palabra) > 3 and palabra.endswith('s'):
+        return palabra[:-1]
+    return palabra
+
+
+def terminos(texto):
+    """Términos sin tildes, sin plural y sin palabras vacías de un texto (o nombre de campo)."""
+    return [termino(p) for p in _PALABRA.findall(normalize(str(texto).replace('_', ' ')))
+            if p not in STOP_WORDS_GIS and not p.isdigit()]
+
+
+def lista_de(valor):
+    """Valores de una celda 'a; b; c' (vacía si es NaN)."""
+    if not isinstance(valor, str):
+        return []
+    return [v.strip() for v in valor.split(';') if v.strip()]
+
+
+def nombre_archivo_capa(nombre_capa):
+    """Nombre del CSV decodificado de una capa, como lo guarda descargar_y_procesar_vias.py."""
+    nombre_limpio = re.sub(r'[^\w\s-]', '', str(nombre_capa)).strip().replace(' ', '_')
+    return f"{nombre_limpio}_decodificado.csv"
+
+
+def campos_de_csv(ruta):
+    """Encabezado de un CSV (lista vacía si no existe)."""
+    for encoding in ('utf-8-sig', 'latin-1'):
+        try:
+            with open(ruta, encoding=encoding, newline='') as f:
+                return next(csv.reader(f), [])
+        except UnicodeDecodeError:
+            continue
+        except OSError:
+            return []
+    return []
+
+
+class CatalogoCapas:
+    """
+    Índice del catálogo de capas GIS.
+
+    Cada capa se indexa una vez por los términos de su nombre, sus alias y los
+    nombres de sus campos; la consulta se reduce a sus términos y cada capa
+    suma, por término, el peso de su mejor origen por el idf del término (un
+    término que aparece en todas las capas casi no distingue). Buscar es
+    recorrer los términos de la consulta, no el catálogo.
+    """
+
+    def __init__(self, df, campos_por_capa=None, alias=ALIAS_CAPAS):
+        campos_por_capa = campos_por_capa or {}
+        self.capas = list(zip(df['Nombre_Capa'].astype(str), df['URL_Servicio'].astype(str)))
+        # término -> {posición de la capa: peso}
+        pesos = {}
+        for i, fila in enumerate(df.to_dict('records')):
+            nombre = str(fila['Nombre_Capa'])
+            origenes = [
+                (PESO_NOMBRE, [nombre]),
+                (PESO_ALIAS, alias.get(normalize(nombre), []) + lista_de(fila.get('Alias'))),
+                (PESO_CAMPO, lista_de(fila.get('Campos')) + campos_por_capa.get(nombre, [])),
+            ]
+            for peso, textos in origenes:
+                for texto in textos:
+                    for t in terminos(texto):
+                        actual = pesos.setdefault(t, {})
+                        actual[i] = max(actual.get(i, 0.0), peso)
+
+        total = len(self.capas)
+        self.indice = {t: [(i, peso * math.log(1 + total / len(capas))) for i, peso in capas.items()]
+                       for t, capas in pesos.items()}
+
+    def buscar(self, consulta, k=MAX_CAPAS):
+        """Hasta k (nombre, url, score) de las capas más relevantes (empates en orden del catálogo)."""
+        scores = {}
+        for t in set(terminos(consulta)):
+            for i, peso in self.indice.get(t, ()):
+                scores[i] = scores.get(i, 0.0) + peso
+        mejores = sorted(scores, key=lambda i: (-scores[i], i))[:k]
+        minimo = scores[mejores[0]] * MIN_RELATIVO if mejores else 0.0
+        return [self.capas[i] + (scores[i],) for i in mejores if scores[i] >= minimo]
+
+
+def version_catalogo(ruta=CATALOGO_CAPAS, carpeta=CSV_FOLDER):
+    """
+    Versión del catálogo: firma del CSV del catálogo y de los CSV decodificados
+    de los que salen los nombres de campos. None si no hay catálogo.
+    """
+    try:
+        firma = firma_archivo(ruta)
+    except OSError:
+        return None
+    firmas = []
+    if os.path.isdir(carpeta):
+        for nombre in sorted(os.listdir(carpeta)):
+            if nombre.endswith('_decodificado.csv'):
+                try:
+                    firmas.append((nombre, firma_archivo(os.path.join(carpeta, nombre))))
+                except OSError:
+                    continue
+    return (firma, tuple(firmas))
+
+
+def cargar_catalogo(ruta=CATALOGO_CAPAS, carpeta=CSV_FOLDER):
+    """CatalogoCapas del CSV, con los campos de cada capa tomados de su CSV decodificado."""
+    df = pd.read_csv(ruta, dtype=str)
+    campos = {nombre: campos_de_csv(os.path.join(carpeta, nombre_archivo_capa(nombre)))
+              for nombre in df['Nombre_Capa'].astype(str)}
+    return CatalogoCapas(df, campos)
+
+
+_catalogo = None
+_lock = threading.Lock()
+
+
+def obtener_catalogo(version=None, ruta=CATALOGO_CAPAS, carpeta=CSV_FOLDER):
+    """
+    Índice del catálogo del proceso; se reconstruye solo cuando cambia su
+    versión. Devuelve None si no hay catálogo.
+    """
+    global _catalogo
+    if version is None:
+        version = version_catalogo(ruta, carpeta)
+    if version is None:
+        return None
+    actual = _catalogo
+    if actual is not None and actual[0] == version:
+        return actual[1]
+    with _lock:
+        if _catalogo is None or _catalogo[0] != version:
+            _catalogo = (version, cargar_catalogo(ruta, carpeta))
+        return _catalogo[1]
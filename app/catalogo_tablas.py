@@ -0,0 +1,48 @@
+import fnmatch
+from collections import namedtuple
+
+# Cómo busca y muestra cada tabla de data_vias_limpia la búsqueda por texto:
+#   nombre / codigo / ubicacion: columnas que se puntúan (None si la tabla no tiene)
+#   mostrar: columnas del bloque FUENTE, en orden (None = todas las que no son técnicas)
+#   peso: multiplica el puntaje de sus filas (prioridad frente a las demás
+#         tablas); con 0 la tabla no entra en la búsqueda por texto
+#   entidad: si la tiene, la tabla solo se puntúa cuando la consulta nombra esa
+#            entidad ("vereda" con "veredas de Amalfi")
+#   maximo: filas que aporta como máximo al resultado (None = MAX_POR_TABLA)
+DefinicionTabla = namedtuple('DefinicionTabla', ['nombre', 'codigo', 'ubicacion', 'mostrar', 'peso', 'entidad',
+                                                 'maximo'],
+                             defaults=(None, None, None, None, 1.0, None, None))
+
+# Catálogo de tablas buscables. La clave es el nombre del CSV o un patrón
+# (fnmatch) para familias de capas con el mismo esquema; una capa nueva de
+# descargar_y_procesar_vias.py se vuelve buscable agregando aquí su entrada.
+# Se usa la primera entrada que coincide.
+CATALOGO_TABLAS = {
+    'Red_vial*.csv': DefinicionTabla('NOMBRE_VIA', 'CODIGO_VIA', 'MUNICIPIO'),
+    'Base_Necesidades.csv': DefinicionTabla('NECESIDAD', 'RADICADOS ASOCIADOS', 'MUNICIPIO'),
+    'Base_Radicados.csv': DefinicionTabla('PROYECTOS', 'RADICADO', 'MUNICIPIO'),
+    'Base_Capacidad_Endeudamiento.csv': DefinicionTabla(ubicacion='MUNICIPIO'),
+    # División política: también alimenta el gazetteer. Muchas veredas se
+    # llaman como su municipio, así que solo se puntúa cuando la consulta
+    # pregunta por veredas o municipios, y aporta una sola fila para no
+    # desplazar a las necesidades y radicados del mismo lugar
+    'Municipios_decodificado.csv': DefinicionTabla(
+        'MPIO_NOMBRE', ubicacion='SUBREGION', entidad='municipio', maximo=1,
+        mostrar=['MPIO_NOMBRE', 'SUBREGION', 'ZONA', 'REGION', 'TERRIT_CAR']),
+    'Veredas_decodificado.csv': DefinicionTabla(
+        'VERE_NOMBRE', ubicacion='MPIO_NOMBRE', entidad='vereda', maximo=1,
+        mostrar=['VERE_NOMBRE', 'MPIO_NOMBRE', 'CORREGIMIENTO', 'SUBREGION', 'ZONA']),
+}
+
+
+def definicion_de(nombre, catalogo=CATALOGO_TABLAS):
+    """DefinicionTabla de un archivo, o None si no está en el catálogo (no se busca)."""
+    if nombre in catalogo:
+        return catalogo[nombre]
+    return next((d for patron, d in catalogo.items() if fnmatch.fnmatchcase(nombre, patron)), None)
+
+
+def columnas_catalogo(catalogo=CATALOGO_TABLAS):
+    """Columnas de nombre, código y ubicación de todo el catálogo (sin repetir)."""
+    columnas = [c for d in catalogo.values() for c in (d.nombre, d.codigo, d.ubicacion) if c]
+    return list(dict.fromkeys(columnas))
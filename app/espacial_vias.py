@@ -0,0 +1,100 @@
+import re
+import numpy as np
+import pandas as pd
+
+try:
+    from tablas_vias import registro_tablas, normalize, SUFIJO_NORM
+    from indices_vias import IndiceEspacial
+except ImportError:
+    from app.tablas_vias import registro_tablas, normalize, SUFIJO_NORM
+    from app.indices_vias import IndiceEspacial
+
+TABLA_NECESIDADES = 'Base_Necesidades.csv'
+
+# Radio por defecto de "necesidades cerca de ..." (km) y máximo permitido
+RADIO_CERCANIA_KM = 15.0
+RADIO_MAXIMO_KM = 100.0
+
+# "a 10 km", "20 kilometros", "5,5 km"
+_RADIO = re.compile(r'(\d+(?:[.,]\d+)?)\s*(?:km|kms|kilometros?)\b')
+
+
+def clave_lugar(nombre):
+    """Clave de un municipio normalizada y sin espacios ('Don Matías' y 'Donmatías' son el mismo)."""
+    return normalize(nombre).replace(' ', '')
+
+
+def radio_de_consulta(consulta_norm):
+    """Radio pedido en la consulta (km) o el radio por defecto."""
+    m = _RADIO.search(consulta_norm)
+    if not m:
+        return RADIO_CERCANIA_KM
+    return min(float(m.group(1).replace(',', '.')), RADIO_MAXIMO_KM)
+
+
+class EspacialNecesidades:
+    """
+    Índice espacial de las necesidades (LONGITUD/LATITUD) y un punto de
+    referencia por municipio.
+
+    Las tablas de municipios y veredas no traen coordenadas, así que el punto
+    de un municipio es el promedio de las necesidades ubicadas en él; una
+    vereda usa el punto de su municipio.
+    """
+
+    def __init__(self, tabla):
+        df = tabla.df
+        lons = pd.to_numeric(df['LONGITUD'], errors='coerce').to_numpy(dtype=np.float64)
+        lats = pd.to_numeric(df['LATITUD'], errors='coerce').to_numpy(dtype=np.float64)
+        self.tabla = tabla
+        self.indice = IndiceEspacial(lons, lats)
+
+        self.centros = {}
+        col = 'MUNICIPIO' + SUFIJO_NORM
+        if col in df.columns:
+            municipios = df[col].to_numpy(dtype=object)[self.indice.filas]
+            puntos = pd.DataFrame({'lugar': [clave_lugar(m) if isinstance(m, str) else None for m in municipios],
+                                   'lon': self.indice.lons, 'lat': self.indice.lats}).dropna()
+            for lugar, grupo in puntos.groupby('lugar'):
+                self.centros[lugar] = (float(grupo['lon'].mean()), float(grupo['lat'].mean()))
+
+    def centros_de(self, lugar):
+        """
+        Puntos de referencia (lon, lat) de una EntidadLugar y su descripción.
+        Una vereda cuyo nombre existe en varios municipios usa el punto de cada
+        uno. Devuelve ([], None) si no hay necesidades ubicadas allí.
+        """
+        if lugar.tipo == 'municipio':
+            municipios, descripcion = [lugar.norm], f"municipio {lugar.nombre}"
+        elif lugar.tipo == 'vereda':
+            municipios = list(lugar.municipios)
+            descripcion = f"vereda {lugar.nombre} (centro aproximado de su municipio)"
+        else:
+            return [], None
+        puntos = [self.centros[clave_lugar(m)] for m in municipios if clave_lugar(m) in self.centros]
+        return puntos, (descripcion if puntos else None)
+
+    def cercanas(self, puntos, radio_km):
+        """
+        (filas, distancias) de las necesidades a menos de `radio_km` de alguno de
+        los puntos, de la más cercana a la más lejana.
+        """
+        mejores = {}
+        for lon, lat in puntos:
+            for fila, distancia in zip(*self.indice.en_radio(lon, lat, radio_km)):
+                if distancia < mejores.get(fila, np.inf):
+                    mejores[fila] = distancia
+        orden = sorted(mejores, key=lambda f: (mejores[f], f))
+        return np.array(orden, dtype=np.int32), np.array([mejores[f] for f in orden])
+
+    def en_caja(self, lon_min, lat_min, lon_max, lat_max):
+        return self.indice.en_caja(lon_min, lat_min, lon_max, lat_max)
+
+
+def obtener_espacial(registro=registro_tablas):
+    """Índice espacial de necesidades del proceso (None si falta la tabla o sus coordenadas)."""
+    def construir(tabla):
+        if tabla is None or not {'LONGITUD', 'LATITUD'} <= set(tabla.df.columns):
+            return None
+        return EspacialNecesidades(tabla)
+    return registro.derivado('espacial_necesidades', [TABLA_NECESIDADES], construir)
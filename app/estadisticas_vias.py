@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+try:
+    from tablas_vias import registro_tablas, a_dinero, SUFIJO_NORM
+except ImportError:
+    from app.tablas_vias import registro_tablas, a_dinero, SUFIJO_NORM
+
+# Tablas de las que sale cada entidad del cubo
+TABLAS_ENTIDAD = {
+    'necesidades': 'Base_Necesidades.csv',
+    'vias_terciarias': 'Red_vial_terciaria_decodificado.csv',
+    'radicados': 'Base_Radicados.csv',
+}
+
+# Columnas de dinero que se suman por entidad
+COLUMNAS_SUMA = {
+    'necesidades': ['APORTE GOB', 'VALOR NECESIDAD SIF'],
+}
+
+# Columna de la tabla que define cada ámbito geográfico
+COLUMNAS_AMBITO = {
+    'municipio': 'MUNICIPIO',
+    'subregion': 'SUBREGION',
+}
+
+
+class ResumenDinero:
+    """Suma de una columna de dinero y datos de sus valores positivos."""
+
+    def __init__(self, valores):
+        positivos = valores[valores > 0]
+        self.total = float(valores.sum())
+        self.positivos = int(len(positivos))
+        # Valor único si todos los positivos son iguales (posible indicador municipal)
+        unicos = np.unique(positivos)
+        self.valor_unico = float(unicos[0]) if len(unicos) == 1 else None
+
+    @property
+    def es_repetido(self):
+        return self.positivos > 1 and self.valor_unico is not None
+
+
+class CuboEstadisticas:
+    """
+    Agregados precalculados por (entidad, ámbito, lugar normalizado).
+
+    ámbito es 'municipio', 'subregion' o 'global' (lugar ''). Cada celda guarda
+    el conteo de registros y, para las entidades con columnas de dinero, un
+    ResumenDinero por columna. Se construye al cargar las tablas y responder
+    una estadística es una búsqueda en un diccionario.
+    """
+
+    def __init__(self):
+        self.celdas = {}
+        # (entidad, ámbito) disponibles: existe la tabla y la columna del ámbito
+        self.ambitos = set()
+
+    def tiene(self, entidad, ambito):
+        return (entidad, ambito) in self.ambitos
+
+    def conteo(self, entidad, ambito, lugar=''):
+        celda = self.celdas.get((entidad, ambito, lugar))
+        return celda['conteo'] if celda else 0
+
+    def dinero(self, entidad, ambito, lugar, columna):
+        """ResumenDinero de una columna, o None si la tabla no tiene esa columna."""
+        if columna not in COLUMNAS_SUMA.get(entidad, []) or not self.tiene(entidad, ambito):
+            return None
+        celda = self.celdas.get((entidad, ambito, lugar))
+        if celda is None:
+            return ResumenDinero(np.zeros(0))
+        return celda['dinero'].get(columna)
+
+    def agregar_tabla(self, entidad, df):
+        # Las columnas de dinero ya vienen como float64 (esquema de la tabla); los vacíos suman 0
+        columnas_dinero = {c: a_dinero(df[c]).fillna(0.0).to_numpy() for c in COLUMNAS_SUMA.get(entidad, []) if c in df.columns}
+
+        def celda(filas):
+            return {'conteo': int(len(filas)),
+                    'dinero': {c: ResumenDinero(valores[filas]) for c, valores in columnas_dinero.items()}}
+
+        self.ambitos.add((entidad, 'global'))
+        self.celdas[(entidad, 'global', '')] = celda(np.arange(len(df)))
+
+        for ambito, col in COLUMNAS_AMBITO.items():
+            if col not in df.columns:
+                continue
+            self.ambitos.add((entidad, ambito))
+            grupos = pd.Series(np.arange(len(df))).groupby(df[col + SUFIJO_NORM].to_numpy(), sort=False)
+            for lugar, filas in grupos:
+                self.celdas[(entidad, ambito, lugar)] = celda(filas.to_numpy())
+
+
+def construir_cubo(*tablas):
+    cubo = CuboEstadisticas()
+    for entidad, tabla in zip(TABLAS_ENTIDAD, tablas):
+        if tabla is not None:
+            cubo.agregar_tabla(entidad, tabla.df)
+    return cubo
+
+
+def obtener_cubo(registro=registro_tablas):
+    """Cubo de estadísticas del proceso; se reconstruye solo si cambian sus CSV."""
+    return registro.derivado('cubo_estadisticas', list(TABLAS_ENTIDAD.values()), construir_cubo)
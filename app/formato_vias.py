@@ -0,0 +1,107 @@
+import pandas as pd
+
+try:
+    from tablas_vias import registro_tablas, SUFIJO_NORM, COLUMNAS_DESCARTADAS
+except ImportError:
+    from app.tablas_vias import registro_tablas, SUFIJO_NORM, COLUMNAS_DESCARTADAS
+
+# Nombres de las fases de proyecto (FASE PROYECTO ya viene como entero)
+MAPA_FASES = {1: "Perfil", 2: "Prefactibilidad", 3: "Factibilidad"}
+
+# Columnas a excluir (técnicas o redundantes; las descartadas ya no se cargan)
+COLUMNAS_EXCLUIDAS = COLUMNAS_DESCARTADAS + ['score']
+
+# Formato Moneda para columnas financieras
+COLUMNAS_MONEDA_KEYWORDS = ['VALOR', 'PRESUPUESTO', 'COSTO', 'APORTE', 'SOBRANTE', 'DEUDA', 'INGRESOS', 'GASTOS',
+                            'AHORRO', 'CAPACIDAD MAXIMA']
+EXCLUDE_KEYWORDS = ['PORCENTAJE', 'INDICADOR', 'SOBRE EL TOTAL', 'LIMITE', 'LÍMITE']
+
+
+def formatear_fase(fase):
+    """'2' -> '2 (Prefactibilidad)'; los valores sin nombre se muestran tal cual."""
+    if pd.isna(fase):
+        return 'No definida'
+    if int(fase) in MAPA_FASES:
+        return f"{int(fase)} ({MAPA_FASES[int(fase)]})"
+    return fase
+
+
+def formatear_fecha(fecha):
+    """Fecha sin la hora (las columnas de fecha ya vienen como datetime)."""
+    return fecha.strftime('%Y-%m-%d') if pd.notna(fecha) else ''
+
+
+def formatear_moneda(val):
+    # Las columnas de dinero del esquema ya son float
+    if isinstance(val, (int, float)):
+        return f"${val:,.2f}"
+    try:
+        val_float = float(str(val).replace(',', '').replace('$', ''))
+        return f"${val_float:,.2f}"
+    except (ValueError, TypeError):
+        return val
+
+
+def es_columna_moneda(col):
+    col_upper = col.upper()
+    return (any(k in col_upper for k in COLUMNAS_MONEDA_KEYWORDS)
+            and not any(ex in col_upper for ex in EXCLUDE_KEYWORDS))
+
+
+def formateador_de(col, serie):
+    """Formateador de una columna según su nombre y tipo (None = el valor tal cual)."""
+    if col == 'FASE PROYECTO':
+        return formatear_fase
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return formatear_fecha
+    if es_columna_moneda(col):
+        return formatear_moneda
+    return None
+
+
+class PlanFuente:
+    """
+    Plan para mostrar filas de una tabla como bloque FUENTE.
+
+    Todo lo que depende solo del esquema (qué columnas se ven, su etiqueta y
+    su formateador) se decide una vez por tabla; mostrar una fila es recorrer
+    la lista de columnas y leer cada valor por posición.
+    """
+
+    def __init__(self, tabla):
+        self.tabla = tabla
+        self.nombre = tabla.nombre.replace('_decodificado.csv', '').replace('_', ' ')
+        # (etiqueta, valores, formateador) de cada columna visible
+        self.columnas = []
+        # Columnas que el catálogo pide mostrar (en su orden) o todas las de la tabla
+        mostrar = tabla.definicion.mostrar
+        for col in (tabla.df.columns if mostrar is None else [c for c in mostrar if c in tabla.df.columns]):
+            # las columnas sombra *_norm son internas de la búsqueda
+            if col in COLUMNAS_EXCLUIDAS or col.endswith(SUFIJO_NORM):
+                continue
+            serie = tabla.df[col]
+            # Formatear un poco el nombre de la columna para que sea más legible
+            etiqueta = col.replace('_', ' ').title()
+            self.columnas.append((etiqueta, serie.array, formateador_de(col, serie)))
+
+    def formatear(self, fila, score, extras=()):
+        """Bloque FUENTE de la fila en la posición `fila` (más líneas extra [(etiqueta, valor)])."""
+        info = f"FUENTE: {self.nombre} (Relevancia: {score:.2f})\n"
+        for etiqueta, valores, formateador in self.columnas:
+            val = valores[fila]
+            # Mostrar solo las columnas con valor
+            if pd.isna(val) or str(val).strip() == "":
+                continue
+            if formateador is not None:
+                val = formateador(val)
+            info += f"- {etiqueta}: {val}\n"
+        for etiqueta, val in extras:
+            info += f"- {etiqueta}: {val}\n"
+        return info
+
+
+def plan_fuente(tabla, registro=registro_tablas):
+    """Plan compilado de una tabla; se recompila solo si cambia su CSV."""
+    plan = registro.derivado(('plan_fuente', tabla.nombre), [tabla.nombre], PlanFuente)
+    # Si la tabla se recargó entre la búsqueda y el formato, se usa la versión buscada
+    return plan if plan.tabla is tabla else PlanFuente(tabla)
@@ -0,0 +1,504 @@
+import difflib
+import heapq
+import re
+import threading
+from collections import defaultdict, namedtuple
+import numpy as np
+import pandas as pd
+
+
+def _a_arreglo(filas):
+    return np.array(sorted(set(filas)), dtype=np.int32)
+
+
+class IndiceInvertido:
+    """
+    Índice invertido de una tabla: token normalizado -> filas que lo contienen.
+
+    Se construye una vez al cargar la tabla sobre las columnas de nombre, código
+    y ubicación (ya normalizadas) y permite obtener las filas candidatas de una
+    consulta sin recorrer la tabla completa. Una fila es candidata si:
+      - alguna palabra clave aparece dentro de uno de sus campos, o
+      - alguno de sus campos completos aparece dentro de la consulta.
+    Son exactamente las filas que pueden obtener puntaje en buscar_datos_vias
+    por coincidencia de texto.
+    """
+
+    def __init__(self, campos, max_cache=1024):
+        # campos: listas paralelas de valores normalizados (None si está vacío)
+        tokens = defaultdict(list)
+        valores = defaultdict(list)
+        for valores_campo in campos:
+            for fila, valor in enumerate(valores_campo):
+                if not isinstance(valor, str):
+                    continue
+                valores[valor].append(fila)
+                for token in set(valor.split()):
+                    tokens[token].append(fila)
+
+        self._armar({t: _a_arreglo(f) for t, f in tokens.items()},
+                    {v: _a_arreglo(f) for v, f in valores.items()}, max_cache)
+
+    @classmethod
+    def desde_estado(cls, estado, max_cache=1024):
+        """Índice guardado con estado() (p. ej. en la caché de tablas), sin recorrer las filas."""
+        indice = cls.__new__(cls)
+        indice._armar(estado['tokens'], estado['valores'], max_cache)
+        return indice
+
+    def estado(self):
+        """Diccionarios token -> filas y valor -> filas que definen el índice."""
+        return {'tokens': self.tokens, 'valores': self.valores}
+
+    def _armar(self, tokens, valores, max_cache):
+        self.tokens = tokens
+        self.valores = valores
+        # Valores agrupados por largo: las subcadenas de una consulta se cruzan
+        # con el conjunto de su largo de una vez (intersección de sets)
+        self._por_largo = defaultdict(set)
+        for valor in self.valores:
+            self._por_largo[len(valor)].add(valor)
+        self.longitudes = sorted(self._por_largo)
+        # La búsqueda puede correr en hilos (VIAS_POOL=hilos): el lock protege
+        # la caché; el cálculo queda afuera (si dos lo hacen a la vez, da igual)
+        self._cache_palabras = {}
+        self._max_cache = max_cache
+        self._lock = threading.Lock()
+
+    def filas_con_palabra(self, palabra):
+        """Filas donde `palabra` aparece como subcadena de algún campo."""
+        with self._lock:
+            filas = self._cache_palabras.get(palabra)
+        if filas is not None:
+            return filas
+
+        # Una palabra sin espacios solo puede estar dentro de un único token,
+        # así que basta con revisar el vocabulario (mucho menor que la tabla).
+        exacta = self.tokens.get(palabra)
+        listas = [self.tokens[token] for token in self.tokens if token != palabra and palabra in token]
+        if exacta is not None:
+            listas.append(exacta)
+        filas = np.unique(np.concatenate(listas)) if listas else np.empty(0, dtype=np.int32)
+
+        with self._lock:
+            if len(self._cache_palabras) >= self._max_cache:
+                self._cache_palabras.clear()
+            self._cache_palabras[palabra] = filas
+        return filas
+
+    def filas_contenidas_en(self, texto):
+        """Filas con algún campo completo que aparece dentro de `texto`."""
+        listas = []
+        for largo in self.longitudes:
+            if largo > len(texto):
+                break
+            vistos = {texto[i:i + largo] for i in range(len(texto) - largo + 1)}
+            listas.extend(self.valores[sub] for sub in vistos & self._por_largo[largo])
+        return listas
+
+    def candidatos(self, palabras_clave, consulta_norm):
+        """Posiciones (ordenadas) de las filas que pueden coincidir con la consulta."""
+        listas = [self.filas_con_palabra(p) for p in palabras_clave]
+        listas.extend(self.filas_contenidas_en(consulta_norm))
+        listas = [filas for filas in listas if len(filas)]
+        if not listas:
+            return np.empty(0, dtype=np.int32)
+        return np.unique(np.concatenate(listas))
+
+
+def subsecuencia_comun(consulta, caracteres):
+    """
+    Largo de la subsecuencia común más larga entre una consulta y cada fila de
+    `caracteres`, con el algoritmo de vectores de bits de Hyyrö: cada fila es
+    un vector de bits (de a 64 por palabra) que se actualiza una vez por
+    carácter de la consulta, para todas las filas a la vez.
+    consulta: códigos de sus caracteres (los negativos no coinciden con nada).
+    caracteres: matriz de códigos por fila, rellena con -1.
+    """
+    n, ancho = caracteres.shape
+    palabras = max(1, -(-ancho // 64))
+    if palabras * 64 != ancho:
+        relleno = np.full((n, palabras * 64 - ancho), -1, dtype=caracteres.dtype)
+        caracteres = np.concatenate([caracteres, relleno], axis=1)
+    v = np.full((n, palabras), np.iinfo(np.uint64).max, dtype=np.uint64)
+    posiciones = {}
+    for codigo in consulta:
+        if codigo < 0:
+            continue
+        pm = posiciones.get(codigo)
+        if pm is None:
+            pm = posiciones[codigo] = np.packbits(caracteres == codigo, axis=1, bitorder='little').view(np.uint64)
+        u = v & pm
+        # v + u con acarreo entre palabras; v - u es v & ~u porque u está contenido en v
+        suma = np.empty_like(v)
+        acarreo = np.zeros(n, dtype=np.uint64)
+        for k in range(palabras):
+            parcial = v[:, k] + u[:, k]
+            desborde = parcial < v[:, k]
+            suma[:, k] = parcial + acarreo
+            acarreo = (desborde | (suma[:, k] < parcial)).astype(np.uint64)
+        v = suma | (v & ~u)
+    # Cada cero de v es un carácter de la subsecuencia (el relleno queda en 1)
+    return palabras * 64 - np.unpackbits(v.view(np.uint8), axis=1).sum(axis=1, dtype=np.int64)
+
+
+def _cota_ratio(comunes, largo_consulta, largos):
+    """2 * comunes / (largo total), como SequenceMatcher.ratio() (1 si ambos textos están vacíos)."""
+    total = largo_consulta + largos
+    return np.where(total > 0, 2.0 * comunes / np.maximum(total, 1), 1.0)
+
+
+class IndiceSimilitud:
+    """
+    Similitud difflib.SequenceMatcher(None, consulta, valor).ratio() entre una
+    consulta y cada fila de una columna normalizada, sin pasar SequenceMatcher
+    por toda la columna.
+
+    Los valores distintos se guardan codificados (un código por carácter) con
+    sus conteos de caracteres. Para un umbral se descartan primero, con numpy y
+    para todos los valores a la vez, los que no pueden superarlo según dos
+    cotas superiores del ratio: los caracteres en común (la cota de
+    SequenceMatcher.quick_ratio) y la subsecuencia común más larga (los bloques
+    que encuentra SequenceMatcher forman una subsecuencia común). Solo a los
+    pocos que quedan se les calcula el ratio exacto, así que el resultado es el
+    mismo que recorrer la columna con SequenceMatcher.
+    """
+
+    def __init__(self, valores, max_cache=256):
+        # valores: normalizados, NaN/None si están vacíos (código -1)
+        codigos, distintos = pd.factorize(np.asarray(valores, dtype=object))
+        distintos = [str(v) for v in distintos]
+        alfabeto = sorted({c for v in distintos for c in v})
+        posicion = {c: i for i, c in enumerate(alfabeto)}
+        largos = np.array([len(v) for v in distintos], dtype=np.int64)
+        ancho = int(largos.max()) if len(largos) else 0
+        conteos = np.zeros((len(distintos), len(alfabeto)), dtype=np.int32)
+        caracteres = np.full((len(distintos), ancho), -1, dtype=np.int16)
+        for i, valor in enumerate(distintos):
+            fila = [posicion[c] for c in valor]
+            caracteres[i, :len(fila)] = fila
+            np.add.at(conteos[i], fila, 1)
+        self._armar({'codigos': codigos.astype(np.int32), 'distintos': distintos, 'alfabeto': alfabeto,
+                     'largos': largos, 'conteos': conteos, 'caracteres': caracteres}, max_cache)
+
+    @classmethod
+    def desde_estado(cls, estado, max_cache=256):
+        """Índice guardado con estado() (p. ej. en la caché de tablas), sin recorrer los valores."""
+        indice = cls.__new__(cls)
+        indice._armar(estado, max_cache)
+        return indice
+
+    def estado(self):
+        """Arreglos y listas de cadenas que definen el índice."""
+        return {'codigos': self.codigos, 'distintos': self.distintos, 'alfabeto': list(self.alfabeto),
+                'largos': self.largos, 'conteos': self.conteos, 'caracteres': self.caracteres}
+
+    def _armar(self, estado, max_cache):
+        self.codigos = estado['codigos']
+        self.distintos = estado['distintos']
+        self.alfabeto = {c: i for i, c in enumerate(estado['alfabeto'])}
+        self.largos = estado['largos']
+        self.conteos = estado['conteos']
+        self.caracteres = estado['caracteres']
+        # La búsqueda pide la similitud de la misma consulta para los
+        # candidatos y para el puntaje; se guardan las últimas (con lock, como
+        # en IndiceInvertido)
+        self._cache = {}
+        self._max_cache = max_cache
+        self._lock = threading.Lock()
+
+    def _ratios_sobre(self, texto, umbral):
+        """(valores distintos, ratios) de los valores con ratio > umbral."""
+        consulta = np.array([self.alfabeto.get(c, -1) for c in texto], dtype=np.int32)
+        conteo = np.bincount(consulta[consulta >= 0], minlength=len(self.alfabeto))
+        comunes = np.minimum(self.conteos, conteo).sum(axis=1)
+        posibles = np.flatnonzero(_cota_ratio(comunes, len(texto), self.largos) > umbral)
+        if len(posibles):
+            ancho = int(self.largos[posibles].max())
+            lcs = subsecuencia_comun(consulta, self.caracteres[posibles, :ancho])
+            posibles = posibles[_cota_ratio(lcs, len(texto), self.largos[posibles]) > umbral]
+        ratios = np.array([difflib.SequenceMatcher(None, texto, self.distintos[i]).ratio() for i in posibles],
+                          dtype=np.float64)
+        sobre = ratios > umbral
+        return posibles[sobre], ratios[sobre]
+
+    def similitudes(self, texto, umbral):
+        """Devuelve (filas, similitudes) de las filas con similitud mayor que `umbral`."""
+        clave = (texto, umbral)
+        with self._lock:
+            resultado = self._cache.get(clave)
+        if resultado is not None:
+            return resultado
+
+        distintos, ratios = self._ratios_sobre(texto, umbral)
+        por_valor = np.zeros(len(self.distintos) + 1)
+        por_valor[distintos] = ratios
+        # Las filas vacías (código -1) toman el último elemento: similitud 0
+        en_fila = por_valor[self.codigos]
+        filas = np.flatnonzero(en_fila > umbral).astype(np.int32)
+        resultado = (filas, en_fila[filas])
+
+        with self._lock:
+            if len(self._cache) >= self._max_cache:
+                self._cache.clear()
+            self._cache[clave] = resultado
+        return resultado
+
+    def filas_sobre(self, texto, umbral):
+        """Filas cuya similitud con `texto` es mayor que `umbral`."""
+        return self.similitudes(texto, umbral)[0]
+
+    def top_k(self, texto, k=5, umbral=0.0):
+        """Las `k` filas más parecidas a `texto` como lista de (fila, similitud)."""
+        filas, sims = self.similitudes(texto, umbral)
+        if len(filas) > k:
+            parte = np.argpartition(-sims, k - 1)[:k]
+            filas, sims = filas[parte], sims[parte]
+        orden = np.lexsort((filas, -sims))
+        return [(int(filas[j]), float(sims[j])) for j in orden]
+
+
+class SelectorTopK:
+    """
+    Los `k` mejores elementos de una búsqueda repartida en varias tablas.
+
+    Mantiene un montículo acotado a `k` entradas (score, orden de llegada), así
+    que ofrecer un elemento cuesta O(log k) y nunca se guarda más de `k`. Con
+    scores iguales gana el que llegó primero, igual que un ordenamiento estable
+    de todos los resultados. `umbral()` es el score a superar para entrar, lo
+    que permite descartar filas (o tablas completas) sin formatearlas.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self._heap = []
+        self._llegadas = 0
+
+    def umbral(self):
+        """Score que hay que superar para entrar (-inf mientras no esté lleno)."""
+        return self._heap[0][0] if len(self._heap) >= self.k else float('-inf')
+
+    def ofrecer(self, score, elemento):
+        self._llegadas += 1
+        entrada = (score, -self._llegadas, elemento)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entrada)
+        elif entrada[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entrada)
+
+    def mejores(self):
+        """Lista de (score, elemento) de mayor a menor score."""
+        return [(score, elemento) for score, _, elemento in sorted(self._heap, key=lambda e: e[:2], reverse=True)]
+
+
+RADIO_TIERRA_KM = 6371.0
+
+
+def distancias_km(lon, lat, lons, lats):
+    """Distancia (haversine) en km de un punto a un arreglo de puntos."""
+    lon, lat, lons, lats = map(np.radians, (lon, lat, lons, lats))
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(a))
+
+
+class IndiceEspacial:
+    """
+    Rejilla uniforme sobre (longitud, latitud) de las filas de una tabla.
+
+    Cada celda de `celda` grados guarda las filas cuyos puntos caen en ella;
+    una consulta por caja o por radio solo revisa las celdas que la tocan y
+    filtra esos pocos puntos con la distancia exacta. Las filas sin
+    coordenadas no se indexan.
+    """
+
+    def __init__(self, lons, lats, celda=0.1):
+        lons = np.asarray(lons, dtype=np.float64)
+        lats = np.asarray(lats, dtype=np.float64)
+        validos = np.isfinite(lons) & np.isfinite(lats)
+        self.filas = np.flatnonzero(validos).astype(np.int32)
+        self.lons = lons[validos]
+        self.lats = lats[validos]
+        self.celda = celda
+
+        celdas = defaultdict(list)
+        for i, clave in enumerate(zip(self._indice(self.lons), self._indice(self.lats))):
+            celdas[clave].append(i)
+        self.celdas = {c: np.array(pos, dtype=np.int32) for c, pos in celdas.items()}
+
+    def _indice(self, valores):
+        return np.floor(np.asarray(valores) / self.celda).astype(np.int64)
+
+    def _posiciones_en_caja(self, lon_min, lat_min, lon_max, lat_max):
+        x0, x1 = self._indice([lon_min, lon_max])
+        y0, y1 = self._indice([lat_min, lat_max])
+        listas = [self.celdas[(x, y)] for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)
+                  if (x, y) in self.celdas]
+        if not listas:
+            return np.empty(0, dtype=np.int32)
+        pos = np.concatenate(listas)
+        dentro = ((self.lons[pos] >= lon_min) & (self.lons[pos] <= lon_max)
+                  & (self.lats[pos] >= lat_min) & (self.lats[pos] <= lat_max))
+        return pos[dentro]
+
+    def en_caja(self, lon_min, lat_min, lon_max, lat_max):
+        """Filas (ordenadas) con el punto dentro de la caja."""
+        return np.sort(self.filas[self._posiciones_en_caja(lon_min, lat_min, lon_max, lat_max)])
+
+    def en_radio(self, lon, lat, radio_km):
+        """Devuelve (filas, distancias en km) a menos de `radio_km`, de la más cercana a la más lejana."""
+        # Caja exacta del círculo sobre la misma esfera que usa distancias_km
+        angulo = radio_km / RADIO_TIERRA_KM
+        dlat = np.degrees(angulo)
+        seno = np.sin(min(angulo, np.pi / 2)) / max(np.cos(np.radians(lat)), 1e-12)
+        dlon = np.degrees(np.arcsin(seno)) if seno < 1 else 180.0
+        pos = self._posiciones_en_caja(lon - dlon, lat - dlat, lon + dlon, lat + dlat)
+        dist = distancias_km(lon, lat, self.lons[pos], self.lats[pos])
+        cerca = dist <= radio_km
+        pos, dist = pos[cerca], dist[cerca]
+        orden = np.lexsort((self.filas[pos], dist))
+        return self.filas[pos][orden], dist[orden]
+
+
+# Separadores de las listas de identificadores (p. ej. RADICADOS ASOCIADOS)
+_SEPARADORES_CLAVE = re.compile(r'[\s,;/]+')
+# Signos que pueden rodear un identificador escrito en una pregunta
+_PUNTUACION_CLAVE = '.,;:?!¿¡()[]"\'#'
+
+
+def normalizar_clave(valor):
+    """
+    Forma canónica de un identificador: minúsculas y sin el '.0' que deja pandas
+    en los números leídos como float (2024010048235.0 -> '2024010048235').
+    """
+    if isinstance(valor, float):
+        if valor != valor:  # NaN
+            return ""
+        if valor.is_integer():
+            return str(int(valor))
+    texto = str(valor).strip().lower().strip(_PUNTUACION_CLAVE)
+    if texto.endswith('.0') and texto[:-2].isdigit():
+        texto = texto[:-2]
+    return texto
+
+
+def claves_de_valor(valor):
+    """Todas las claves contenidas en una celda (las listas se separan en elementos)."""
+    if valor is None:
+        return []
+    if isinstance(valor, (int, float)):
+        clave = normalizar_clave(valor)
+        return [clave] if clave else []
+    claves = [normalizar_clave(parte) for parte in _SEPARADORES_CLAVE.split(str(valor))]
+    return [c for c in claves if c]
+
+
+def claves_de_consulta(consulta_norm):
+    """Tokens de una consulta normalizada que podrían ser identificadores."""
+    claves = [normalizar_clave(parte) for parte in _SEPARADORES_CLAVE.split(consulta_norm)]
+    return [c for c in claves if c]
+
+
+class IndiceClaves:
+    """
+    Índice exacto (diccionario) de identificadores: clave -> filas por columna.
+
+    Cubre radicados, códigos de vía e IDs. Las celdas con listas de radicados
+    (RADICADOS ASOCIADOS) se indexan elemento por elemento, así que un radicado
+    pegado en el chat se resuelve con una sola búsqueda en el diccionario.
+    """
+
+    def __init__(self, columnas):
+        # columnas: {nombre_columna: valores_crudos}
+        # Un diccionario clave -> filas por columna
+        self.columnas = {}
+        for col, valores in columnas.items():
+            claves = defaultdict(list)
+            for fila, valor in enumerate(valores):
+                for clave in set(claves_de_valor(valor)):
+                    claves[clave].append(fila)
+            self.columnas[col] = {clave: np.array(filas, dtype=np.int32) for clave, filas in claves.items()}
+
+    @classmethod
+    def desde_estado(cls, estado):
+        """Índice guardado con estado() (p. ej. en la caché de tablas), sin recorrer las filas."""
+        indice = cls.__new__(cls)
+        indice.columnas = dict(estado)
+        return indice
+
+    def estado(self):
+        """Por columna, el diccionario clave -> filas."""
+        return self.columnas
+
+    def buscar(self, clave):
+        """Devuelve {columna: filas} para una clave ya normalizada ({} si no existe)."""
+        return {col: claves[clave] for col, claves in self.columnas.items() if clave in claves}
+
+
+# Una entidad de lugar encontrada en la consulta (inicio/fin son posiciones en el
+# texto normalizado; municipios solo aplica a veredas)
+EntidadLugar = namedtuple('EntidadLugar', ['tipo', 'nombre', 'inicio', 'fin', 'norm', 'municipios'])
+
+# Prioridad entre tipos cuando dos nombres cubren exactamente el mismo texto
+PRIORIDAD_LUGAR = {'municipio': 0, 'subregion': 1, 'vereda': 2}
+
+_PALABRA = re.compile(r'\w+')
+
+
+class Gazetteer:
+    """
+    Detector de lugares (municipios, subregiones y veredas) en una consulta.
+
+    Los nombres se compilan una sola vez en un trie de palabras normalizadas,
+    y la consulta se recorre en una sola pasada quedándose con la coincidencia
+    más larga desde cada posición (así "San Pedro de Urabá" no se lee como la
+    subregión "Urabá"). Solo coinciden palabras completas: "Andes" no aparece
+    dentro de "grandes".
+    """
+
+    def __init__(self):
+        self.trie = {}
+        self.max_palabras = 0
+
+    def agregar(self, tipo, nombre, norm, municipio=None):
+        palabras = _PALABRA.findall(norm)
+        if not palabras:
+            return
+        nodo = self.trie
+        for palabra in palabras:
+            nodo = nodo.setdefault(palabra, {})
+        actual = nodo.get(None)
+        if actual is None or PRIORIDAD_LUGAR[tipo] < PRIORIDAD_LUGAR[actual['tipo']]:
+            actual = {'tipo': tipo, 'nombre': nombre, 'norm': norm, 'municipios': set()}
+            nodo[None] = actual
+        if actual['tipo'] == tipo and municipio:
+            actual['municipios'].add(municipio)
+        self.max_palabras = max(self.max_palabras, len(palabras))
+
+    def buscar(self, consulta_norm):
+        """Lista de EntidadLugar en orden de aparición, sin solapamientos."""
+        palabras = list(_PALABRA.finditer(consulta_norm))
+        entidades = []
+        i = 0
+        while i < len(palabras):
+            nodo = self.trie
+            mejor = None
+            for j in range(i, min(len(palabras), i + self.max_palabras)):
+                nodo = nodo.get(palabras[j].group())
+                if nodo is None:
+                    break
+                if None in nodo:
+                    mejor = (j, nodo[None])
+            if mejor is None:
+                i += 1
+                continue
+            j, datos = mejor
+            entidades.append(EntidadLugar(datos['tipo'], datos['nombre'], palabras[i].start(),
+                                          palabras[j].end(), datos['norm'],
+                                          tuple(sorted(datos['municipios']))))
+            i = j + 1
+        return entidades
+
+
+def primer_lugar(entidades, tipo):
+    """Primera entidad de un tipo, o None."""
+    return next((e for e in entidades if e.tipo == tipo), None)
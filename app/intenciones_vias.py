@@ -0,0 +1,91 @@
+import re
+from collections import namedtuple
+
+try:
+    from tablas_vias import normalize
+    from indices_vias import primer_lugar
+except ImportError:
+    from app.tablas_vias import normalize
+    from app.indices_vias import primer_lugar
+
+# Palabras que no aportan a la búsqueda por texto
+STOP_WORDS = {'el', 'la', 'los', 'las', 'de', 'en', 'y', 'a', 'que', 'es', 'un', 'una', 'cual', 'cuales',
+              'dame', 'muestrame', 'informacion', 'sobre', 'del', 'por'}
+
+# Rasgos de la consulta y las expresiones que los activan. Como en las reglas
+# originales, basta con que la expresión aparezca dentro de la consulta
+# normalizada ('via' activa con "vias", 'necesidad' con "necesidades").
+RASGOS = {
+    'estadistica': ['total', 'cantidad', 'cuantos', 'numero', 'suma', 'cuantas', 'cuanto'],
+    'listado': ['cuales', 'que radicados', 'que proyectos', 'lista', 'listado', 'dame los radicados',
+                'muestrame los radicados'],
+    'dinero': ['aporte', 'inversion', 'costo', 'valor', 'presupuesto', 'dinero', 'plata', 'cuanto'],
+    'aporte': ['aporte', 'gobernacion'],
+    'valor': ['valor', 'costo', 'presupuesto'],
+    'cercania': ['cerca de', 'cerca a', 'cercanas a', 'cercanos a', 'cercania', 'alrededor de',
+                 'proximas a', 'proximos a', 'a menos de'],
+    # Entidades
+    'necesidad': ['necesidad'],
+    'via': ['via', 'carretera'],
+    'radicado': ['radicado'],
+    'solicitud': ['solicitud'],
+    'proyecto': ['proyecto'],
+}
+
+ENTIDADES = ('necesidad', 'via', 'radicado', 'solicitud', 'proyecto')
+
+# Una expresión regular por rasgo, compilada una sola vez
+_PATRONES_RASGOS = {rasgo: re.compile('|'.join(re.escape(k) for k in sorted(claves, key=len, reverse=True)))
+                    for rasgo, claves in RASGOS.items()}
+
+# Intención estructurada de una consulta:
+#   estadistica / listado: si pide conteos o un listado
+#   entidades: entidades mencionadas (subconjunto de ENTIDADES)
+#   metrica: 'aporte', 'valor' o None (solo si pide dinero)
+#   ambito: 'municipio', 'subregion' o 'global'; lugar: EntidadLugar del ámbito
+#   cercania: si pide lo que está cerca de un lugar; vereda: EntidadLugar o None
+Intencion = namedtuple('Intencion', ['consulta_norm', 'palabras_clave', 'estadistica', 'listado',
+                                     'entidades', 'metrica', 'ambito', 'lugar', 'cercania', 'vereda'])
+
+
+def rasgos_de(consulta_norm):
+    """Conjunto de rasgos presentes en una consulta normalizada."""
+    return {rasgo for rasgo, patron in _PATRONES_RASGOS.items() if patron.search(consulta_norm)}
+
+
+def clasificar_consulta(consulta, gazetteer, consulta_norm=None):
+    """
+    Normaliza y tokeniza la consulta una sola vez y devuelve su Intencion.
+    Si hay municipio se usa como ámbito; si no, la subregión; si no, 'global'.
+    Si la consulta ya viene normalizada se puede pasar en `consulta_norm`.
+    """
+    if consulta_norm is None:
+        consulta_norm = normalize(consulta)
+    palabras_clave = [p for p in consulta_norm.split() if p not in STOP_WORDS and len(p) > 2]
+    rasgos = rasgos_de(consulta_norm)
+
+    metrica = None
+    if 'dinero' in rasgos:
+        if 'aporte' in rasgos:
+            metrica = 'aporte'
+        elif 'valor' in rasgos:
+            metrica = 'valor'
+
+    lugares = gazetteer.buscar(consulta_norm)
+    lugar = primer_lugar(lugares, 'municipio')
+    ambito = 'municipio'
+    if lugar is None:
+        lugar = primer_lugar(lugares, 'subregion')
+        ambito = 'subregion' if lugar else 'global'
+
+    return Intencion(consulta_norm, palabras_clave, 'estadistica' in rasgos, 'listado' in rasgos,
+                     frozenset(e for e in ENTIDADES if e in rasgos), metrica, ambito, lugar,
+                     'cercania' in rasgos, primer_lugar(lugares, 'vereda'))
+
+
+def despachar(manejadores, intencion):
+    """
+    Primer manejador de una tabla de despacho [(entidad, manejador), ...] cuya
+    entidad aparece en la consulta (el orden de la tabla es la prioridad).
+    """
+    return next((manejador for entidad, manejador in manejadores if entidad in intencion.entidades), None)
@@ -14,6 +14,12 @@ except Exception as e:
     print(f"❌ Error importando rag: {e}")
     st.error(f"Error al cargar módulos: {e}")
 
+try:
+    from paginacion_vias import SesionListados
+except Exception as e:
+    print(f"❌ Error importando paginacion_vias: {e}")
+    SesionListados = None
+
 
 # Inicializar historial de chat al principio para controlar la UI
 if "messages" not in st.session_state:
@@ -25,6 +31,10 @@ if "stop_generation" not in st.session_state:
 if "is_generating" not in st.session_state:
     st.session_state.is_generating = False
 
+# Cursores de los listados de vías ("ver más" / "siguientes")
+if "listados" not in st.session_state and SesionListados is not None:
+    st.session_state.listados = SesionListados()
+
 # Configuración de página con identidad institucional
 st.set_page_config(
     page_title="Allison - Gobernación de Antioquia",
@@ -1071,7 +1081,7 @@ if prompt:
             try:
                 # Buscar información de capas GIS y datos de vías antes de invocar la cadena
                 info_capas = buscar_capa_gis(prompt)
-                info_vias = buscar_datos_vias(prompt)
+                info_vias = buscar_datos_vias(prompt, sesion=st.session_state.get("listados"))
                 
                 # Si encontramos capas o datos, las añadimos al prompt invisiblemente para que el modelo las use
                 prompt_con_contexto = prompt
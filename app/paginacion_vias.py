@@ -0,0 +1,91 @@
+import re
+import threading
+import uuid
+from collections import OrderedDict
+
+# Tamaño de página de los listados (radicados, proyectos) y máximo que se puede pedir
+TAMANO_PAGINA = 10
+TAMANO_MAXIMO = 100
+
+# Cursores que guarda cada sesión (los más viejos se descartan)
+MAX_CURSORES = 20
+
+# Palabras con las que se pide la página siguiente ("siguientes", "ver más",
+# "dame 20 más") y las que pueden acompañarlas
+PALABRAS_SIGUIENTE = {'siguientes', 'siguiente', 'mas', 'otros', 'otras', 'proximos', 'proximas'}
+PALABRAS_RELLENO = {'ver', 'dame', 'muestrame', 'mostrar', 'quiero', 'pasame', 'y', 'los', 'las', 'el', 'la',
+                    'de', 'a', 'por', 'favor', 'porfa', 'pagina', 'resultados', 'radicados', 'proyectos',
+                    'necesidades', 'en', 'paginas'}
+
+_NUMERO = re.compile(r'\d+')
+
+
+def es_continuacion(consulta_norm):
+    """Si la consulta (normalizada) solo pide la página siguiente del último listado."""
+    palabras = consulta_norm.replace('?', ' ').replace('.', ' ').replace(',', ' ').split()
+    if not palabras or not PALABRAS_SIGUIENTE & set(palabras):
+        return False
+    return all(p in PALABRAS_SIGUIENTE or p in PALABRAS_RELLENO or p.isdigit() for p in palabras)
+
+
+def tamano_pedido(consulta_norm):
+    """Tamaño de página pedido en la consulta ("de a 20", "20 más") o None."""
+    m = _NUMERO.search(consulta_norm)
+    if not m:
+        return None
+    return max(1, min(int(m.group()), TAMANO_MAXIMO))
+
+
+class CursorListado:
+    """Posición dentro de un listado ya calculado (sus filas no se vuelven a filtrar)."""
+
+    def __init__(self, listado, posicion, tamano):
+        self.listado = listado
+        self.posicion = posicion
+        self.tamano = tamano
+
+
+class SesionListados:
+    """
+    Cursores de los listados de una sesión de chat.
+
+    Cada listado se guarda con un token bajo el que queda su posición; "ver
+    más" sigue el último listado abierto. Pedir una página solo corta el
+    arreglo de filas del listado, así que cuesta lo que mide la página.
+    """
+
+    def __init__(self, tamano_pagina=TAMANO_PAGINA, max_cursores=MAX_CURSORES):
+        self.tamano_pagina = tamano_pagina
+        self.max_cursores = max_cursores
+        self._cursores = OrderedDict()
+        self.ultimo = None
+        self._lock = threading.Lock()
+
+    def abrir(self, listado, mostradas):
+        """
+        Guarda un listado del que ya se mostraron `mostradas` filas y devuelve
+        su token; las páginas siguientes son de tamano_pagina filas.
+        """
+        token = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._cursores[token] = CursorListado(listado, mostradas, self.tamano_pagina)
+            while len(self._cursores) > self.max_cursores:
+                self._cursores.popitem(last=False)
+            self.ultimo = token
+        return token
+
+    def siguiente(self, token=None, tamano=None):
+        """
+        Texto de la página siguiente del listado `token` (por defecto, el
+        último), o None si no hay cursor o ya se mostró todo.
+        """
+        with self._lock:
+            cursor = self._cursores.get(token or self.ultimo)
+            if cursor is None or cursor.posicion >= cursor.listado.total:
+                return None
+            if tamano:
+                cursor.tamano = tamano
+            inicio = cursor.posicion
+            cursor.posicion = min(inicio + cursor.tamano, cursor.listado.total)
+            tamano = cursor.tamano
+        return cursor.listado.pagina(inicio, tamano)
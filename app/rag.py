@@ -1,8 +1,8 @@
 import os
 import time
+from collections import namedtuple
+import numpy as np
 import pandas as pd
-import unicodedata
-import difflib
 import streamlit as st
 from tqdm import tqdm
 from langchain_community.vectorstores import Chroma
@@ -13,6 +13,33 @@ from langchain_openai import ChatOpenAI
 from langchain.chains import RetrievalQA
 from langchain_core.prompts import PromptTemplate
 
+try:
+    from tablas_vias import registro_tablas, normalize, normalizar_serie, SUFIJO_NORM
+    from indices_vias import claves_de_consulta, normalizar_clave, SelectorTopK
+    from estadisticas_vias import obtener_cubo, COLUMNAS_AMBITO
+    from intenciones_vias import clasificar_consulta, despachar
+    from formato_vias import plan_fuente, formatear_fase, formatear_fecha
+    from busqueda_vias import puntuar_archivos, puntuar_archivos_lote, MAX_POR_TABLA
+    from cache_resultados import CacheResultados, FALTA
+    from espacial_vias import obtener_espacial, radio_de_consulta
+    from traza_vias import TrazaBusqueda, SIN_TRAZA, traza_activa, emitir
+    from paginacion_vias import TAMANO_PAGINA, es_continuacion, tamano_pedido
+    from catalogo_tablas import definicion_de
+    from capas_gis import obtener_catalogo, version_catalogo, terminos
+except ImportError:
+    from app.tablas_vias import registro_tablas, normalize, normalizar_serie, SUFIJO_NORM
+    from app.indices_vias import claves_de_consulta, normalizar_clave, SelectorTopK
+    from app.estadisticas_vias import obtener_cubo, COLUMNAS_AMBITO
+    from app.intenciones_vias import clasificar_consulta, despachar
+    from app.formato_vias import plan_fuente, formatear_fase, formatear_fecha
+    from app.busqueda_vias import puntuar_archivos, puntuar_archivos_lote, MAX_POR_TABLA
+    from app.cache_resultados import CacheResultados, FALTA
+    from app.espacial_vias import obtener_espacial, radio_de_consulta
+    from app.traza_vias import TrazaBusqueda, SIN_TRAZA, traza_activa, emitir
+    from app.paginacion_vias import TAMANO_PAGINA, es_continuacion, tamano_pedido
+    from app.catalogo_tablas import definicion_de
+    from app.capas_gis import obtener_catalogo, version_catalogo, terminos
+
 # Configuración de rutas
 DATA_PATH = "data"
 DB_PATH = "chroma_db"
@@ -25,583 +52,576 @@ if not api_key:
 else:
     os.environ["OPENAI_API_KEY"] = api_key  # Asegurar que esté disponible
 
-def buscar_datos_vias(consulta):
+# Puntaje de una fila encontrada por identificador exacto (mismo peso que la
+# coincidencia exacta de una palabra clave con el código)
+PUNTAJE_CLAVE_EXACTA = 500
+
+# Resultados que se devuelven en total
+MAX_RESULTADOS = 7
+
+# Palabras que pueden acompañar a un identificador sin que deje de ser una
+# consulta exacta (p. ej. "radicado 2024010031666")
+PALABRAS_IDENTIFICADOR = {'radicado', 'radicados', 'necesidad', 'codigo', 'via', 'vias',
+                          'numero', 'nro', 'solicitud', 'id_necesidad', 'id_radicados'}
+
+# --- ESTADÍSTICAS (CONTEOS Y TOTALES) ---
+# Los conteos y sumas salen del cubo precalculado al cargar las tablas.
+# Cada manejador recibe (cubo, intencion) y devuelve el texto o None.
+
+# Columna a sumar y nombre del concepto para cada métrica de dinero
+METRICAS_DINERO = {
+    'aporte': ('APORTE GOB', "Aporte Total de la Gobernación"),
+    'valor': ('VALOR NECESIDAD SIF', "Valor Total de las Necesidades (SIF)"),
+}
+
+def sujeto_de(intencion):
+    if intencion.ambito == 'municipio':
+        return f"El municipio de {intencion.lugar.nombre}"
+    return f"La subregión de {intencion.lugar.nombre}"
+
+def estadistica_necesidades(cubo, intencion):
+    ambito, lugar = intencion.ambito, intencion.lugar.norm
+    if not cubo.tiene('necesidades', ambito):
+        return None
+    conteo = cubo.conteo('necesidades', ambito, lugar)
+    info_stat = f"ESTADÍSTICA OFICIAL: {sujeto_de(intencion)} tiene un total de {conteo} necesidades registradas en la base de datos."
+
+    # --- LÓGICA DE SUMA FINANCIERA ---
+    if intencion.metrica:
+        col_target, nombre_concepto = METRICAS_DINERO[intencion.metrica]
+        resumen = cubo.dinero('necesidades', ambito, lugar, col_target)
+        if resumen is not None:
+            info_stat += f"\n- {nombre_concepto}: ${resumen.total:,.2f}"
+
+            # Verificar si todos los valores son idénticos (posible indicador municipal)
+            if ambito == 'municipio':
+                if resumen.es_repetido:
+                    info_stat += f"\n  (Nota: El valor ${resumen.valor_unico:,.2f} se repite en los {resumen.positivos} registros encontrados. Verifique si este es un indicador municipal constante o un aporte por proyecto)."
+                else:
+                    info_stat += f"\n  (Calculado sumando los valores de los {resumen.positivos} registros encontrados)."
+    return info_stat
+
+def estadistica_vias(cubo, intencion):
+    # Conteo de VÍAS (terciarias por defecto)
+    if not cubo.tiene('vias_terciarias', intencion.ambito):
+        return None
+    conteo = cubo.conteo('vias_terciarias', intencion.ambito, intencion.lugar.norm)
+    return f"ESTADÍSTICA OFICIAL: {sujeto_de(intencion)} tiene un total de {conteo} vías terciarias registradas."
+
+def estadistica_radicados(cubo, intencion):
+    if not cubo.tiene('radicados', intencion.ambito):
+        return None
+    conteo = cubo.conteo('radicados', intencion.ambito, intencion.lugar.norm)
+    return f"ESTADÍSTICA OFICIAL: {sujeto_de(intencion)} tiene un total de {conteo} radicados/solicitudes registrados."
+
+def estadistica_global_necesidades(cubo, intencion):
+    if not cubo.tiene('necesidades', 'global'):
+        return None
+    conteo = cubo.conteo('necesidades', 'global')
+    return f"ESTADÍSTICA GLOBAL: En total, hay {conteo} necesidades registradas en todo el departamento de Antioquia."
+
+def estadistica_global_radicados(cubo, intencion):
+    if not cubo.tiene('radicados', 'global'):
+        return None
+    conteo = cubo.conteo('radicados', 'global')
+    return f"ESTADÍSTICA GLOBAL: En total, hay {conteo} radicados/solicitudes registrados en todo el departamento."
+
+# Tablas de despacho: el primer manejador cuya entidad aparece en la consulta
+MANEJADORES_ESTADISTICA = {
+    'lugar': [
+        ('necesidad', estadistica_necesidades),
+        ('via', estadistica_vias),
+        ('radicado', estadistica_radicados),
+        ('solicitud', estadistica_radicados),
+    ],
+    # Sin municipio ni subregión específica
+    'global': [
+        ('necesidad', estadistica_global_necesidades),
+        ('radicado', estadistica_global_radicados),
+        ('solicitud', estadistica_global_radicados),
+    ],
+}
+
+# --- LISTADOS (RADICADOS Y PROYECTOS) ---
+# Filas a mostrar por listado para no saturar (las demás, con "ver más")
+LIMITE_LISTADO = TAMANO_PAGINA
+
+def filas_del_lugar(nombre_archivo, intencion):
+    """
+    (tabla, posiciones en orden) de las filas de una tabla en el municipio o la
+    subregión de la consulta, o None si no aplica. Se calculan una vez por
+    lugar y versión del CSV.
+    """
+    col = COLUMNAS_AMBITO[intencion.ambito]
+    def construir(tabla):
+        if tabla is None or col not in tabla.df.columns:
+            return None
+        en_lugar = tabla.df[col + SUFIJO_NORM] == intencion.lugar.norm
+        return tabla, np.flatnonzero(en_lugar.to_numpy(dtype=bool, na_value=False))
+    return registro_tablas.derivado(('listado', nombre_archivo, col, intencion.lugar.norm), [nombre_archivo],
+                                    construir)
+
+class Listado:
+    """
+    Filas de un listado ya filtradas (en orden) y cómo mostrarlas: cada página
+    es un corte del arreglo de posiciones.
+    """
+
+    def __init__(self, titulo, intencion, tabla, filas, columnas, campos):
+        self.titulo = titulo
+        self.intencion = intencion
+        self.tabla = tabla
+        self.filas = filas
+        # campos(row) devuelve [(etiqueta, valor), ...] de cada fila a partir de las columnas que usa
+        self.columnas = [c for c in dict.fromkeys(columnas + ['MUNICIPIO']) if c in tabla.df.columns]
+        self.campos = campos
+
+    @property
+    def total(self):
+        return len(self.filas)
+
+    def pagina(self, inicio=0, tamano=LIMITE_LISTADO):
+        """Texto de las filas [inicio, inicio + tamano) del listado."""
+        intencion = self.intencion
+        fin = min(inicio + tamano, self.total)
+        rango = f" ({inicio + 1}-{fin} de {self.total})" if inicio else ""
+        if intencion.ambito == 'municipio':
+            info_list = f"LISTADO DE {self.titulo} PARA {intencion.lugar.nombre}{rango}:\n"
+        else:
+            info_list = f"LISTADO DE {self.titulo} PARA LA SUBREGIÓN {intencion.lugar.nombre}{rango}:\n"
+        for row in self.tabla.df.iloc[self.filas[inicio:fin]][self.columnas].to_dict('records'):
+            partes = self.campos(row)
+            # En una subregión se indica el municipio de cada fila
+            if intencion.ambito == 'subregion':
+                partes.insert(1, ('Municipio', row.get('MUNICIPIO', '')))
+            info_list += "- " + " | ".join(f"{etiqueta}: {valor}" for etiqueta, valor in partes) + "\n"
+
+        if self.total > fin:
+            info_list += f"... y {self.total - fin} más."
+        return info_list
+
+def listado_de(titulo, nombre_archivo, intencion, columnas, campos):
+    """Listado de las filas de una tabla en el lugar de la consulta (None si no hay ninguna)."""
+    encontradas = filas_del_lugar(nombre_archivo, intencion)
+    if encontradas is None or len(encontradas[1]) == 0:
+        return None
+    tabla, filas = encontradas
+    return Listado(titulo, intencion, tabla, filas, columnas, campos)
+
+def listar_radicados(intencion):
+    columnas = ['RADICADO', 'FECHA', 'PROYECTOS']
+    return listado_de("RADICADOS", "Base_Radicados.csv", intencion, columnas, lambda row: [
+        ('Radicado', row.get('RADICADO', 'S/N')),
+        ('Fecha', formatear_fecha(row.get('FECHA'))),
+        ('Proyecto', row.get('PROYECTOS', 'Sin descripción')),
+    ])
+
+def listar_necesidades(intencion):
+    columnas = ['NECESIDAD', 'FASE PROYECTO']
+    return listado_de("PROYECTOS/NECESIDADES", "Base_Necesidades.csv", intencion, columnas, lambda row: [
+        ('Proyecto', row.get('NECESIDAD', 'Sin descripción')),
+        ('Fase', formatear_fase(row.get('FASE PROYECTO'))),
+    ])
+
+MANEJADORES_LISTADO = [
+    ('radicado', listar_radicados),
+    ('proyecto', listar_necesidades),
+    ('necesidad', listar_necesidades),
+]
+
+# --- CERCANÍA (NECESIDADES CERCA DE UN MUNICIPIO O VEREDA) ---
+# Las filas cercanas van como bloques FUENTE por debajo de estadísticas y
+# listados: 990 para la más cercana, bajando con la distancia.
+PUNTAJE_CERCANIA = 990
+
+def cercanas_necesidades(intencion):
+    """Lista de (score, elemento) con el resumen y las necesidades más cercanas al lugar."""
+    espacial = obtener_espacial()
+    lugar = intencion.lugar if intencion.ambito == 'municipio' else intencion.vereda
+    if espacial is None or lugar is None:
+        return []
+    puntos, descripcion = espacial.centros_de(lugar)
+    if not puntos:
+        return []
+    radio = radio_de_consulta(intencion.consulta_norm)
+    filas, distancias = espacial.cercanas(puntos, radio)
+
+    resumen = f"NECESIDADES CERCA DEL {descripcion.upper()}: {len(filas)} en un radio de {radio:g} km."
+    resultados = [(PUNTAJE_CERCANIA + 1, resumen)]
+    for fila, distancia in zip(filas[:MAX_POR_TABLA], distancias[:MAX_POR_TABLA]):
+        resultados.append((PUNTAJE_CERCANIA - distancia / radio,
+                           (espacial.tabla, int(fila), [('Distancia', f"{distancia:.1f} km")])))
+    return resultados
+
+MANEJADORES_CERCANIA = [
+    ('necesidad', cercanas_necesidades),
+    ('proyecto', cercanas_necesidades),
+]
+
+# Cachés de respuestas: se vacían solas cuando cambian los CSV o el catálogo
+cache_datos_vias = CacheResultados()
+cache_capas_gis = CacheResultados()
+
+def version_catalogo_gis():
+    return version_catalogo(os.path.join(DATA_PATH, "catalogo_capas.csv"))
+
+def buscar_datos_vias(consulta, traza=None, sesion=None):
     """
     Busca en los archivos CSV de vías información relevante.
+    Las respuestas se guardan en caché por consulta normalizada y versión de los CSV.
+    Si se pasa una TrazaBusqueda (o está VIAS_TRAZA / hay observadores), se
+    registran los tiempos de cada etapa. Con una SesionListados, los listados
+    quedan abiertos y "ver más" / "siguientes" devuelve su página siguiente
+    (sin pasar por la caché).
     """
+    if sesion is not None:
+        consulta_norm = normalize(consulta)
+        if es_continuacion(consulta_norm):
+            pagina = sesion.siguiente(tamano=tamano_pedido(consulta_norm))
+            if pagina:
+                return "\n[DATOS DETALLADOS DE VÍAS ENCONTRADOS]:\n" + pagina
+            if sesion.ultimo is not None:
+                return "\n[DATOS DETALLADOS DE VÍAS ENCONTRADOS]:\nYa se mostraron todas las filas del último listado.\n"
+
+    respuesta = buscar_datos_vias_en_cache(consulta, traza)
+    if sesion is not None:
+        abrir_listado(sesion, consulta)
+    return respuesta
+
+def abrir_listado(sesion, consulta):
+    """Si la consulta pide un listado, lo deja abierto en la sesión para pedir más páginas."""
     try:
-        csv_folder = "data_vias_limpia"
-        if not os.path.exists(csv_folder):
-            return ""
-            
-        def normalize(text):
-            if not isinstance(text, str):
-                text = str(text)
-            return ''.join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn').lower().strip()
-
-        palabras_clave = normalize(consulta).split()
-        # Filtrar palabras comunes
-        stop_words = ['el', 'la', 'los', 'las', 'de', 'en', 'y', 'a', 'que', 'es', 'un', 'una', 'cual', 'cuales', 'dame', 'muestrame', 'informacion', 'sobre', 'del', 'por']
-        palabras_clave = [p for p in palabras_clave if p not in stop_words and len(p) > 2]
-        
-        if not palabras_clave:
-            return ""
+        intencion = clasificar_consulta(consulta, registro_tablas.gazetteer())
+        if not (intencion.listado and intencion.ambito != 'global' and intencion.palabras_clave):
+            return
+        manejador = despachar(MANEJADORES_LISTADO, intencion)
+        listado = manejador(intencion) if manejador else None
+        if listado:
+            sesion.abrir(listado, min(listado.total, LIMITE_LISTADO))
+    except Exception as e:
+        print(f"Error listando datos: {e}")
 
-        coincidencias = []
-        
-        # --- LÓGICA DE ANÁLISIS ESTADÍSTICO (CONTEOS Y TOTALES) ---
-        # Detectar si el usuario pide totales o cantidades
-        keywords_estadisticas = ['total', 'cantidad', 'cuantos', 'numero', 'suma', 'cuantas', 'cuanto']
-        pide_estadistica = any(k in normalize(consulta) for k in keywords_estadisticas)
-        
-        if pide_estadistica:
-            try:
-                # Cargar lista de municipios para identificar de cuál se habla
-                municipios_path = os.path.join(csv_folder, "Municipios_decodificado.csv")
-                municipio_detectado = None
-                subregion_detectada = None
-                
-                if os.path.exists(municipios_path):
-                    df_mun = pd.read_csv(municipios_path, encoding='utf-8-sig')
-                    # Buscar si algún municipio está en la consulta
-                    for mun in df_mun['MPIO_NOMBRE'].dropna().unique():
-                        if normalize(str(mun)) in normalize(consulta):
-                            municipio_detectado = str(mun)
-                            break
-                
-                # Detectar subregión si no hay municipio
-                if not municipio_detectado:
-                    # Lista de subregiones de Antioquia
-                    subregiones_antioquia = ['Urabá', 'Bajo Cauca', 'Nordeste', 'Norte', 'Occidente', 
-                                            'Oriente', 'Suroeste', 'Valle de Aburrá', 'Magdalena Medio']
-                    for subregion in subregiones_antioquia:
-                        if normalize(subregion) in normalize(consulta):
-                            subregion_detectada = subregion
-                            break
-                
-                if municipio_detectado:
-                    # Caso 1: Conteo y Sumas de NECESIDADES
-                    if 'necesidad' in normalize(consulta):
-                        necesidades_path = os.path.join(csv_folder, "Base_Necesidades.csv")
-                        if os.path.exists(necesidades_path):
-                            df_nec = pd.read_csv(necesidades_path, encoding='utf-8-sig')
-                            # Filtrar por municipio (normalizando para evitar errores de tildes)
-                            # Crear columna temporal normalizada para el filtro
-                            df_nec['mun_norm'] = df_nec['MUNICIPIO'].apply(lambda x: normalize(str(x)) if pd.notna(x) else "")
-                            mun_target_norm = normalize(municipio_detectado)
-                            
-                            df_filtered = df_nec[df_nec['mun_norm'] == mun_target_norm]
-                            conteo = df_filtered.shape[0]
-                            
-                            info_stat = f"ESTADÍSTICA OFICIAL: El municipio de {municipio_detectado} tiene un total de {conteo} necesidades registradas en la base de datos."
-                            
-                            # --- LÓGICA DE SUMA FINANCIERA ---
-                            # Detectar si piden dinero/aportes
-                            keywords_dinero = ['aporte', 'inversion', 'costo', 'valor', 'presupuesto', 'dinero', 'plata', 'cuanto']
-                            if any(k in normalize(consulta) for k in keywords_dinero):
-                                col_target = None
-                                nombre_concepto = "valor total"
-                                
-                                # Determinar qué columna sumar
-                                if 'aporte' in normalize(consulta) or 'gobernacion' in normalize(consulta):
-                                    col_target = 'APORTE GOB'
-                                    nombre_concepto = "Aporte Total de la Gobernación"
-                                elif 'valor' in normalize(consulta) or 'costo' in normalize(consulta) or 'presupuesto' in normalize(consulta):
-                                    col_target = 'VALOR NECESIDAD SIF'
-                                    nombre_concepto = "Valor Total de las Necesidades (SIF)"
-                                
-                                if col_target and col_target in df_filtered.columns:
-                                    # Función para limpiar moneda
-                                    def clean_money(val):
-                                        try:
-                                            if pd.isna(val): return 0.0
-                                            return float(str(val).replace('$', '').replace(',', '').strip())
-                                        except:
-                                            return 0.0
-                                    
-                                    total_sum = df_filtered[col_target].apply(clean_money).sum()
-                                    
-                                    # Verificar si todos los valores son idénticos (posible indicador municipal)
-                                    valores = df_filtered[col_target].apply(clean_money).tolist()
-                                    valores = [v for v in valores if v > 0]
-                                    es_valor_repetido = False
-                                    if len(valores) > 1 and len(set(valores)) == 1:
-                                        es_valor_repetido = True
-                                    
-                                    info_stat += f"\n- {nombre_concepto}: ${total_sum:,.2f}"
-                                    
-                                    if es_valor_repetido:
-                                        val_unico = valores[0]
-                                        info_stat += f"\n  (Nota: El valor ${val_unico:,.2f} se repite en los {len(valores)} registros encontrados. Verifique si este es un indicador municipal constante o un aporte por proyecto)."
-                                    else:
-                                        info_stat += f"\n  (Calculado sumando los valores de los {len(valores)} registros encontrados)."
-                            
-                            coincidencias.append({'text': info_stat, 'score': 999}) # Score altísimo para que salga primero
-                            
-                    # Caso 2: Conteo de VÍAS (Ejemplo)
-                    elif 'via' in normalize(consulta) or 'carretera' in normalize(consulta):
-                        # Buscar en terciarias por defecto
-                        vias_path = os.path.join(csv_folder, "Red_vial_terciaria_decodificado.csv")
-                        if os.path.exists(vias_path):
-                            df_vias = pd.read_csv(vias_path, encoding='utf-8-sig')
-                            df_vias['mun_norm'] = df_vias['MUNICIPIO'].apply(lambda x: normalize(str(x)) if pd.notna(x) else "")
-                            mun_target_norm = normalize(municipio_detectado)
-                            conteo = df_vias[df_vias['mun_norm'] == mun_target_norm].shape[0]
-                            
-                            info_stat = f"ESTADÍSTICA OFICIAL: El municipio de {municipio_detectado} tiene un total de {conteo} vías terciarias registradas."
-                            coincidencias.append({'text': info_stat, 'score': 999})
-
-                    # Caso 3: Conteo de RADICADOS / SOLICITUDES
-                    elif 'radicado' in normalize(consulta) or 'solicitud' in normalize(consulta):
-                        radicados_path = os.path.join(csv_folder, "Base_Radicados.csv")
-                        if os.path.exists(radicados_path):
-                            df_rad = pd.read_csv(radicados_path, encoding='utf-8-sig')
-                            df_rad['mun_norm'] = df_rad['MUNICIPIO'].apply(lambda x: normalize(str(x)) if pd.notna(x) else "")
-                            mun_target_norm = normalize(municipio_detectado)
-                            conteo = df_rad[df_rad['mun_norm'] == mun_target_norm].shape[0]
-                            
-                            info_stat = f"ESTADÍSTICA OFICIAL: El municipio de {municipio_detectado} tiene un total de {conteo} radicados/solicitudes registrados."
-                            coincidencias.append({'text': info_stat, 'score': 999})
-
-                elif subregion_detectada:
-                    # Caso: Estadísticas por SUBREGIÓN
-                    # Caso 1: Conteo y Sumas de NECESIDADES
-                    if 'necesidad' in normalize(consulta):
-                        necesidades_path = os.path.join(csv_folder, "Base_Necesidades.csv")
-                        if os.path.exists(necesidades_path):
-                            df_nec = pd.read_csv(necesidades_path, encoding='utf-8-sig')
-                            # Filtrar por subregión (normalizando para evitar errores de tildes)
-                            df_nec['subregion_norm'] = df_nec['SUBREGION'].apply(lambda x: normalize(str(x)) if pd.notna(x) else "")
-                            subregion_target_norm = normalize(subregion_detectada)
-                            
-                            df_filtered = df_nec[df_nec['subregion_norm'] == subregion_target_norm]
-                            conteo = df_filtered.shape[0]
-                            
-                            info_stat = f"ESTADÍSTICA OFICIAL: La subregión de {subregion_detectada} tiene un total de {conteo} necesidades registradas en la base de datos."
-                            
-                            # --- LÓGICA DE SUMA FINANCIERA ---
-                            keywords_dinero = ['aporte', 'inversion', 'costo', 'valor', 'presupuesto', 'dinero', 'plata', 'cuanto']
-                            if any(k in normalize(consulta) for k in keywords_dinero):
-                                col_target = None
-                                nombre_concepto = "valor total"
-                                
-                                # Determinar qué columna sumar
-                                if 'aporte' in normalize(consulta) or 'gobernacion' in normalize(consulta):
-                                    col_target = 'APORTE GOB'
-                                    nombre_concepto = "Aporte Total de la Gobernación"
-                                elif 'valor' in normalize(consulta) or 'costo' in normalize(consulta) or 'presupuesto' in normalize(consulta):
-                                    col_target = 'VALOR NECESIDAD SIF'
-                                    nombre_concepto = "Valor Total de las Necesidades (SIF)"
-                                
-                                if col_target and col_target in df_filtered.columns:
-                                    # Función para limpiar moneda
-                                    def clean_money(val):
-                                        try:
-                                            if pd.isna(val): return 0.0
-                                            return float(str(val).replace('$', '').replace(',', '').strip())
-                                        except:
-                                            return 0.0
-                                    
-                                    total_sum = df_filtered[col_target].apply(clean_money).sum()
-                                    
-                                    info_stat += f"\n- {nombre_concepto}: ${total_sum:,.2f}"
-                            
-                            coincidencias.append({'text': info_stat, 'score': 999})
-                    
-                    # Caso 2: Conteo de VÍAS por subregión
-                    elif 'via' in normalize(consulta) or 'carretera' in normalize(consulta):
-                        vias_path = os.path.join(csv_folder, "Red_vial_terciaria_decodificado.csv")
-                        if os.path.exists(vias_path):
-                            df_vias = pd.read_csv(vias_path, encoding='utf-8-sig')
-                            if 'SUBREGION' in df_vias.columns:
-                                df_vias['subregion_norm'] = df_vias['SUBREGION'].apply(lambda x: normalize(str(x)) if pd.notna(x) else "")
-                                subregion_target_norm = normalize(subregion_detectada)
-                                conteo = df_vias[df_vias['subregion_norm'] == subregion_target_norm].shape[0]
-                                
-                                info_stat = f"ESTADÍSTICA OFICIAL: La subregión de {subregion_detectada} tiene un total de {conteo} vías terciarias registradas."
-                                coincidencias.append({'text': info_stat, 'score': 999})
-                    
-                    # Caso 3: Conteo de RADICADOS / SOLICITUDES por subregión
-                    elif 'radicado' in normalize(consulta) or 'solicitud' in normalize(consulta):
-                        radicados_path = os.path.join(csv_folder, "Base_Radicados.csv")
-                        if os.path.exists(radicados_path):
-                            df_rad = pd.read_csv(radicados_path, encoding='utf-8-sig')
-                            if 'SUBREGION' in df_rad.columns:
-                                df_rad['subregion_norm'] = df_rad['SUBREGION'].apply(lambda x: normalize(str(x)) if pd.notna(x) else "")
-                                subregion_target_norm = normalize(subregion_detectada)
-                                conteo = df_rad[df_rad['subregion_norm'] == subregion_target_norm].shape[0]
-                                
-                                info_stat = f"ESTADÍSTICA OFICIAL: La subregión de {subregion_detectada} tiene un total de {conteo} radicados/solicitudes registrados."
-                                coincidencias.append({'text': info_stat, 'score': 999})
+def buscar_datos_vias_en_cache(consulta, traza=None):
+    """
+    buscar_datos_vias_sin_cache a través de la caché de respuestas. Si la
+    búsqueda falla se responde vacío, pero eso no se guarda en la caché.
+    """
+    propia = traza is None and traza_activa()
+    if propia:
+        traza = TrazaBusqueda(consulta)
+    if traza is not None:
+        inicio = time.perf_counter()
+        traza.desde_cache = True
+
+    def calcular():
+        if traza is not None:
+            traza.desde_cache = False
+        return _buscar_datos_vias(consulta, traza)
+    try:
+        respuesta = cache_datos_vias.obtener(normalize(consulta), registro_tablas.version_datos(), calcular)
+    except Exception as e:
+        print(f"Error buscando datos de vías: {e}")
+        respuesta = ""
 
-                else:
-                    # Caso General: Totales Globales (Sin municipio ni subregión específica)
-                    if 'necesidad' in normalize(consulta):
-                        necesidades_path = os.path.join(csv_folder, "Base_Necesidades.csv")
-                        if os.path.exists(necesidades_path):
-                            df_nec = pd.read_csv(necesidades_path, encoding='utf-8-sig')
-                            conteo = df_nec.shape[0]
-                            info_stat = f"ESTADÍSTICA GLOBAL: En total, hay {conteo} necesidades registradas en todo el departamento de Antioquia."
-                            coincidencias.append({'text': info_stat, 'score': 999})
-                            
-                    elif 'radicado' in normalize(consulta) or 'solicitud' in normalize(consulta):
-                        radicados_path = os.path.join(csv_folder, "Base_Radicados.csv")
-                        if os.path.exists(radicados_path):
-                            df_rad = pd.read_csv(radicados_path, encoding='utf-8-sig')
-                            conteo = df_rad.shape[0]
-                            info_stat = f"ESTADÍSTICA GLOBAL: En total, hay {conteo} radicados/solicitudes registrados en todo el departamento."
-                            coincidencias.append({'text': info_stat, 'score': 999})
-
-            except Exception as e:
-                print(f"Error calculando estadísticas: {e}")
-
-        # --- LÓGICA DE LISTADO (RADICADOS Y PROYECTOS) ---
-        # Detectar si el usuario pide listar radicados o proyectos de un municipio o subregión
-        keywords_listado = ['cuales', 'que radicados', 'que proyectos', 'lista', 'listado', 'dame los radicados', 'muestrame los radicados']
-        pide_listado = any(k in normalize(consulta) for k in keywords_listado)
-        
-        if pide_listado:
-            try:
-                # Identificar municipio (reutilizamos lógica anterior o buscamos de nuevo)
-                municipios_path = os.path.join(csv_folder, "Municipios_decodificado.csv")
-                municipio_detectado = None
-                subregion_detectada = None
-                
-                if os.path.exists(municipios_path):
-                    df_mun = pd.read_csv(municipios_path, encoding='utf-8-sig')
-                    for mun in df_mun['MPIO_NOMBRE'].dropna().unique():
-                        if normalize(str(mun)) in normalize(consulta):
-                            municipio_detectado = str(mun)
-                            break
-                
-                # Detectar subregión si no hay municipio
-                if not municipio_detectado:
-                    subregiones_antioquia = ['Urabá', 'Bajo Cauca', 'Nordeste', 'Norte', 'Occidente', 
-                                            'Oriente', 'Suroeste', 'Valle de Aburrá', 'Magdalena Medio']
-                    for subregion in subregiones_antioquia:
-                        if normalize(subregion) in normalize(consulta):
-                            subregion_detectada = subregion
-                            break
-                
-                if municipio_detectado:
-                    mun_target_norm = normalize(municipio_detectado)
-                    
-                    # Listar RADICADOS
-                    if 'radicado' in normalize(consulta):
-                        radicados_path = os.path.join(csv_folder, "Base_Radicados.csv")
-                        if os.path.exists(radicados_path):
-                            df_rad = pd.read_csv(radicados_path, encoding='utf-8-sig')
-                            df_rad['mun_norm'] = df_rad['MUNICIPIO'].apply(lambda x: normalize(str(x)) if pd.notna(x) else "")
-                            
-                            # Filtrar
-                            resultados = df_rad[df_rad['mun_norm'] == mun_target_norm]
-                            
-                            if not resultados.empty:
-                                info_list = f"LISTADO DE RADICADOS PARA {municipio_detectado}:\n"
-                                # Tomar los primeros 10 para no saturar
-                                for idx, row in resultados.head(10).iterrows():
-                                    rad = row.get('RADICADO', 'S/N')
-                                    proy = row.get('PROYECTOS', 'Sin descripción')
-                                    fecha = row.get('FECHA', '')
-                                    info_list += f"- Radicado: {rad} | Fecha: {fecha} | Proyecto: {proy}\n"
-                                
-                                if len(resultados) > 10:
-                                    info_list += f"... y {len(resultados)-10} más."
-                                    
-                                coincidencias.append({'text': info_list, 'score': 998})
-
-                    # Listar PROYECTOS/NECESIDADES
-                    elif 'proyecto' in normalize(consulta) or 'necesidad' in normalize(consulta):
-                        necesidades_path = os.path.join(csv_folder, "Base_Necesidades.csv")
-                        if os.path.exists(necesidades_path):
-                            df_nec = pd.read_csv(necesidades_path, encoding='utf-8-sig')
-                            df_nec['mun_norm'] = df_nec['MUNICIPIO'].apply(lambda x: normalize(str(x)) if pd.notna(x) else "")
-                            
-                            resultados = df_nec[df_nec['mun_norm'] == mun_target_norm]
-                            
-                            if not resultados.empty:
-                                info_list = f"LISTADO DE PROYECTOS/NECESIDADES PARA {municipio_detectado}:\n"
-                                for idx, row in resultados.head(10).iterrows():
-                                    nec = row.get('NECESIDAD', 'Sin descripción')
-                                    fase = row.get('FASE PROYECTO', 'No definida')
-                                    
-                                    # Mapeo de fase
-                                    try:
-                                        fase_num = int(float(fase))
-                                        mapa_fases = {1: "Perfil", 2: "Prefactibilidad", 3: "Factibilidad"}
-                                        if fase_num in mapa_fases:
-                                            fase = f"{fase_num} ({mapa_fases[fase_num]})"
-                                    except:
-                                        pass
-                                        
-                                    info_list += f"- Proyecto: {nec} | Fase: {fase}\n"
-                                
-                                if len(resultados) > 10:
-                                    info_list += f"... y {len(resultados)-10} más."
-                                    
-                                coincidencias.append({'text': info_list, 'score': 998})
-
-                elif subregion_detectada:
-                    subregion_target_norm = normalize(subregion_detectada)
-                    
-                    # Listar RADICADOS por subregión
-                    if 'radicado' in normalize(consulta):
-                        radicados_path = os.path.join(csv_folder, "Base_Radicados.csv")
-                        if os.path.exists(radicados_path):
-                            df_rad = pd.read_csv(radicados_path, encoding='utf-8-sig')
-                            if 'SUBREGION' in df_rad.columns:
-                                df_rad['subregion_norm'] = df_rad['SUBREGION'].apply(lambda x: normalize(str(x)) if pd.notna(x) else "")
-                                
-                                # Filtrar
-                                resultados = df_rad[df_rad['subregion_norm'] == subregion_target_norm]
-                                
-                                if not resultados.empty:
-                                    info_list = f"LISTADO DE RADICADOS PARA LA SUBREGIÓN {subregion_detectada}:\n"
-                                    # Tomar los primeros 10 para no saturar
-                                    for idx, row in resultados.head(10).iterrows():
-                                        rad = row.get('RADICADO', 'S/N')
-                                        proy = row.get('PROYECTOS', 'Sin descripción')
-                                        fecha = row.get('FECHA', '')
-                                        mun = row.get('MUNICIPIO', '')
-                                        info_list += f"- Radicado: {rad} | Municipio: {mun} | Fecha: {fecha} | Proyecto: {proy}\n"
-                                    
-                                    if len(resultados) > 10:
-                                        info_list += f"... y {len(resultados)-10} más."
-                                        
-                                    coincidencias.append({'text': info_list, 'score': 998})
-
-                    # Listar PROYECTOS/NECESIDADES por subregión
-                    elif 'proyecto' in normalize(consulta) or 'necesidad' in normalize(consulta):
-                        necesidades_path = os.path.join(csv_folder, "Base_Necesidades.csv")
-                        if os.path.exists(necesidades_path):
-                            df_nec = pd.read_csv(necesidades_path, encoding='utf-8-sig')
-                            df_nec['subregion_norm'] = df_nec['SUBREGION'].apply(lambda x: normalize(str(x)) if pd.notna(x) else "")
-                            
-                            resultados = df_nec[df_nec['subregion_norm'] == subregion_target_norm]
-                            
-                            if not resultados.empty:
-                                info_list = f"LISTADO DE PROYECTOS/NECESIDADES PARA LA SUBREGIÓN {subregion_detectada}:\n"
-                                for idx, row in resultados.head(10).iterrows():
-                                    nec = row.get('NECESIDAD', 'Sin descripción')
-                                    fase = row.get('FASE PROYECTO', 'No definida')
-                                    mun = row.get('MUNICIPIO', '')
-                                    
-                                    # Mapeo de fase
-                                    try:
-                                        fase_num = int(float(fase))
-                                        mapa_fases = {1: "Perfil", 2: "Prefactibilidad", 3: "Factibilidad"}
-                                        if fase_num in mapa_fases:
-                                            fase = f"{fase_num} ({mapa_fases[fase_num]})"
-                                    except:
-                                        pass
-                                        
-                                    info_list += f"- Proyecto: {nec} | Municipio: {mun} | Fase: {fase}\n"
-                                
-                                if len(resultados) > 10:
-                                    info_list += f"... y {len(resultados)-10} más."
-                                    
-                                coincidencias.append({'text': info_list, 'score': 998})
-
-            except Exception as e:
-                print(f"Error listando datos: {e}")
-
-        # Priorizar archivos de vías y bases de datos generales
-        archivos_vias = [f for f in os.listdir(csv_folder) if (f.startswith('Red_vial') or f.startswith('Base_')) and f.endswith('.csv')]
-        
-        # Si no hay archivos de vías, buscar en todos (fallback)
-        if not archivos_vias:
-            archivos_vias = [f for f in os.listdir(csv_folder) if f.endswith('.csv')]
+    if traza is not None:
+        traza.segundos = time.perf_counter() - inicio
+        if propia:
+            emitir(traza)
+    return respuesta
+
+def buscar_datos_vias_con_traza(consulta):
+    """(respuesta, TrazaBusqueda) de una consulta."""
+    traza = TrazaBusqueda(consulta)
+    return buscar_datos_vias(consulta, traza), traza
+
+def archivos_de_busqueda():
+    """
+    Archivos que recorre la búsqueda por texto: los que tienen entrada en
+    CATALOGO_TABLAS con peso (las que piden una entidad se saltan solas si la
+    consulta no la nombra).
+    """
+    return [f for f in registro_tablas.archivos() if definicion_de(f) is not None and definicion_de(f).peso > 0]
+
+# Búsqueda en curso: su intención, el top global y si se resolvió por identificador
+EstadoBusqueda = namedtuple('EstadoBusqueda', ['intencion', 'coincidencias', 'por_clave'])
+
+def preparar_busqueda(consulta, gazetteer, archivos_vias, traza=SIN_TRAZA, consulta_norm=None):
+    """
+    Clasifica la consulta y resuelve todo lo que no es puntuación difusa:
+    estadísticas, listados, cercanía e identificadores exactos. Devuelve el
+    EstadoBusqueda, o None si la consulta no tiene palabras clave.
+    """
+    # La consulta se normaliza, tokeniza y clasifica una sola vez
+    # (tipo de pedido, entidades, métrica y lugar)
+    with traza.etapa('clasificacion'):
+        intencion = clasificar_consulta(consulta, gazetteer, consulta_norm)
+    consulta_norm = intencion.consulta_norm
+    palabras_clave = intencion.palabras_clave
+    
+    if not palabras_clave:
+        return None
+
+    # Top global acotado de todas las fuentes (estadísticas, listados y filas)
+    coincidencias = SelectorTopK(MAX_RESULTADOS)
+    
+    # --- LÓGICA DE ANÁLISIS ESTADÍSTICO (CONTEOS Y TOTALES) ---
+    if intencion.estadistica:
+        try:
+            with traza.etapa('estadistica') as etapa:
+                manejadores = MANEJADORES_ESTADISTICA['global' if intencion.ambito == 'global' else 'lugar']
+                manejador = despachar(manejadores, intencion)
+                info_stat = manejador(obtener_cubo(), intencion) if manejador else None
+                etapa.renderizadas = int(bool(info_stat))
+            if info_stat:
+                coincidencias.ofrecer(999, info_stat) # Score altísimo para que salga primero
+        except Exception as e:
+            print(f"Error calculando estadísticas: {e}")
+
+    # --- LÓGICA DE LISTADO (RADICADOS Y PROYECTOS) ---
+    # Solo para un municipio o una subregión
+    if intencion.listado and intencion.ambito != 'global':
+        try:
+            with traza.etapa('listado') as etapa:
+                manejador = despachar(MANEJADORES_LISTADO, intencion)
+                listado = manejador(intencion) if manejador else None
+                info_list = listado.pagina() if listado else None
+                etapa.renderizadas = int(bool(info_list))
+            if info_list:
+                coincidencias.ofrecer(998, info_list)
+        except Exception as e:
+            print(f"Error listando datos: {e}")
 
+    # --- LÓGICA DE CERCANÍA (NECESIDADES CERCA DE UN LUGAR) ---
+    if intencion.cercania:
+        try:
+            with traza.etapa('cercania') as etapa:
+                manejador = despachar(MANEJADORES_CERCANIA, intencion)
+                cercanas = manejador(intencion) if manejador else []
+                etapa.candidatos = len(cercanas)
+            for score, elemento in cercanas:
+                coincidencias.ofrecer(score, elemento)
+        except Exception as e:
+            print(f"Error buscando necesidades cercanas: {e}")
+
+    # --- BÚSQUEDA EXACTA POR IDENTIFICADOR (RADICADO, CÓDIGO DE VÍA, ID) ---
+    # Si la consulta es solo un identificador (más palabras como "radicado"),
+    # se resuelve con el índice de claves y se omite la puntuación difusa.
+    with traza.etapa('claves') as etapa:
+        claves_consulta = claves_de_consulta(consulta_norm)
+        filas_exactas = {}
+        claves_encontradas = set()
         for csv_file in archivos_vias:
-            file_path = os.path.join(csv_folder, csv_file)
-            try:
-                # Leer CSV con pandas para facilitar búsqueda
-                # Usar encoding utf-8-sig para manejar correctamente caracteres latinos
-                try:
-                    df = pd.read_csv(file_path, encoding='utf-8-sig')
-                except UnicodeDecodeError:
-                    df = pd.read_csv(file_path, encoding='latin-1')
-                
-                # --- NUEVA LÓGICA DE PUNTUACIÓN BASADA EN SIMILITUD DE NOMBRE ---
-                # El usuario quiere exactitud en el nombre de la vía.
-                # Ignoramos columnas como INICIO, FIN, OBSERVACIONES para el cálculo del score.
-                
-                scores = []
-                query_norm = normalize(consulta)
-                
-                for idx, row in df.iterrows():
-                    current_score = 0
-                    
-                    # 1. Búsqueda en NOMBRE, CÓDIGO y OTROS IDENTIFICADORES (Prioridad Máxima)
-                    name_val = ""
-                    if 'NOMBRE_VIA' in row: name_val = str(row['NOMBRE_VIA'])
-                    elif 'MPIO_NOMBRE' in row: name_val = str(row['MPIO_NOMBRE'])
-                    elif 'VERE_NOMBRE' in row: name_val = str(row['VERE_NOMBRE'])
-                    elif 'PROYECTOS' in row: name_val = str(row['PROYECTOS']) # Nuevo
-                    elif 'NECESIDAD' in row: name_val = str(row['NECESIDAD']) # Nuevo
-                    
-                    code_val = ""
-                    if 'CODIGO_VIA' in row: code_val = str(row['CODIGO_VIA'])
-                    elif 'RADICADO' in row: code_val = str(row['RADICADO']) # Nuevo
-                    elif 'ID_RADICADOS' in row: code_val = str(row['ID_RADICADOS']) # Nuevo
-                    elif 'RADICADOS ASOCIADOS' in row: code_val = str(row['RADICADOS ASOCIADOS']) # Nuevo para Base_Necesidades
-                    
-                    # Combinar nombre y código para la búsqueda
-                    search_targets = []
-                    if name_val and name_val.lower() != 'nan': search_targets.append(name_val)
-                    if code_val and code_val.lower() != 'nan': search_targets.append(code_val)
-                    
-                    for target in search_targets:
-                        target_norm = normalize(target)
-                        
-                        # Coincidencia EXACTA de código o nombre (Score muy alto)
-                        # IMPORTANTE: Para radicados largos, la coincidencia exacta es clave
-                        if target_norm == query_norm:
-                            current_score += 200
-                        
-                        # Coincidencia EXACTA de una palabra clave con el target (Vital para IDs/Radicados)
-                        # Si una de las palabras buscadas es EXACTAMENTE el código/radicado
-                        elif any(p == target_norm for p in palabras_clave):
-                            current_score += 500
-
-                        # Si el target contiene el query (ej: "2024..." en "2024..., 2025...")
-                        # Esto es vital para RADICADOS ASOCIADOS que pueden ser listas
-                        elif query_norm in target_norm and len(query_norm) > 5: # Solo si el query es largo (evitar matches con "1", "2")
-                             current_score += 150
-                        
-                        # Similitud de secuencia
-                        sim = difflib.SequenceMatcher(None, query_norm, target_norm).ratio()
-                        if sim > 0.6: 
-                            current_score += sim * 100
-                        
-                        # Coincidencia de subcadena general
-                        if query_norm in target_norm or target_norm in query_norm:
-                             current_score += 50
-                             
-                        # Coincidencia de palabras clave
-                        matches = sum(1 for p in palabras_clave if p in target_norm)
-                        current_score += matches * 10
-
-                    # 2. Búsqueda en UBICACIÓN (Prioridad Media)
-                    loc_val = ""
-                    if 'MUNICIPIO' in row: loc_val = str(row['MUNICIPIO'])
-                    elif 'SUBREGION' in row: loc_val = str(row['SUBREGION'])
-                    
-                    if loc_val and loc_val.lower() != 'nan':
-                        loc_norm = normalize(loc_val)
-                        if query_norm in loc_norm or loc_norm in query_norm:
-                            current_score += 30
-                        matches = sum(1 for p in palabras_clave if p in loc_norm)
-                        current_score += matches * 5
-                        
-                    scores.append(current_score)
-
-                # Asignar scores y filtrar
-                df['score'] = scores
-                # Solo mostramos resultados con score > 0
-                filas_encontradas = df[df['score'] > 0].sort_values('score', ascending=False)
-                
-                if not filas_encontradas.empty:
-                    # Tomar hasta 5 registros por archivo si tienen buena puntuación
-                    top_rows = filas_encontradas.head(5)
-                    
-                    for _, row in top_rows.iterrows():
-                        nombre_archivo_limpio = csv_file.replace('_decodificado.csv', '').replace('_', ' ')
-                        info = f"FUENTE: {nombre_archivo_limpio} (Relevancia: {row['score']:.2f})\n"
-                        
-                        # Columnas a excluir (técnicas o redundantes)
-                        cols_excluidas = ['OBJECTID', 'Shape__Length', 'Shape__Area', 'GlobalID', 'score', 'Shape', 'FID']
-                        
-                        for col, val in row.items():
-                            # Mostrar todas las columnas que no estén excluidas y tengan valor
-                            if col not in cols_excluidas and pd.notna(val) and str(val).strip() != "":
-                                # Formatear un poco el nombre de la columna para que sea más legible
-                                col_nombre = col.replace('_', ' ').title()
-                                
-                                # Mapeo de Fases del Proyecto
-                                if col == 'FASE PROYECTO':
-                                    try:
-                                        fase_num = int(float(val))
-                                        mapa_fases = {
-                                            1: "Perfil",
-                                            2: "Prefactibilidad",
-                                            3: "Factibilidad"
-                                        }
-                                        if fase_num in mapa_fases:
-                                            val = f"{fase_num} ({mapa_fases[fase_num]})"
-                                    except (ValueError, TypeError):
-                                        pass
-                                
-                                # Formato Moneda para columnas financieras
-                                cols_moneda_keywords = ['VALOR', 'PRESUPUESTO', 'COSTO', 'APORTE', 'SOBRANTE', 'DEUDA', 'INGRESOS', 'GASTOS', 'AHORRO', 'CAPACIDAD MAXIMA']
-                                exclude_keywords = ['PORCENTAJE', 'INDICADOR', 'SOBRE EL TOTAL', 'LIMITE', 'LÍMITE']
-                                
-                                if any(k in col.upper() for k in cols_moneda_keywords) and not any(ex in col.upper() for ex in exclude_keywords):
-                                    try:
-                                        # Intentar convertir a float y formatear
-                                        val_float = float(str(val).replace(',', '').replace('$', ''))
-                                        val = f"${val_float:,.2f}"
-                                    except (ValueError, TypeError):
-                                        pass
-
-                                info += f"- {col_nombre}: {val}\n"
-                                
-                        coincidencias.append({'text': info, 'score': row['score']})
-                        
-            except Exception as e:
-                print(f"Error leyendo {csv_file}: {e}")
+            tabla = registro_tablas.obtener_tabla(csv_file)
+            if tabla is None:
                 continue
+            filas_clave, encontradas = tabla.filas_por_clave(claves_consulta, consulta_norm)
+            if filas_clave:
+                filas_exactas[csv_file] = (tabla, filas_clave)
+                claves_encontradas |= encontradas
+                etapa.candidatos += len(filas_clave)
+        consulta_por_clave = bool(claves_encontradas) and all(
+            normalizar_clave(p) in claves_encontradas or p in PALABRAS_IDENTIFICADOR for p in palabras_clave)
+
+    if consulta_por_clave:
+        # Consulta de identificador: solo las filas del índice de claves,
+        # sin puntuación difusa
+        for tabla, filas_clave in filas_exactas.values():
+            # Hasta MAX_POR_TABLA filas, de más a menos claves encontradas
+            for fila in sorted(filas_clave, key=lambda f: (-filas_clave[f], f))[:MAX_POR_TABLA]:
+                coincidencias.ofrecer(float(PUNTAJE_CLAVE_EXACTA * filas_clave[fila]), (tabla, fila))
+
+    return EstadoBusqueda(intencion, coincidencias, consulta_por_clave)
+
+def ofrecer_filas(coincidencias, tabla, filas, scores):
+    """Ofrece al top global las mejores filas puntuadas de una tabla."""
+    for fila, score in zip(filas, scores):
+        coincidencias.ofrecer(score, (tabla, int(fila)))
+
+def respuesta_de(coincidencias, traza=SIN_TRAZA):
+    """Texto de la respuesta con los ganadores del top global."""
+    # Solo se formatean los ganadores del top global
+    with traza.etapa('formato') as etapa:
+        top_coincidencias = [elemento if isinstance(elemento, str)
+                             else plan_fuente(elemento[0]).formatear(elemento[1], score, *elemento[2:])
+                             for score, elemento in coincidencias.mejores()]
+        etapa.renderizadas = len(top_coincidencias)
+
+    if top_coincidencias:
+        respuesta = "\n[DATOS DETALLADOS DE VÍAS ENCONTRADOS]:\n"
+        respuesta += "\n------------------------------\n".join(top_coincidencias)
+        return respuesta
+    else:
+        return ""
 
-        if coincidencias:
-            # Ordenar todas las coincidencias de todos los archivos por score descendente
-            coincidencias.sort(key=lambda x: x['score'], reverse=True)
-            
-            # Tomar las top 7 globales
-            top_coincidencias = [c['text'] for c in coincidencias[:7]]
-            
-            respuesta = "\n[DATOS DETALLADOS DE VÍAS ENCONTRADOS]:\n"
-            respuesta += "\n------------------------------\n".join(top_coincidencias)
-            return respuesta
-        else:
-            return ""
-
+def buscar_datos_vias_sin_cache(consulta, traza=None):
+    """
+    Busca en los archivos CSV de vías información relevante.
+    """
+    try:
+        return _buscar_datos_vias(consulta, traza)
     except Exception as e:
         print(f"Error buscando datos de vías: {e}")
         return ""
 
+def _buscar_datos_vias(consulta, traza=None):
+    """buscar_datos_vias_sin_cache sin atrapar los errores (así la caché no guarda las fallas)."""
+    traza = traza or SIN_TRAZA
+    csv_folder = "data_vias_limpia"
+    if not os.path.exists(csv_folder):
+        return ""
+
+    archivos_vias = archivos_de_busqueda()
+
+    # Tablas e índices (solo se leen la primera vez o si cambió el CSV)
+    with traza.etapa('carga') as etapa:
+        gazetteer = registro_tablas.gazetteer()
+        if traza.activa:
+            etapa.filas = sum(len(t.df) for t in map(registro_tablas.obtener_tabla, archivos_vias) if t is not None)
+
+    estado = preparar_busqueda(consulta, gazetteer, archivos_vias, traza)
+    if estado is None:
+        return ""
+
+    if not estado.por_clave:
+        # Puntuación difusa por tabla (en paralelo si hay pool); cada tabla
+        # aporta sus mejores filas al top global en el orden de los archivos
+        intencion, coincidencias = estado.intencion, estado.coincidencias
+        for csv_file, (filas, scores, medidas) in puntuar_archivos(
+                archivos_vias, intencion.palabras_clave, intencion.consulta_norm, coincidencias.umbral,
+                traza.activa):
+            if medidas is not None:
+                traza.agregar('puntuacion', csv_file, **medidas)
+            ofrecer_filas(coincidencias, registro_tablas.obtener_tabla(csv_file), filas, scores)
+
+    return respuesta_de(estado.coincidencias, traza)
+
+def buscar_datos_vias_batch(consultas):
+    """
+    Responde muchas consultas de una vez (QA de datos nuevos, informes).
+    Devuelve las respuestas en el mismo orden, iguales a las de buscar_datos_vias.
+    Las consultas se normalizan en bloque, las repetidas se responden una sola
+    vez y las que ya están en la caché no se recalculan.
+
+    La ganancia frente a llamar buscar_datos_vias_sin_cache una por una es
+    modesta (unas 1.2x con el corpus del benchmark: 0.16 s contra 0.20 s para
+    31 consultas distintas), no de un orden de magnitud: se comparte la
+    puntuación de cada tabla, pero la clasificación, los candidatos y el
+    formato siguen siendo por consulta. Normalizar no pesa (menos del 1 %).
+    La ganancia grande es con consultas repetidas o ya guardadas en la caché.
+    """
+    consultas = list(consultas)
+    normalizadas = normalizar_serie(pd.Series(consultas, dtype=object)).tolist()
+    version = registro_tablas.version_datos()
+
+    respuestas = {}
+    for consulta_norm in dict.fromkeys(normalizadas):
+        respuesta = cache_datos_vias.consultar(consulta_norm, version)
+        if respuesta is not FALTA:
+            respuestas[consulta_norm] = respuesta
+
+    pendientes = [q for q in dict.fromkeys(normalizadas) if q not in respuestas]
+    if pendientes:
+        for consulta_norm, respuesta in zip(pendientes, _buscar_datos_vias_lote(pendientes, pendientes)):
+            # Las que fallaron se responden vacías pero no se guardan
+            if respuesta is None:
+                respuesta = ""
+            else:
+                cache_datos_vias.guardar(consulta_norm, version, respuesta)
+            respuestas[consulta_norm] = respuesta
+    return [respuestas[q] for q in normalizadas]
+
+def buscar_datos_vias_batch_sin_cache(consultas, normalizadas=None):
+    """
+    Como buscar_datos_vias_sin_cache para una lista de consultas: las tablas,
+    el gazetteer y la lista de archivos se obtienen una vez, y la puntuación
+    difusa recorre cada tabla una sola vez para todo el lote (los candidatos
+    de las consultas se juntan y cada campo se prueba una vez por valor).
+    `normalizadas` son las consultas ya normalizadas, si quien llama las tiene.
+    """
+    respuestas = _buscar_datos_vias_lote(consultas, normalizadas)
+    return [respuesta if respuesta is not None else "" for respuesta in respuestas]
+
+def _buscar_datos_vias_lote(consultas, normalizadas=None):
+    """Como buscar_datos_vias_batch_sin_cache, con None en las consultas que fallaron."""
+    if not os.path.exists("data_vias_limpia"):
+        return ["" for _ in consultas]
+    archivos_vias = archivos_de_busqueda()
+    gazetteer = registro_tablas.gazetteer()
+    if normalizadas is None:
+        normalizadas = normalizar_serie(pd.Series(consultas, dtype=object)).tolist()
+
+    estados = []
+    for consulta, consulta_norm in zip(consultas, normalizadas):
+        try:
+            estados.append(preparar_busqueda(consulta, gazetteer, archivos_vias, consulta_norm=consulta_norm))
+        except Exception as e:
+            print(f"Error buscando datos de vías: {e}")
+            estados.append(e)
+
+    # Puntuación difusa de todas las consultas que la necesitan, tabla por tabla
+    difusas = [e for e in estados if isinstance(e, EstadoBusqueda) and not e.por_clave]
+    if difusas:
+        lote = [(e.intencion.palabras_clave, e.intencion.consulta_norm) for e in difusas]
+        umbrales = [e.coincidencias.umbral for e in difusas]
+        for csv_file, resultados in puntuar_archivos_lote(archivos_vias, lote, umbrales):
+            tabla = registro_tablas.obtener_tabla(csv_file)
+            for estado, (filas, scores, _) in zip(difusas, resultados):
+                ofrecer_filas(estado.coincidencias, tabla, filas, scores)
+
+    respuestas = []
+    for estado in estados:
+        if not isinstance(estado, EstadoBusqueda):
+            # Sin palabras clave (None) o con error al preparar la búsqueda
+            respuestas.append("" if estado is None else None)
+            continue
+        try:
+            respuestas.append(respuesta_de(estado.coincidencias))
+        except Exception as e:
+            print(f"Error buscando datos de vías: {e}")
+            respuestas.append(None)
+    return respuestas
+
 def buscar_capa_gis(consulta):
     """
     Busca en el catálogo de capas la URL más relevante para la consulta.
+    Las respuestas se guardan en caché por términos de la consulta y versión
+    del catálogo (si la búsqueda falla se responde vacío sin guardarlo).
     """
     try:
-        csv_path = os.path.join(DATA_PATH, "catalogo_capas.csv")
-        if not os.path.exists(csv_path):
-            return ""
-            
-        # Cargar el catálogo
-        df = pd.read_csv(csv_path)
-        
-        # Búsqueda simple de palabras clave
-        palabras_clave = consulta.lower().split()
-        
-        # Filtrar el DataFrame buscando coincidencias en el nombre de la capa
-        # Buscamos si ALGUNA de las palabras clave está en el nombre de la capa
-        resultados = df[df['Nombre_Capa'].apply(lambda x: any(word in str(x).lower() for word in palabras_clave))]
-        
-        if not resultados.empty:
-            # Retornar las top 3 coincidencias
-            top_resultados = resultados.head(3)
-            respuesta = "\n[INFORMACIÓN DE CAPAS GEOGRÁFICAS ENCONTRADA]:\n"
-            for index, row in top_resultados.iterrows():
-                respuesta += f"- Capa: {row['Nombre_Capa']}\n  URL: {row['URL_Servicio']}\n"
-            return respuesta
-        else:
-            return ""
-            
+        return cache_capas_gis.obtener(' '.join(sorted(set(terminos(consulta)))), version_catalogo_gis(),
+                                       lambda: _buscar_capa_gis(consulta))
+    except Exception as e:
+        print(f"Error consultando catálogo GIS: {e}")
+        return ""
+
+def buscar_capa_gis_sin_cache(consulta):
+    """
+    Busca en el catálogo de capas la URL más relevante para la consulta.
+    """
+    try:
+        return _buscar_capa_gis(consulta)
     except Exception as e:
         print(f"Error consultando catálogo GIS: {e}")
         return ""
 
+def _buscar_capa_gis(consulta):
+    """buscar_capa_gis_sin_cache sin atrapar los errores (así la caché no guarda las fallas)."""
+    # Índice del catálogo (solo se construye la primera vez o si cambió)
+    catalogo = obtener_catalogo(version_catalogo_gis(), os.path.join(DATA_PATH, "catalogo_capas.csv"))
+    if catalogo is None:
+        return ""
+
+    # Las capas más relevantes, de mayor a menor puntaje
+    resultados = catalogo.buscar(consulta)
+
+    if resultados:
+        respuesta = "\n[INFORMACIÓN DE CAPAS GEOGRÁFICAS ENCONTRADA]:\n"
+        for nombre, url, _ in resultados:
+            respuesta += f"- Capa: {nombre}\n  URL: {url}\n"
+        return respuesta
+    else:
+        return ""
+
 def load_documents():
     """Carga documentos desde el directorio de datos (TXT y PDF)."""
     if not os.path.exists(DATA_PATH):
@@ -0,0 +1,502 @@
+import os
+import threading
+import unicodedata
+import numpy as np
+import pandas as pd
+
+try:
+    from indices_vias import IndiceInvertido, IndiceSimilitud, IndiceClaves, Gazetteer
+    from cache_vias import CacheTablas, carpeta_cache
+    from catalogo_tablas import DefinicionTabla, definicion_de, columnas_catalogo
+except ImportError:
+    from app.indices_vias import IndiceInvertido, IndiceSimilitud, IndiceClaves, Gazetteer
+    from app.cache_vias import CacheTablas, carpeta_cache
+    from app.catalogo_tablas import DefinicionTabla, definicion_de, columnas_catalogo
+
+# Carpeta con los CSV de vías ya decodificados
+CSV_FOLDER = "data_vias_limpia"
+
+# Columnas por las que se filtra por lugar (listados, estadísticas, cercanía y
+# gazetteer). Las de nombre, código y ubicación de cada tabla están en CATALOGO_TABLAS.
+COLUMNAS_LUGAR = ['MUNICIPIO', 'SUBREGION', 'MPIO_NOMBRE', 'VERE_NOMBRE']
+
+# Columnas con identificadores exactos. El valor es la palabra que debe aparecer
+# en la consulta para aceptar la coincidencia (los IDs cortos como "12" chocarían
+# con cualquier número de la pregunta); None si el identificador basta por sí solo.
+COLUMNAS_CLAVE = {
+    'CODIGO_VIA': None,
+    'RADICADO': None,
+    'RADICADOS ASOCIADOS': None,
+    'ID_NECESIDAD': 'necesidad',
+    'ID_RADICADOS': 'radicado',
+}
+
+# Subregiones de Antioquia (nombres para mostrar)
+SUBREGIONES_ANTIOQUIA = ['Urabá', 'Bajo Cauca', 'Nordeste', 'Norte', 'Occidente',
+                         'Oriente', 'Suroeste', 'Valle de Aburrá', 'Magdalena Medio']
+
+# Columnas financieras comunes a las bases de necesidades y capacidad de endeudamiento
+_DINERO_FINANZAS_MUNICIPALES = [
+    'INGRESOS EJECUTADOS 2024 PROYECTADOS 2025', 'GASTOS EJECUTADOS 2024 PROYECTADOS 2025',
+    'AHORRO OPERACIONAL', 'DEUDA IDEA Incluye por desembolsar',
+    'DEUDAS CON OTROS BANCOS  Incluye por desembolsar', 'SALDO TOTAL DEUDA PROYECTADA',
+    'CAPACIDAD MAXIMA DE ENDEUDAMIENTO AL 100%', 'CAPACIDAD MAXIMA DE ENDEUDAMIENTO AL 80%',
+    'CAPACIDAD MAXIMA DE ENDEUDAMIENTO AL 60%', 'APORTE GOB',
+]
+
+# Esquema de tipos por tabla. Se aplica una sola vez al cargar:
+#   dinero -> float64 ("$1,234.00" -> 1234.0; lo que no se pueda leer queda NaN)
+#   fase   -> Int8 (FASE PROYECTO)
+#   entero -> Int64 (IDs y radicados, sin el ".0" de pandas)
+#   numero -> numérico (acepta coma decimal, p. ej. "6,439195")
+#   fecha  -> datetime64
+ESQUEMAS_TABLAS = {
+    'Base_Necesidades.csv': {
+        'dinero': ['VALOR NECESIDAD SIF', 'SOBRANTE FALTANTE'] + _DINERO_FINANZAS_MUNICIPALES,
+        'fase': ['FASE PROYECTO'],
+        'entero': ['ID_NECESIDAD'],
+        'numero': ['LONGITUD', 'LATITUD'],
+        'fecha': ['FECHA RECEPCION NECESIDAD'],
+    },
+    'Base_Radicados.csv': {
+        'dinero': ['PRESUPUESTO (ELIMINAR)'],
+        'entero': ['ID_RADICADOS', 'RADICADO', 'ID PROYECTOS', 'DIAS TRANSCURRIDOS'],
+        'fecha': ['FECHA'],
+    },
+    'Base_Capacidad_Endeudamiento.csv': {
+        'dinero': _DINERO_FINANZAS_MUNICIPALES + [
+            'SUMATORIA DE PROYECTOS SIF', 'SUMATORIA DE PROYECTOS SED', 'SUMA TOTAL', 'SUMA TOTAL 2',
+            'APORTE GOB2', 'APORTE TOTAL IDEA + GOB', 'SOBRANTE O FALTANTE'],
+    },
+}
+# Las capas Red_vial* comparten esquema
+ESQUEMA_RED_VIAL = {
+    'numero': ['L_ODOMETRO', 'L_GPS', 'ANCHO_VIA'],
+}
+
+# Columnas técnicas de la geometría que nunca se muestran ni se buscan
+COLUMNAS_DESCARTADAS = ['OBJECTID', 'Shape__Length', 'Shape__Area', 'GlobalID', 'Shape', 'FID']
+
+# Una columna de texto se guarda como categoría si tiene a lo sumo esta
+# proporción de valores distintos (MUNICIPIO, SUBREGION, ESTADO, ...)
+MAX_PROPORCION_CATEGORIA = 0.5
+
+# Sufijo de las columnas sombra con el texto ya normalizado (sin tildes, minúsculas)
+SUFIJO_NORM = '_norm'
+COLUMNAS_NORMALIZADAS = list(dict.fromkeys(columnas_catalogo() + COLUMNAS_LUGAR))
+
+
+def normalize(text):
+    """Quita tildes, pasa a minúsculas y recorta espacios."""
+    if not isinstance(text, str):
+        text = str(text)
+    return ''.join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn').lower().strip()
+
+
+def normalizar_serie(serie):
+    """
+    Normaliza una columna completa. Cada valor distinto se normaliza una sola vez
+    y los vacíos (NaN) se conservan como NaN.
+    """
+    mapeo = {val: normalize(str(val)) for val in serie.dropna().unique()}
+    return serie.map(mapeo)
+
+
+def agregar_columnas_normalizadas(df):
+    """Agrega las columnas sombra *_norm para cada columna de búsqueda presente."""
+    for col in COLUMNAS_NORMALIZADAS:
+        if col in df.columns:
+            df[col + SUFIJO_NORM] = normalizar_serie(df[col])
+    return df
+
+
+def a_dinero(serie):
+    """Convierte una columna de dinero ("$1,234.00", 1234, vacío) a float64."""
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype('float64')
+    texto = serie.astype(str).str.replace('$', '', regex=False).str.replace(',', '', regex=False).str.strip()
+    return pd.to_numeric(texto, errors='coerce').where(serie.notna()).astype('float64')
+
+
+def a_numero(serie):
+    """Convierte una columna numérica que puede venir con coma decimal."""
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie
+    texto = serie.astype(str).str.strip().str.replace(',', '.', regex=False)
+    return pd.to_numeric(texto, errors='coerce').where(serie.notna())
+
+
+def a_entero(serie, dtype='Int64'):
+    """Convierte a entero con vacíos (los valores no enteros o ilegibles quedan vacíos)."""
+    numeros = pd.to_numeric(serie, errors='coerce')
+    numeros = numeros.where(numeros.isna() | (numeros == numeros.round()))
+    return numeros.astype(dtype)
+
+
+def a_fecha(serie):
+    """Convierte fechas ISO ("2024-02-05 00:00:00") y, las que falten, día/mes/año ("20/02/2025")."""
+    fechas = pd.to_datetime(serie, errors='coerce', format='ISO8601')
+    faltan = fechas.isna() & serie.notna()
+    if faltan.any():
+        fechas[faltan] = pd.to_datetime(serie[faltan], errors='coerce', format='%d/%m/%Y')
+    return fechas
+
+
+CONVERSORES = {
+    'dinero': a_dinero,
+    'fase': lambda serie: a_entero(serie, 'Int8'),
+    'entero': a_entero,
+    'numero': a_numero,
+    'fecha': a_fecha,
+}
+
+
+def esquema_de(nombre):
+    """Esquema de tipos de un archivo ({} si no tiene)."""
+    if nombre in ESQUEMAS_TABLAS:
+        return ESQUEMAS_TABLAS[nombre]
+    if nombre.startswith('Red_vial'):
+        return ESQUEMA_RED_VIAL
+    return {}
+
+
+def aplicar_esquema(df, esquema):
+    """Convierte las columnas del esquema a su tipo nativo (las que falten se ignoran)."""
+    for tipo, columnas in esquema.items():
+        convertir = CONVERSORES[tipo]
+        for col in columnas:
+            if col in df.columns:
+                df[col] = convertir(df[col])
+    return df
+
+
+def leer_csv(file_path):
+    """Lee un CSV usando utf-8-sig y latin-1 como respaldo."""
+    try:
+        return pd.read_csv(file_path, encoding='utf-8-sig')
+    except UnicodeDecodeError:
+        return pd.read_csv(file_path, encoding='latin-1')
+
+
+def es_texto(serie):
+    return serie.dtype == object or pd.api.types.is_string_dtype(serie.dtype)
+
+
+def compactar(df):
+    """
+    Reduce la memoria de una tabla: quita las columnas descartadas, guarda el
+    texto repetitivo como categoría y achica los tipos numéricos cuando no se
+    pierde ningún valor (los float solo pasan a float32 si son exactos).
+    """
+    df = df.drop(columns=[c for c in COLUMNAS_DESCARTADAS if c in df.columns])
+    for col in df.columns:
+        serie = df[col]
+        if es_texto(serie):
+            if len(serie) and serie.nunique() <= MAX_PROPORCION_CATEGORIA * len(serie):
+                df[col] = serie.astype('category')
+        elif pd.api.types.is_bool_dtype(serie):
+            continue
+        elif pd.api.types.is_integer_dtype(serie):
+            df[col] = pd.to_numeric(serie, downcast='integer')
+        elif serie.dtype == np.float64:
+            reducida = serie.astype(np.float32)
+            if np.array_equal(reducida.to_numpy(dtype=np.float64), serie.to_numpy(), equal_nan=True):
+                df[col] = reducida
+    return df
+
+
+def memoria_tabla(df):
+    """Bytes que ocupa un DataFrame (contando el contenido de los textos)."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def cargar_tabla(file_path):
+    """
+    Lee un CSV, convierte sus columnas según el esquema de la tabla, le agrega
+    las columnas normalizadas usadas por la búsqueda y la compacta.
+    """
+    df = aplicar_esquema(leer_csv(file_path), esquema_de(os.path.basename(file_path)))
+    return compactar(agregar_columnas_normalizadas(df))
+
+
+def version_preparacion(nombre):
+    """
+    Describe cómo se prepara una tabla (esquema y columnas normalizadas); si
+    cambia, las copias en caché de esa tabla dejan de servir.
+    """
+    return repr((esquema_de(nombre), COLUMNAS_NORMALIZADAS, SUFIJO_NORM, COLUMNAS_DESCARTADAS,
+                 MAX_PROPORCION_CATEGORIA))
+
+
+def version_indices(nombre):
+    """
+    Describe cómo se construyen los índices de búsqueda de una tabla: además
+    de la preparación, dependen de su entrada en el catálogo y de las columnas
+    con identificadores.
+    """
+    return repr((version_preparacion(nombre), definicion_de(nombre), COLUMNAS_CLAVE))
+
+
+def firma_archivo(file_path):
+    """Firma (mtime, tamaño) usada para saber si un archivo cambió."""
+    stat = os.stat(file_path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class TablaCargada:
+    """
+    Una tabla en memoria junto con la firma del archivo del que salió y las
+    estructuras de búsqueda que se construyen una sola vez al cargarla (o se
+    toman de `indices`, los estados guardados en la caché con estados_indices()).
+    """
+
+    def __init__(self, nombre, df, firma, indices=None):
+        self.nombre = nombre
+        self.df = df
+        self.firma = firma
+
+        # Columnas de nombre, código y ubicación según el catálogo (las que
+        # falten en el CSV se ignoran)
+        self.definicion = definicion_de(nombre) or DefinicionTabla()
+        self.name_col, self.code_col, self.loc_col = (
+            c if c in df.columns else None
+            for c in (self.definicion.nombre, self.definicion.codigo, self.definicion.ubicacion))
+        self.peso = self.definicion.peso
+        self.maximo = self.definicion.maximo
+
+        # Valores normalizados como arreglos de objetos, listos para indexar por posición
+        self._norms = {}
+        for col in self.columnas_busqueda():
+            self._norms[col] = df[col + SUFIJO_NORM].to_numpy(dtype=object)
+        self._vacio = np.full(len(df), None, dtype=object)
+
+        # La similitud difusa solo se calcula sobre nombre y código
+        columnas_similitud = [c for c in (self.name_col, self.code_col) if c]
+        if indices is not None:
+            self.indice = IndiceInvertido.desde_estado(indices['invertido'])
+            self.claves = IndiceClaves.desde_estado(indices.get('claves', {}))
+            self.similitud = {c: IndiceSimilitud.desde_estado(indices['similitud:' + c])
+                              for c in columnas_similitud}
+            return
+        self.indice = IndiceInvertido([self._norms[c] for c in self.columnas_busqueda()])
+        self.claves = IndiceClaves({c: df[c].astype(object).where(df[c].notna(), None).to_numpy()
+                                    for c in COLUMNAS_CLAVE if c in df.columns})
+        self.similitud = {c: IndiceSimilitud(self._norms[c]) for c in columnas_similitud}
+
+    def estados_indices(self):
+        """Estados de los índices de búsqueda, para guardarlos en la caché ({índice: {campo: valor}})."""
+        estados = {'invertido': self.indice.estado(), 'claves': self.claves.estado()}
+        for col, indice in self.similitud.items():
+            estados['similitud:' + col] = indice.estado()
+        return estados
+
+    def candidatos(self, palabras_clave, consulta_norm, umbral_similitud):
+        """
+        Posiciones de las filas que pueden obtener puntaje: las que comparten texto
+        con la consulta (índice invertido) más las que superan el umbral de
+        similitud difusa.
+        """
+        listas = [self.indice.candidatos(palabras_clave, consulta_norm)]
+        listas.extend(ind.filas_sobre(consulta_norm, umbral_similitud) for ind in self.similitud.values())
+        return np.unique(np.concatenate(listas))
+
+    def filas_por_clave(self, claves, consulta_norm):
+        """
+        Busca identificadores exactos. Devuelve {fila: número de claves encontradas}
+        y el conjunto de claves que sí existían en la tabla.
+        """
+        filas = {}
+        encontradas = set()
+        for clave in claves:
+            for col, filas_col in self.claves.buscar(clave).items():
+                requisito = COLUMNAS_CLAVE[col]
+                if requisito and requisito not in consulta_norm:
+                    continue
+                encontradas.add(clave)
+                for fila in filas_col:
+                    filas[int(fila)] = filas.get(int(fila), 0) + 1
+        return filas, encontradas
+
+    def similitudes(self, col, consulta_norm, umbral):
+        """Similitud (SequenceMatcher.ratio) de cada fila de `col` con la consulta (0 si no supera `umbral`)."""
+        sims = np.zeros(len(self.df))
+        if col in self.similitud:
+            filas, valores = self.similitud[col].similitudes(consulta_norm, umbral)
+            sims[filas] = valores
+        return sims
+
+    def parecidos(self, texto, k=5, umbral=0.0):
+        """Top-k de filas cuyo nombre más se parece a `texto`, como lista de (fila, similitud)."""
+        if self.name_col not in self.similitud:
+            return []
+        return self.similitud[self.name_col].top_k(normalize(texto), k, umbral)
+
+    def peso_consulta(self, consulta_norm):
+        """Peso de las filas para una consulta (0 si no nombra la entidad que pide la tabla)."""
+        entidad = self.definicion.entidad
+        if entidad and entidad not in consulta_norm:
+            return 0.0
+        return self.peso
+
+    def columnas_busqueda(self):
+        return [c for c in (self.name_col, self.code_col, self.loc_col) if c]
+
+    def valores_norm(self, col):
+        """Valores normalizados de una columna (todo None si la tabla no la tiene)."""
+        if col is None:
+            return self._vacio
+        return self._norms[col]
+
+
+def construir_gazetteer(municipios, veredas):
+    """Compila el gazetteer a partir de las tablas de municipios y veredas (pueden ser None)."""
+    gazetteer = Gazetteer()
+    if municipios is not None:
+        nombres = municipios.df[['MPIO_NOMBRE', 'MPIO_NOMBRE_norm']].dropna().drop_duplicates('MPIO_NOMBRE')
+        for nombre, norm in zip(nombres['MPIO_NOMBRE'], nombres['MPIO_NOMBRE_norm']):
+            gazetteer.agregar('municipio', str(nombre), norm)
+    for nombre in SUBREGIONES_ANTIOQUIA:
+        gazetteer.agregar('subregion', nombre, normalize(nombre))
+    if veredas is not None:
+        df = veredas.df
+        municipios_vereda = df['MPIO_NOMBRE'] if 'MPIO_NOMBRE' in df.columns else [None] * len(df)
+        for nombre, norm, municipio in zip(df['VERE_NOMBRE'], df['VERE_NOMBRE_norm'], municipios_vereda):
+            if isinstance(norm, str):
+                gazetteer.agregar('vereda', str(nombre), norm, municipio if isinstance(municipio, str) else None)
+    return gazetteer
+
+
+class RegistroTablas:
+    """
+    Registro de tablas compartido por todo el proceso.
+
+    Cada CSV se lee una sola vez y se entrega el mismo DataFrame a todas las
+    sesiones. Solo se vuelve a leer cuando cambia su mtime o su tamaño.
+    Los DataFrames entregados son compartidos: quien los use no debe modificarlos.
+    Las tablas ya preparadas y sus índices se guardan en una caché binaria
+    (CacheTablas) para que al arrancar no haya que volver a leer y normalizar
+    los CSV ni construir los índices.
+    """
+
+    def __init__(self, carpeta=CSV_FOLDER, cache=None):
+        self.carpeta = carpeta
+        self.cache = cache or CacheTablas(carpeta_cache(carpeta))
+        self._tablas = {}
+        self._derivados = {}
+        self._lock = threading.RLock()
+
+    def archivos(self):
+        """Lista los CSV disponibles en la carpeta (en el orden de os.listdir)."""
+        if not os.path.exists(self.carpeta):
+            return []
+        return [f for f in os.listdir(self.carpeta) if f.endswith('.csv')]
+
+    def version_datos(self):
+        """Versión de los datos de la carpeta: (archivo, firma) de cada CSV."""
+        version = []
+        for nombre in self.archivos():
+            try:
+                version.append((nombre, firma_archivo(os.path.join(self.carpeta, nombre))))
+            except OSError:
+                continue
+        return tuple(version)
+
+    def obtener_tabla(self, nombre):
+        """Devuelve la TablaCargada de un archivo o None si no existe."""
+        file_path = os.path.join(self.carpeta, nombre)
+        try:
+            firma = firma_archivo(file_path)
+        except OSError:
+            with self._lock:
+                self._tablas.pop(nombre, None)
+            return None
+
+        tabla = self._tablas.get(nombre)
+        if tabla is not None and tabla.firma == firma:
+            return tabla
+
+        with self._lock:
+            # Otra sesión pudo haberla cargado mientras esperábamos el lock
+            tabla = self._tablas.get(nombre)
+            if tabla is None or tabla.firma != firma:
+                tabla = self._cargar(nombre, file_path, firma)
+                self._tablas[nombre] = tabla
+            return tabla
+
+    def _cargar(self, nombre, file_path, firma):
+        """
+        TablaCargada de un CSV: el DataFrame preparado y sus índices salen de la
+        caché si están vigentes; si no, se arman desde el CSV y se guardan.
+        """
+        preparacion = version_preparacion(nombre)
+        df = self.cache.leer(nombre, firma, preparacion)
+        indices = None
+        if df is None:
+            df = cargar_tabla(file_path)
+            self.cache.guardar(nombre, firma, preparacion, df)
+        else:
+            indices = self.cache.leer_indices(nombre, firma, version_indices(nombre))
+        if indices is not None:
+            try:
+                return TablaCargada(nombre, df, firma, indices)
+            except KeyError:
+                # Faltan índices (p. ej. cambió el catálogo): se construyen
+                pass
+        tabla = TablaCargada(nombre, df, firma)
+        self.cache.guardar_indices(nombre, firma, version_indices(nombre), tabla.estados_indices())
+        return tabla
+
+    def obtener(self, nombre):
+        """Devuelve el DataFrame de un archivo o None si no existe."""
+        tabla = self.obtener_tabla(nombre)
+        return tabla.df if tabla is not None else None
+
+    def reporte_memoria(self):
+        """
+        Memoria de cada tabla cargada: filas, columnas, columnas categóricas y
+        megabytes del DataFrame (sin contar los índices de búsqueda).
+        """
+        with self._lock:
+            tablas = list(self._tablas.values())
+        filas = [{
+            'tabla': t.nombre,
+            'filas': len(t.df),
+            'columnas': t.df.shape[1],
+            'categoricas': sum(isinstance(d, pd.CategoricalDtype) for d in t.df.dtypes),
+            'memoria_mb': round(memoria_tabla(t.df) / 1e6, 3),
+        } for t in tablas]
+        return pd.DataFrame(filas, columns=['tabla', 'filas', 'columnas', 'categoricas', 'memoria_mb'])
+
+    def derivado(self, clave, archivos, construir):
+        """
+        Estructura construida a partir de varias tablas (p. ej. el gazetteer).
+        Se construye una vez con construir(*tablas) y se reconstruye solo cuando
+        cambia alguno de los archivos de los que depende.
+        """
+        tablas = [self.obtener_tabla(a) for a in archivos]
+        firma = tuple(t.firma if t is not None else None for t in tablas)
+        actual = self._derivados.get(clave)
+        if actual is not None and actual[0] == firma:
+            return actual[1]
+
+        with self._lock:
+            actual = self._derivados.get(clave)
+            if actual is None or actual[0] != firma:
+                actual = (firma, construir(*tablas))
+                self._derivados[clave] = actual
+            return actual[1]
+
+    def gazetteer(self):
+        """Gazetteer de municipios, subregiones y veredas (compartido por el proceso)."""
+        return self.derivado('gazetteer', ['Municipios_decodificado.csv', 'Veredas_decodificado.csv'],
+                             construir_gazetteer)
+
+    def limpiar(self):
+        """Descarta todas las tablas cargadas."""
+        with self._lock:
+            self._tablas.clear()
+            self._derivados.clear()
+
+
+# Instancia única por proceso (compartida entre sesiones de Streamlit)
+registro_tablas = RegistroTablas()
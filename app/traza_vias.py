@@ -0,0 +1,152 @@
+import os
+import time
+
+# Traza por etapas de buscar_datos_vias:
+#   VIAS_TRAZA=1 imprime la traza de cada búsqueda (si no hay observadores)
+# Con la traza apagada y sin observadores la búsqueda usa SIN_TRAZA, que no
+# mide nada.
+VIAS_TRAZA = os.environ.get("VIAS_TRAZA", "0").lower() in ("1", "si", "true")
+
+_observadores = []
+
+
+class Etapa:
+    """Medición de una etapa (y tabla, si aplica) de la búsqueda."""
+
+    __slots__ = ('nombre', 'tabla', 'segundos', 'filas', 'candidatos', 'renderizadas')
+
+    def __init__(self, nombre, tabla=None, segundos=0.0, filas=0, candidatos=0, renderizadas=0):
+        self.nombre = nombre
+        self.tabla = tabla
+        self.segundos = segundos
+        # filas recorridas, candidatos puntuados y filas mostradas
+        self.filas = filas
+        self.candidatos = candidatos
+        self.renderizadas = renderizadas
+
+    def como_dict(self):
+        return {campo: getattr(self, campo) for campo in self.__slots__}
+
+
+class _Medicion:
+    """Context manager que mide el tiempo de una Etapa y la agrega a la traza."""
+
+    __slots__ = ('traza', 'etapa', 'inicio')
+
+    def __init__(self, traza, etapa):
+        self.traza = traza
+        self.etapa = etapa
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self.etapa
+
+    def __exit__(self, *excepcion):
+        self.etapa.segundos = time.perf_counter() - self.inicio
+        self.traza.etapas.append(self.etapa)
+        return False
+
+
+class TrazaBusqueda:
+    """
+    Tiempos y conteos por etapa de una búsqueda: carga de tablas, detección
+    del lugar, estadísticas, listados, cercanía, claves exactas, puntuación
+    (una entrada por tabla) y formato.
+    """
+
+    activa = True
+
+    def __init__(self, consulta):
+        self.consulta = consulta
+        self.etapas = []
+        self.desde_cache = False
+        self.segundos = 0.0
+
+    def etapa(self, nombre, tabla=None):
+        """with traza.etapa('listado') as e: ... e.renderizadas = 1"""
+        return _Medicion(self, Etapa(nombre, tabla))
+
+    def agregar(self, nombre, tabla=None, **medidas):
+        """Agrega una etapa medida en otra parte (p. ej. en el pool de búsqueda)."""
+        self.etapas.append(Etapa(nombre, tabla, **medidas))
+
+    def por_etapa(self):
+        """Segundos totales de cada etapa (sumando sus tablas), en orden de aparición."""
+        totales = {}
+        for e in self.etapas:
+            totales[e.nombre] = totales.get(e.nombre, 0.0) + e.segundos
+        return totales
+
+    def como_dict(self):
+        return {
+            'consulta': self.consulta,
+            'segundos': self.segundos,
+            'desde_cache': self.desde_cache,
+            'etapas': [e.como_dict() for e in self.etapas],
+        }
+
+    def resumen(self):
+        """Texto de una línea por etapa, para los logs."""
+        origen = " (caché)" if self.desde_cache else ""
+        lineas = [f"TRAZA {self.consulta!r}: {self.segundos * 1000:.1f} ms{origen}"]
+        for e in self.etapas:
+            nombre = f"{e.nombre}[{e.tabla}]" if e.tabla else e.nombre
+            lineas.append(f"  {nombre:<50} {e.segundos * 1000:8.2f} ms  filas={e.filas} "
+                          f"candidatos={e.candidatos} renderizadas={e.renderizadas}")
+        return "\n".join(lineas)
+
+
+class _EtapaNula:
+    """Etapa que ignora las medidas."""
+
+    __slots__ = ()
+    filas = candidatos = renderizadas = 0
+
+    def __setattr__(self, nombre, valor):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        return False
+
+
+class _SinTraza:
+    """Traza apagada: las mismas operaciones que TrazaBusqueda, sin hacer nada."""
+
+    activa = False
+    _etapa = _EtapaNula()
+
+    def etapa(self, nombre, tabla=None):
+        return self._etapa
+
+    def agregar(self, nombre, tabla=None, **medidas):
+        pass
+
+
+SIN_TRAZA = _SinTraza()
+
+
+def registrar_observador(observador):
+    """observador(traza) se llama al terminar cada búsqueda; activa la traza."""
+    _observadores.append(observador)
+
+
+def quitar_observador(observador):
+    _observadores.remove(observador)
+
+
+def traza_activa():
+    return VIAS_TRAZA or bool(_observadores)
+
+
+def emitir(traza):
+    """Entrega la traza a los observadores (o la imprime si solo está VIAS_TRAZA)."""
+    if not _observadores:
+        print(traza.resumen())
+    for observador in list(_observadores):
+        try:
+            observador(traza)
+        except Exception as e:
+            print(f"Error en observador de traza: {e}")
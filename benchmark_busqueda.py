@@ -0,0 +1,322 @@
+"""
+Benchmark de la búsqueda estructurada (buscar_datos_vias y buscar_capa_gis).
+
+Corre un corpus fijo de consultas (estadísticas, listados, radicados,
+nombres de vía aproximados, subregiones y capas GIS) sobre los datos reales
+de data_vias_limpia y sobre copias sintéticas con las tablas de vías y bases
+multiplicadas (10x y 100x por defecto). Para cada escala informa latencias
+p50/p95/p99, memoria pico y una suma de verificación de las respuestas, para
+poder comprobar que una optimización no cambia lo que se responde.
+
+La memoria pico de las consultas se mide con tracemalloc en una pasada sin
+pool (VIAS_POOL=no), porque tracemalloc solo ve el proceso que mide: con
+VIAS_POOL=procesos no contaría lo que cargan los workers. Además se informa
+el RSS máximo del proceso que mide (donde existe el módulo resource).
+
+Uso:
+    python benchmark_busqueda.py                       # escalas 1, 10 y 100
+    python benchmark_busqueda.py --escalas 1 10 -r 3   # 3 repeticiones por consulta
+    python benchmark_busqueda.py --json antes.json     # guarda el resultado
+    python benchmark_busqueda.py --comparar antes.json # avisa si cambió alguna respuesta
+
+Cada escala corre en un proceso aparte (con el directorio de trabajo en una
+carpeta temporal con su propio data_vias_limpia y data), así las tablas y
+cachés de una escala no afectan a la otra. Se miden las funciones *_sin_cache
+para no medir la caché de respuestas.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Windows
+    resource = None
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+CSV_FOLDER = "data_vias_limpia"
+DATA_PATH = "data"
+
+# Corpus de consultas por categoría
+CONSULTAS = {
+    'estadistica': [
+        "cuantas necesidades tiene Amalfi",
+        "cuanto es el aporte de la gobernacion en las necesidades de Amalfi",
+        "cual es el valor total de las necesidades de Yarumal",
+        "cuantas vias tiene Amalfi",
+        "cuantos radicados tiene Vegachí",
+        "cuantas necesidades hay en total",
+        "cuantos radicados hay",
+    ],
+    'listado': [
+        "cuales radicados tiene Amalfi",
+        "lista de proyectos de Vegachí",
+        "dame los radicados de Puerto Triunfo",
+        "necesidades de Amalfi",
+    ],
+    'radicado': [
+        "2024010048235",
+        "radicado 2024010031666",
+        "05031VT30",
+        "25AN01-1",
+    ],
+    'via_aproximada': [
+        "estado de la via en amalfi",
+        "tunel toyo",
+        "Vía Terciaria Santa Rosa De Los Palmares - Pueblo Nuevo",
+        "Portachuelo La Matica",
+        "Portachuelo Q La Matica Limite Con Vegachi",
+        "via la fabiana tamesis",
+        "malecon puerto triunfo",
+        "Paso por Caldas",
+        "capacidad de endeudamiento de Medellín",
+    ],
+    'subregion': [
+        "cuantas necesidades hay en el Nordeste",
+        "cuanto aporte de la gobernacion en necesidades del Oriente",
+        "cuantas vias terciarias hay en el norte",
+        "cuantos radicados hay en Urabá",
+        "que proyectos hay en el Nordeste",
+        "listado de radicados del Oriente",
+        "vias en el norte",
+    ],
+}
+
+CONSULTAS_GIS = [
+    "mapa de la red vial primaria",
+    "muestrame las vias secundarias",
+    "capa de veredas de antioquia",
+    "limites de los municipios",
+    "red vial terciaria",
+]
+
+ESCALAS = [1, 10, 100]
+
+
+def es_escalable(nombre):
+    """Tablas que se multiplican (las que recorre la búsqueda); municipios y veredas quedan igual."""
+    return nombre.endswith('.csv') and (nombre.startswith('Red_vial') or nombre.startswith('Base_'))
+
+
+def leer_filas_csv(ruta):
+    """Encabezado y filas de un CSV (utf-8-sig y latin-1 como respaldo, como leer_csv)."""
+    for encoding in ('utf-8-sig', 'latin-1'):
+        try:
+            with open(ruta, encoding=encoding, newline='') as f:
+                filas = list(csv.reader(f))
+            return filas[0], filas[1:]
+        except UnicodeDecodeError:
+            continue
+
+
+def escalar_csv(origen, destino, factor):
+    """Escribe en `destino` el CSV de `origen` con sus filas repetidas `factor` veces."""
+    encabezado, filas = leer_filas_csv(origen)
+    with open(destino, 'w', encoding='utf-8', newline='') as f:
+        escritor = csv.writer(f)
+        escritor.writerow(encabezado)
+        for _ in range(factor):
+            escritor.writerows(filas)
+
+
+def preparar_datos(destino, factor):
+    """Arma en `destino` una copia de data_vias_limpia y data con las tablas escaladas."""
+    carpeta_csv = os.path.join(destino, CSV_FOLDER)
+    os.makedirs(carpeta_csv)
+    for nombre in os.listdir(os.path.join(RAIZ, CSV_FOLDER)):
+        origen = os.path.join(RAIZ, CSV_FOLDER, nombre)
+        if not nombre.endswith('.csv'):
+            continue
+        if es_escalable(nombre) and factor > 1:
+            escalar_csv(origen, os.path.join(carpeta_csv, nombre), factor)
+        else:
+            shutil.copy(origen, os.path.join(carpeta_csv, nombre))
+    shutil.copytree(os.path.join(RAIZ, DATA_PATH), os.path.join(destino, DATA_PATH),
+                    ignore=shutil.ignore_patterns('*.pdf', '*.txt'))
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) con interpolación lineal, como numpy.percentile."""
+    orden = sorted(valores)
+    if not orden:
+        return 0.0
+    pos = (len(orden) - 1) * p / 100
+    i = int(pos)
+    j = min(i + 1, len(orden) - 1)
+    return orden[i] + (orden[j] - orden[i]) * (pos - i)
+
+
+def resumen_latencias(latencias):
+    """p50/p95/p99 y media en milisegundos."""
+    ms = [t * 1000 for t in latencias]
+    return {
+        'n': len(ms),
+        'p50_ms': round(percentil(ms, 50), 3),
+        'p95_ms': round(percentil(ms, 95), 3),
+        'p99_ms': round(percentil(ms, 99), 3),
+        'media_ms': round(sum(ms) / len(ms), 3) if ms else 0.0,
+    }
+
+
+def suma_verificacion(texto):
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()[:16]
+
+
+def rss_maximo_mb():
+    """RSS máximo del proceso actual en MB (None si no hay módulo resource)."""
+    if resource is None:
+        return None
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB y macOS en bytes
+    return round(maximo / (1e6 if sys.platform == 'darwin' else 1e3), 1)
+
+
+def medir_escala(repeticiones):
+    """
+    Corre el corpus en el directorio actual (se ejecuta en el proceso hijo).
+    Devuelve latencias por categoría, memoria pico y sumas de verificación.
+    """
+    sys.path.insert(0, os.path.join(RAIZ, "app"))
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    import rag
+    import busqueda_vias
+    from tablas_vias import registro_tablas
+
+    # Carga de tablas e índices (primera consulta), medida aparte
+    inicio = time.perf_counter()
+    for nombre in registro_tablas.archivos():
+        registro_tablas.obtener_tabla(nombre)
+    registro_tablas.gazetteer()
+    rag.buscar_datos_vias_sin_cache(CONSULTAS['via_aproximada'][0])
+    carga = time.perf_counter() - inicio
+
+    consultas = [('vias', categoria, q) for categoria, lista in CONSULTAS.items() for q in lista]
+    consultas += [('gis', 'gis', q) for q in CONSULTAS_GIS]
+    funciones = {'vias': rag.buscar_datos_vias_sin_cache, 'gis': rag.buscar_capa_gis_sin_cache}
+
+    latencias = {}
+    respuestas = {}
+    for _ in range(repeticiones):
+        for tipo, categoria, q in consultas:
+            inicio = time.perf_counter()
+            respuesta = funciones[tipo](q)
+            latencias.setdefault(categoria, []).append(time.perf_counter() - inicio)
+            respuestas[q] = respuesta
+
+    # Memoria pico de una pasada (aparte: tracemalloc hace más lenta la
+    # búsqueda), sin pool para que toda la búsqueda corra en este proceso
+    busqueda_vias.cerrar_pool()
+    pool, busqueda_vias.VIAS_POOL = busqueda_vias.VIAS_POOL, "no"
+    if pool != "no":
+        # Con pool, este proceso todavía no llenó sus cachés de búsqueda
+        for tipo, _, q in consultas:
+            funciones[tipo](q)
+    tracemalloc.start()
+    for tipo, _, q in consultas:
+        funciones[tipo](q)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    busqueda_vias.VIAS_POOL = pool
+
+    todas = [t for lista in latencias.values() for t in lista]
+    return {
+        'carga_s': round(carga, 3),
+        'filas': int(registro_tablas.reporte_memoria()['filas'].sum()),
+        'memoria_tablas_mb': round(float(registro_tablas.reporte_memoria()['memoria_mb'].sum()), 3),
+        'memoria_pico_mb': round(pico / 1e6, 3),
+        'rss_maximo_mb': rss_maximo_mb(),
+        'latencias': {categoria: resumen_latencias(lista) for categoria, lista in latencias.items()},
+        'total': resumen_latencias(todas),
+        'sumas': {q: suma_verificacion(r) for q, r in respuestas.items()},
+        'suma_total': suma_verificacion(json.dumps(respuestas, sort_keys=True, ensure_ascii=False)),
+    }
+
+
+def correr_escala(factor, repeticiones):
+    """Prepara los datos de una escala y la mide en un proceso aparte."""
+    with tempfile.TemporaryDirectory(prefix=f"bench_vias_x{factor}_") as carpeta:
+        if factor == 1:
+            directorio = RAIZ
+        else:
+            print(f"Preparando datos x{factor}...", file=sys.stderr)
+            preparar_datos(carpeta, factor)
+            directorio = carpeta
+        salida = os.path.join(carpeta, "resultado.json")
+        comando = [sys.executable, os.path.abspath(__file__), "--hijo", salida, "-r", str(repeticiones)]
+        subprocess.run(comando, cwd=directorio, check=True, stdout=subprocess.DEVNULL)
+        with open(salida, encoding='utf-8') as f:
+            return json.load(f)
+
+
+def imprimir(factor, resultado):
+    print(f"\n=== Escala x{factor}: {resultado['filas']:,} filas, "
+          f"{resultado['memoria_tablas_mb']} MB en tablas, carga {resultado['carga_s']} s ===")
+    print(f"{'categoria':<16}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'media ms':>10}")
+    filas = list(resultado['latencias'].items()) + [('TOTAL', resultado['total'])]
+    for categoria, r in filas:
+        print(f"{categoria:<16}{r['n']:>6}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['media_ms']:>10}")
+    print(f"Memoria pico de las consultas (tracemalloc, sin pool): {resultado['memoria_pico_mb']} MB")
+    if resultado.get('rss_maximo_mb') is not None:
+        print(f"RSS máximo del proceso que mide (sin los workers del pool): {resultado['rss_maximo_mb']} MB")
+    print(f"Suma de verificación de las respuestas: {resultado['suma_total']}")
+
+
+def comparar(resultados, anterior):
+    """Lista las consultas cuya respuesta cambió respecto a una corrida anterior."""
+    cambios = 0
+    for escala, resultado in resultados.items():
+        previo = anterior.get(escala)
+        if previo is None:
+            continue
+        for q, suma in resultado['sumas'].items():
+            if q in previo['sumas'] and previo['sumas'][q] != suma:
+                print(f"  x{escala}: cambió la respuesta de {q!r}")
+                cambios += 1
+    print(f"\nRespuestas distintas a la corrida anterior: {cambios}")
+    return cambios
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la búsqueda estructurada de vías")
+    parser.add_argument("--escalas", type=int, nargs="+", default=ESCALAS,
+                        help="factores de escala de las tablas (1 = datos reales)")
+    parser.add_argument("-r", "--repeticiones", type=int, default=5,
+                        help="veces que se corre cada consulta para medir latencias")
+    parser.add_argument("--json", help="archivo donde guardar los resultados")
+    parser.add_argument("--comparar", help="resultados anteriores (--json) contra los que verificar las respuestas")
+    parser.add_argument("--hijo", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        resultado = medir_escala(args.repeticiones)
+        with open(args.hijo, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False)
+        return 0
+
+    print(f"VIAS_POOL={os.environ.get('VIAS_POOL', 'no')} VIAS_WORKERS={os.environ.get('VIAS_WORKERS', os.cpu_count())}")
+    resultados = {}
+    for factor in args.escalas:
+        resultados[str(factor)] = correr_escala(factor, args.repeticiones)
+        imprimir(factor, resultados[str(factor)])
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=1)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            return 1 if comparar(resultados, json.load(f)) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+"""
+Descarga paginada y concurrente de las features de una capa de ArcGIS.
+
+Primero se pide el total de registros (returnCountOnly) y se reparten las
+páginas por offset entre un pool acotado de workers; las páginas se entregan
+en orden, así quien escribe el resultado no depende de qué página llegó
+primero. El tamaño de página respeta el maxRecordCount de la capa y, si el
+servidor corta una página antes (exceededTransferLimit), se pide lo que falta.
+Cada consulta se reintenta con espera exponencial ante errores de red, 429/5xx
+o errores de ArcGIS.
+
+Si el servicio no informa el total, se pagina de a una página hasta que una
+venga incompleta y sin exceededTransferLimit.
+
+EscritorFeatures escribe las páginas en un CSV a medida que llegan (con las
+columnas fijadas por los `fields` de la capa y los dominios ya decodificados),
+así la memoria de una descarga queda acotada por las páginas en vuelo y no
+por el tamaño de la capa.
+"""
+import csv
+import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+from metadatos_arcgis import cliente_arcgis, ErrorArcGIS
+
+# Registros pedidos por página (si la capa admite menos, se usa su maxRecordCount)
+TAMANO_PAGINA = 2000
+
+# Páginas que se descargan a la vez
+ARCGIS_WORKERS = int(os.environ.get("ARCGIS_WORKERS", 4))
+
+# Reintentos por página y espera inicial (segundos; se duplica en cada intento)
+REINTENTOS = 4
+ESPERA_BASE = 1.0
+TIMEOUT = 60
+
+# Códigos HTTP que vale la pena reintentar
+CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+
+def consultar(sesion, url_capa, params, reintentos=REINTENTOS, espera=ESPERA_BASE, timeout=TIMEOUT):
+    """
+    JSON de `<capa>/query` con los `params` dados, reintentando con espera
+    exponencial. Lanza la última excepción si se agotan los intentos.
+    """
+    params = dict(params, f='json')
+    for intento in range(reintentos + 1):
+        try:
+            response = sesion.get(f"{url_capa.rstrip('/')}/query", params=params, timeout=timeout)
+            if response.status_code in CODIGOS_REINTENTABLES:
+                falla = requests.HTTPError(f"HTTP {response.status_code}", response=response)
+            else:
+                # Los demás errores HTTP no cambian al reintentar
+                response.raise_for_status()
+                datos = response.json()
+                error = datos.get('error') if isinstance(datos, dict) else None
+                if error is None:
+                    return datos
+                # ArcGIS informa los errores con código 200 y un objeto "error"
+                falla = ErrorArcGIS(f"{url_capa}: {error.get('message', error)}")
+                if error.get('code') not in CODIGOS_REINTENTABLES:
+                    raise falla
+        except requests.HTTPError:
+            raise
+        except (requests.RequestException, ValueError) as e:
+            # Fallas de red (conexión, timeout, respuesta cortada como
+            # ChunkedEncodingError) o JSON incompleto
+            falla = e
+        if intento == reintentos:
+            raise falla
+        pausa = espera * 2 ** intento
+        print(f"  - Error consultando {url_capa} ({falla}); reintento en {pausa:g} s")
+        time.sleep(pausa)
+
+
+def contar_registros(sesion, url_capa, **opciones):
+    """Total de registros de la capa (None si el servicio no lo informa)."""
+    try:
+        datos = consultar(sesion, url_capa, {'where': '1=1', 'returnCountOnly': 'true'}, **opciones)
+    except (requests.RequestException, ErrorArcGIS, ValueError) as e:
+        print(f"  - No se pudo contar los registros de {url_capa}: {e}")
+        return None
+    return datos.get('count')
+
+
+def tamano_pagina(metadatos, tamano=TAMANO_PAGINA):
+    """Registros por página: el pedido, sin pasar el maxRecordCount de la capa."""
+    maximo = metadatos.get('maxRecordCount') if metadatos else None
+    return min(tamano, maximo) if maximo else tamano
+
+
+def params_pagina(metadatos, offset, cantidad):
+    """Parámetros de la consulta de una página (ordenada por OBJECTID para que el paginado sea estable)."""
+    params = {'where': '1=1', 'outFields': '*', 'resultOffset': offset, 'resultRecordCount': cantidad}
+    campo_id = (metadatos or {}).get('objectIdField')
+    if campo_id:
+        params['orderByFields'] = campo_id
+    return params
+
+
+def descargar_pagina(sesion, url_capa, metadatos, offset, cantidad, **opciones):
+    """
+    Features de [offset, offset + cantidad). Si el servidor corta la página
+    (exceededTransferLimit) se piden las que faltan a partir de donde quedó.
+    """
+    features = []
+    while len(features) < cantidad:
+        datos = consultar(sesion, url_capa, params_pagina(metadatos, offset + len(features),
+                                                           cantidad - len(features)), **opciones)
+        lote = datos.get('features') or []
+        features.extend(lote)
+        if not lote or not datos.get('exceededTransferLimit'):
+            break
+    return features
+
+
+def paginas_secuenciales(sesion, url_capa, metadatos, tamano, **opciones):
+    """Páginas de a una, hasta la primera incompleta sin exceededTransferLimit (sin total conocido)."""
+    offset = 0
+    while True:
+        datos = consultar(sesion, url_capa, params_pagina(metadatos, offset, tamano), **opciones)
+        lote = datos.get('features') or []
+        if lote:
+            yield lote
+        offset += len(lote)
+        if not lote or (len(lote) < tamano and not datos.get('exceededTransferLimit')):
+            return
+
+
+def descargar_paginas(url_capa, metadatos=None, sesion=None, workers=ARCGIS_WORKERS, tamano=TAMANO_PAGINA,
+                      **opciones):
+    """
+    Genera las páginas de features de una capa, en orden. Como mucho hay
+    2 * workers páginas pedidas o esperando a ser consumidas, así la memoria
+    no crece con el tamaño de la capa. `opciones` se pasan a consultar
+    (reintentos, espera, timeout).
+    """
+    sesion = sesion or cliente_arcgis().sesion
+    tamano = tamano_pagina(metadatos, tamano)
+    total = contar_registros(sesion, url_capa, **opciones)
+    if total is None:
+        yield from paginas_secuenciales(sesion, url_capa, metadatos, tamano, **opciones)
+        return
+
+    offsets = iter(range(0, total, tamano))
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="descarga_arcgis") as pool:
+        pendientes = deque()
+
+        def pedir_siguiente():
+            offset = next(offsets, None)
+            if offset is not None:
+                pendientes.append(pool.submit(descargar_pagina, sesion, url_capa, metadatos, offset,
+                                              min(tamano, total - offset), **opciones))
+
+        for _ in range(2 * max(1, workers)):
+            pedir_siguiente()
+        try:
+            while pendientes:
+                pagina = pendientes.popleft().result()
+                pedir_siguiente()
+                if pagina:
+                    yield pagina
+        finally:
+            for futuro in pendientes:
+                futuro.cancel()
+
+
+def columnas_de(metadatos):
+    """Columnas de la capa según sus `fields`, en orden (None si los metadatos no las traen)."""
+    campos = [f['name'] for f in (metadatos or {}).get('fields') or [] if f.get('name')]
+    return campos or None
+
+
+def decodificar(atributos, mapeos):
+    """Atributos de una feature con los códigos de dominio reemplazados por su descripción."""
+    return {k: mapeos[k].get(v, v) if k in mapeos else v for k, v in atributos.items()}
+
+
+class EscritorFeatures:
+    """
+    Escribe features en un CSV página por página.
+
+    Las filas van a un temporal en la misma carpeta, que solo reemplaza al
+    archivo final (os.replace) si todo se escribió bien; si algo falla el
+    temporal se borra y no queda un CSV a medias. Las columnas son las de los
+    metadatos de la capa; si no hay, las de la primera página. Se usa como
+    context manager:
+
+        with EscritorFeatures(ruta, columnas, mapeos) as escritor:
+            for pagina in descargar_paginas(url, metadatos):
+                escritor.escribir(pagina)
+    """
+
+    def __init__(self, ruta, columnas=None, mapeos=None):
+        self.ruta = ruta
+        self.columnas = columnas
+        self.mapeos = mapeos or {}
+        self.filas = 0
+        self._archivo = None
+        self._escritor = None
+        self._temporal = None
+
+    def __enter__(self):
+        carpeta = os.path.dirname(os.path.abspath(self.ruta))
+        fd, self._temporal = tempfile.mkstemp(dir=carpeta, prefix=".descarga_", suffix=".csv.tmp")
+        # utf-8-sig para que Excel lea bien los caracteres latinos
+        self._archivo = os.fdopen(fd, 'w', encoding='utf-8-sig', newline='')
+        return self
+
+    def escribir(self, features):
+        """Decodifica y agrega al CSV las features de una página."""
+        if self._escritor is None:
+            if self.columnas is None:
+                self.columnas = list(dict.fromkeys(k for f in features for k in f.get('attributes', {})))
+            self._escritor = csv.DictWriter(self._archivo, fieldnames=self.columnas, extrasaction='ignore',
+                                            lineterminator='\n')
+            self._escritor.writeheader()
+        self._escritor.writerows(decodificar(f.get('attributes', {}), self.mapeos) for f in features)
+        self.filas += len(features)
+
+    def __exit__(self, tipo, excepcion, traza):
+        self._archivo.close()
+        if tipo is None and self._escritor is not None:
+            os.replace(self._temporal, self.ruta)
+        else:
+            os.remove(self._temporal)
+        return False
@@ -1,9 +1,8 @@
-import requests
-import json
 import pandas as pd
 import os
-import time
 import re
+from metadatos_arcgis import cliente_arcgis, dominios_codificados
+from descarga_arcgis import descargar_paginas, columnas_de, EscritorFeatures
 
 # Configuración
 OUTPUT_DIR = "data_vias_limpia"
@@ -31,26 +30,25 @@ def cargar_capas_desde_csv():
         print("No se encontró el catálogo CSV.")
     return capas
 
-def obtener_mapeo_dominios(url_capa):
-    """Obtiene el diccionario de mapeo {campo: {codigo: descripcion}}"""
+def obtener_metadatos(url_capa):
+    """Metadatos de la capa ({} si no se pudieron obtener)"""
     print(f"Obteniendo metadatos de: {url_capa}")
     try:
-        response = requests.get(f"{url_capa}?f=json", timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        mapeo = {}
-        for field in data.get('fields', []):
-            if field.get('domain') and 'codedValues' in field['domain']:
-                nombre_campo = field['name']
-                valores = {cv['code']: cv['name'] for cv in field['domain']['codedValues']}
-                mapeo[nombre_campo] = valores
-                print(f"  - Dominio encontrado para '{nombre_campo}': {len(valores)} valores")
-        return mapeo
+        # Desde la caché compartida de metadatos (una consulta por servicio)
+        return cliente_arcgis().metadatos_capa(url_capa)
     except Exception as e:
         print(f"Error obteniendo metadatos: {e}")
         return {}
 
+def obtener_mapeo_dominios(url_capa, metadatos=None):
+    """Obtiene el diccionario de mapeo {campo: {codigo: descripcion}}"""
+    if metadatos is None:
+        metadatos = obtener_metadatos(url_capa)
+    mapeo = dominios_codificados(metadatos)
+    for nombre_campo, valores in mapeo.items():
+        print(f"  - Dominio encontrado para '{nombre_campo}': {len(valores)} valores")
+    return mapeo
+
 def descargar_y_procesar(capa):
     nombre = capa["nombre"]
     url = capa["url"]
@@ -60,78 +58,27 @@ def descargar_y_procesar(capa):
         print(f"El archivo {output_file} ya existe. Saltando descarga.")
         return
 
-    # 1. Obtener mapeos de dominio
-    mapeos = obtener_mapeo_dominios(url)
+    # 1. Obtener metadatos (maxRecordCount, OBJECTID) y mapeos de dominio
+    metadatos = obtener_metadatos(url)
+    mapeos = obtener_mapeo_dominios(url, metadatos)
     
-    # 2. Descargar datos (Features) con paginación
+    # 2. Descargar, decodificar y guardar página por página: cada página se
+    # escribe apenas llega (columnas fijas según los campos de la capa) en un
+    # temporal que reemplaza al CSV solo si la descarga termina bien
     print(f"Descargando datos de: {nombre}...")
-    all_features = []
-    offset = 0
-    record_count = 2000
-    
-    while True:
-        try:
-            query_url = f"{url}/query"
-            params = {
-                "where": "1=1",
-                "outFields": "*",
-                "f": "json",
-                "resultRecordCount": record_count,
-                "resultOffset": offset
-            }
-            
-            response = requests.get(query_url, params=params, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            
-            features = data.get('features', [])
-            if not features:
-                break
-                
-            all_features.extend(features)
-            print(f"  - Descargados {len(features)} registros (Total: {len(all_features)})")
-            
-            if len(features) < record_count:
-                break
-                
-            offset += record_count
-            
-        except Exception as e:
-            print(f"Error descargando lote: {e}")
-            break
-    
-    if not all_features:
+    try:
+        with EscritorFeatures(output_file, columnas_de(metadatos), mapeos) as escritor:
+            for features in descargar_paginas(url, metadatos):
+                escritor.escribir(features)
+                print(f"  - Descargados {len(features)} registros (Total: {escritor.filas})")
+    except Exception as e:
+        # Sin guardar la capa a medias: la próxima corrida la saltaría por existir
+        print(f"Error descargando {nombre}: {e}")
         return
 
-    # 3. Procesar y reemplazar dominios
-    registros_procesados = []
-    for feat in all_features:
-        atributos = feat.get('attributes', {})
-        nuevo_registro = {}
-        
-        for k, v in atributos.items():
-            # Si el campo tiene dominio y el valor está en el mapeo, reemplazar
-            if k in mapeos and v in mapeos[k]:
-                nuevo_registro[k] = mapeos[k][v]
-            else:
-                nuevo_registro[k] = v
-        
-        registros_procesados.append(nuevo_registro)
-        
-    # 4. Guardar a CSV
-    try:
-        df = pd.DataFrame(registros_procesados)
-        
-        # Seleccionar columnas relevantes si se desea limpiar más
-        # Por ahora guardamos todo pero con valores decodificados
-        
-        output_file = os.path.join(OUTPUT_DIR, f"{nombre}_decodificado.csv")
-        # Usar utf-8-sig para asegurar compatibilidad con Excel y caracteres latinos
-        df.to_csv(output_file, index=False, encoding='utf-8-sig')
+    # Una capa sin registros no deja archivo (el temporal se descarta)
+    if escritor.filas:
         print(f"  - Guardado en: {output_file}")
-        
-    except Exception as e:
-        print(f"Error guardando {nombre}: {e}")
 
 def main():
     print("Iniciando descarga y procesamiento de dominios...")
@@ -141,9 +88,9 @@ def main():
         print("No hay capas para procesar.")
         return
 
+    # La concurrencia por capa está acotada por ARCGIS_WORKERS
     for capa in capas:
         descargar_y_procesar(capa)
-        time.sleep(1) # Pausa respetuosa
     print("\nProceso completado.")
 
 if __name__ == "__main__":
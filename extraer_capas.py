@@ -2,7 +2,7 @@ import json
 import csv
 import os
 import re
-import requests
+from metadatos_arcgis import cliente_arcgis, separar_url_capa
 
 def procesar_har():
     # Nombre exacto del archivo que ya está en la carpeta data
@@ -45,13 +45,12 @@ def procesar_har():
                 print(f"  -> Encontrada posible capa: {layer_url}")
                 
                 # Intentar obtener el nombre real consultando el servicio
+                # (una sola consulta, en caché, para todas las capas del mismo servicio)
                 try:
                     print(f"     Consultando metadatos...")
-                    resp = requests.get(f"{layer_url}?f=json", timeout=5)
-                    if resp.status_code == 200:
-                        meta = resp.json()
-                        nombre = meta.get('name', 'Sin Nombre')
-                        id_capa = meta.get('id', layer_url.split('/')[-1])
+                    nombre = cliente_arcgis().nombre_capa(layer_url)
+                    if nombre:
+                        id_capa = separar_url_capa(layer_url)[1]
                         
                         capas_finales.append({
                             'Nombre_Capa': nombre,
@@ -60,7 +59,7 @@ def procesar_har():
                         })
                         print(f"     ✅ Nombre: {nombre}")
                     else:
-                        print(f"     ⚠️ No se pudo obtener nombre (Status {resp.status_code})")
+                        print(f"     ⚠️ No se pudo obtener nombre (la capa no aparece en el servicio)")
                         # Agregar igual con nombre genérico
                         capas_finales.append({
                             'Nombre_Capa': f"Capa {layer_url.split('/')[-1]}",
@@ -0,0 +1,205 @@
+"""
+Cliente de metadatos de ArcGIS compartido por los scripts de ingesta
+(descargar_y_procesar_vias.py, extraer_capas.py y analizar_dominios.py).
+
+Las respuestas `?f=json` se guardan en una caché en disco por URL. Mientras
+tienen menos de ARCGIS_TTL segundos se usan sin consultar al servidor; después
+se revalidan con If-None-Match / If-Modified-Since (si el servidor no cambió,
+responde 304 y se reutiliza la copia). Si el servidor no responde se usa la
+copia vencida. Todas las consultas salen de una misma requests.Session con
+pool de conexiones.
+
+Los metadatos de una capa se resuelven a nivel de servicio: una sola consulta
+a FeatureServer/layers?f=json trae la definición (campos y dominios) de todas
+las capas del servicio, y FeatureServer?f=json trae sus nombres.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+# Carpeta de la caché (junto a la caché de tablas, ya ignorada por git)
+ARCGIS_CACHE = os.environ.get("ARCGIS_CACHE", os.path.join("data_vias_limpia", ".cache", "arcgis"))
+
+# Segundos que una respuesta se usa sin revalidar (por defecto, un día)
+ARCGIS_TTL = int(os.environ.get("ARCGIS_TTL", 24 * 3600))
+
+# Conexiones por servidor del pool y timeout de cada consulta (segundos)
+TAMANO_POOL = 8
+TIMEOUT = 30
+
+# URL de una capa: <servicio>/<id>
+_URL_CAPA = re.compile(r"^(https?://.*?/(?:FeatureServer|MapServer))/(\d+)/?$")
+
+
+class ErrorArcGIS(Exception):
+    """El servidor respondió con un objeto {"error": ...} en vez de los metadatos."""
+
+
+def separar_url_capa(url_capa):
+    """(url del servicio, id de la capa) o (None, None) si la URL no es de una capa."""
+    m = _URL_CAPA.match(url_capa.strip())
+    if not m:
+        return None, None
+    return m.group(1), int(m.group(2))
+
+
+def dominios_codificados(metadatos):
+    """Mapeo {campo: {codigo: descripcion}} de los campos con dominio de valores codificados."""
+    mapeo = {}
+    for field in metadatos.get('fields') or []:
+        dominio = field.get('domain')
+        if dominio and 'codedValues' in dominio:
+            mapeo[field['name']] = {cv['code']: cv['name'] for cv in dominio['codedValues']}
+    return mapeo
+
+
+def crear_sesion(tamano_pool=TAMANO_POOL):
+    """requests.Session que reutiliza hasta `tamano_pool` conexiones por servidor."""
+    sesion = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=tamano_pool, pool_maxsize=tamano_pool)
+    sesion.mount("https://", adaptador)
+    sesion.mount("http://", adaptador)
+    return sesion
+
+
+class ClienteArcGIS:
+    """Consultas JSON a servicios de ArcGIS con caché en disco, TTL y revalidación."""
+
+    def __init__(self, carpeta=ARCGIS_CACHE, ttl=ARCGIS_TTL, sesion=None, timeout=TIMEOUT):
+        self.carpeta = carpeta
+        self.ttl = ttl
+        self.sesion = sesion or crear_sesion()
+        self.timeout = timeout
+        # Un lock por clave: si varios hilos piden lo mismo, consulta uno solo
+        # y los demás leen lo que guardó
+        self._lock = threading.Lock()
+        self._locks = {}
+
+    def _ruta(self, clave):
+        return os.path.join(self.carpeta, hashlib.sha256(clave.encode('utf-8')).hexdigest()[:32] + ".json")
+
+    def _lock_de(self, clave):
+        with self._lock:
+            return self._locks.setdefault(clave, threading.Lock())
+
+    def _leer(self, clave):
+        try:
+            with open(self._ruta(clave), encoding='utf-8') as f:
+                entrada = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entrada if entrada.get('clave') == clave else None
+
+    def _guardar(self, clave, entrada):
+        """Escribe la entrada en un temporal y la renombra (una lectura nunca ve un archivo a medias)."""
+        entrada['clave'] = clave
+        try:
+            os.makedirs(self.carpeta, exist_ok=True)
+            fd, temporal = tempfile.mkstemp(dir=self.carpeta, suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entrada, f, ensure_ascii=False)
+            os.replace(temporal, self._ruta(clave))
+        except OSError as e:
+            print(f"No se pudo guardar en la caché de ArcGIS: {e}")
+
+    def obtener_json(self, url, params=None, refrescar=False):
+        """
+        Respuesta JSON de `url` (con f=json y los `params` dados), desde la caché
+        si está vigente. Con refrescar=True se revalida aunque no haya vencido.
+        Lanza ErrorArcGIS si el servidor responde con un error.
+        """
+        params = dict(params or {}, f='json')
+        clave = url + "?" + "&".join(f"{k}={params[k]}" for k in sorted(params))
+        with self._lock_de(clave):
+            return self._obtener_json(url, params, clave, refrescar)
+
+    def _obtener_json(self, url, params, clave, refrescar):
+        entrada = self._leer(clave)
+        if entrada is not None and not refrescar and time.time() - entrada['guardado'] < self.ttl:
+            return entrada['datos']
+
+        encabezados = {}
+        if entrada is not None:
+            if entrada.get('etag'):
+                encabezados['If-None-Match'] = entrada['etag']
+            if entrada.get('last_modified'):
+                encabezados['If-Modified-Since'] = entrada['last_modified']
+        try:
+            response = self.sesion.get(url, params=params, headers=encabezados, timeout=self.timeout)
+            if response.status_code == 304 and entrada is not None:
+                entrada['guardado'] = time.time()
+                self._guardar(clave, entrada)
+                return entrada['datos']
+            response.raise_for_status()
+            datos = response.json()
+        except (requests.RequestException, ValueError) as e:
+            if entrada is None:
+                raise
+            print(f"Usando metadatos guardados de {url} ({e})")
+            return entrada['datos']
+
+        # ArcGIS informa los errores con código 200 y un objeto "error"
+        if isinstance(datos, dict) and 'error' in datos:
+            raise ErrorArcGIS(f"{url}: {datos['error'].get('message', datos['error'])}")
+        self._guardar(clave, {
+            'guardado': time.time(),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'datos': datos,
+        })
+        return datos
+
+    def servicio(self, url_servicio):
+        """Metadatos de un FeatureServer/MapServer (nombre e id de sus capas y tablas)."""
+        return self.obtener_json(url_servicio.rstrip('/'))
+
+    def capas_de_servicio(self, url_servicio):
+        """Definición completa (campos y dominios) de todas las capas y tablas del servicio, por id."""
+        datos = self.obtener_json(url_servicio.rstrip('/') + "/layers")
+        return {capa['id']: capa for capa in (datos.get('layers') or []) + (datos.get('tables') or [])}
+
+    def nombre_capa(self, url_capa):
+        """Nombre de una capa según el servicio al que pertenece (None si no aparece)."""
+        url_servicio, id_capa = separar_url_capa(url_capa)
+        if url_servicio is None:
+            return self.metadatos_capa(url_capa).get('name')
+        datos = self.servicio(url_servicio)
+        for capa in (datos.get('layers') or []) + (datos.get('tables') or []):
+            if capa.get('id') == id_capa:
+                return capa.get('name')
+        return None
+
+    def metadatos_capa(self, url_capa):
+        """
+        Metadatos de una capa (`<capa>?f=json`). Se resuelven con la consulta
+        del servicio completo, compartida por todas sus capas; si el servidor no
+        la admite, se consulta la capa sola.
+        """
+        url_servicio, id_capa = separar_url_capa(url_capa)
+        if url_servicio is not None:
+            try:
+                capas = self.capas_de_servicio(url_servicio)
+                if id_capa in capas:
+                    return capas[id_capa]
+            except (requests.RequestException, ValueError, ErrorArcGIS) as e:
+                print(f"No se pudieron leer las capas de {url_servicio} ({e}); se consulta la capa")
+        return self.obtener_json(url_capa.rstrip('/'))
+
+
+_cliente = None
+_lock_cliente = threading.Lock()
+
+
+def cliente_arcgis():
+    """Cliente compartido del proceso (una sola sesión y caché para todos los scripts)."""
+    global _cliente
+    with _lock_cliente:
+        if _cliente is None:
+            _cliente = ClienteArcGIS()
+        return _cliente
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# Las pruebas importan los módulos como app.<modulo> y, como la aplicación,
+# leen data_vias_limpia/ y data/ relativos a la raíz del repositorio
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for ruta in (RAIZ, os.path.dirname(os.path.abspath(__file__))):
+    if ruta not in sys.path:
+        sys.path.insert(0, ruta)
+os.chdir(RAIZ)
+
+
+@pytest.fixture
+def servidor_arcgis():
+    """Servidor local que imita un FeatureServer de ArcGIS (ver servidor_arcgis.py)."""
+    from servidor_arcgis import ServidorArcGIS
+    servidor = ServidorArcGIS()
+    yield servidor
+    servidor.cerrar()
@@ -0,0 +1,135 @@
+"""
+Servidor local que imita un FeatureServer de ArcGIS para las pruebas de
+ingesta (metadatos_arcgis, descarga_arcgis y descargar_y_procesar_vias).
+
+Sirve una capa (id 0) con OBJECTID, TIPO (con dominio) y NOMBRE:
+  <servicio>?f=json            nombres de las capas
+  <servicio>/layers?f=json     definición de las capas (campos y dominios)
+  <servicio>/0?f=json          definición de la capa
+  <servicio>/0/query           returnCountOnly y páginas por resultOffset /
+                               resultRecordCount (como mucho `maximo` registros
+                               por respuesta; si corta, exceededTransferLimit)
+Los metadatos llevan ETag y responden 304 a If-None-Match. `fallas` es una
+lista de respuestas que se devuelven, en orden, a las próximas consultas a
+/query: '503', 'cortada' (cuerpo chunked interrumpido), 'error' (objeto de
+error de ArcGIS con código 500) o '400'.
+"""
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+RUTA_SERVICIO = "/arcgis/rest/services/Prueba/FeatureServer"
+
+CAMPOS = [
+    {'name': 'OBJECTID', 'type': 'esriFieldTypeOID'},
+    {'name': 'TIPO', 'type': 'esriFieldTypeSmallInteger',
+     'domain': {'type': 'codedValue', 'codedValues': [{'code': 1, 'name': 'Primaria'},
+                                                      {'code': 2, 'name': 'Secundaria'}]}},
+    {'name': 'NOMBRE', 'type': 'esriFieldTypeString'},
+]
+
+
+class ServidorArcGIS:
+
+    def __init__(self, registros=2500, maximo=1000, max_record_count=1000, etag='"v1"'):
+        self.registros = registros
+        self.maximo = maximo
+        self.max_record_count = max_record_count
+        self.etag = etag
+        self.fallas = []
+        # (ruta, parámetros) de cada pedido recibido
+        self.pedidos = []
+        self._lock = threading.Lock()
+        servidor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                servidor._atender(self)
+
+        self._http = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+        self.url_servicio = f"http://127.0.0.1:{self._http.server_address[1]}{RUTA_SERVICIO}"
+        self.url_capa = self.url_servicio + "/0"
+        self._hilo = threading.Thread(target=self._http.serve_forever, args=(0.05,), daemon=True)
+        self._hilo.start()
+
+    def cerrar(self):
+        self._http.shutdown()
+        self._http.server_close()
+
+    def metadatos(self):
+        return {'id': 0, 'name': 'Capa prueba', 'maxRecordCount': self.max_record_count,
+                'objectIdField': 'OBJECTID', 'fields': CAMPOS}
+
+    def feature(self, objectid):
+        return {'attributes': {'OBJECTID': objectid, 'TIPO': 1 + objectid % 2, 'NOMBRE': f'Vía {objectid}'}}
+
+    def consultas(self, **filtro):
+        """Parámetros de los pedidos a /query que tienen los valores de `filtro`."""
+        with self._lock:
+            return [p for ruta, p in self.pedidos
+                    if ruta.endswith('/query') and all(p.get(k) == v for k, v in filtro.items())]
+
+    def _atender(self, manejador):
+        url = urlparse(manejador.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        with self._lock:
+            self.pedidos.append((url.path, params))
+            falla = self.fallas.pop(0) if url.path.endswith('/query') and self.fallas else None
+
+        if falla == 'cortada':
+            return self._cortar(manejador)
+        if falla in ('503', '400'):
+            return self._enviar(manejador, {'error': falla}, int(falla))
+        if falla == 'error':
+            return self._enviar(manejador, {'error': {'code': 500, 'message': 'Unable to complete operation.'}})
+
+        if url.path == RUTA_SERVICIO:
+            return self._enviar_metadatos(manejador, {'layers': [{'id': 0, 'name': 'Capa prueba'}], 'tables': []})
+        if url.path == RUTA_SERVICIO + '/layers':
+            return self._enviar_metadatos(manejador, {'layers': [self.metadatos()], 'tables': []})
+        if url.path == RUTA_SERVICIO + '/0':
+            return self._enviar_metadatos(manejador, self.metadatos())
+        if url.path == RUTA_SERVICIO + '/0/query':
+            if params.get('returnCountOnly') == 'true':
+                return self._enviar(manejador, {'count': self.registros})
+            inicio = int(params.get('resultOffset', 0))
+            pedidos = int(params.get('resultRecordCount', self.max_record_count))
+            fin = min(inicio + min(pedidos, self.maximo), self.registros)
+            cortada = fin < min(inicio + pedidos, self.registros)
+            return self._enviar(manejador, {'features': [self.feature(i) for i in range(inicio + 1, fin + 1)],
+                                            'exceededTransferLimit': cortada})
+        self._enviar(manejador, {'error': {'code': 400, 'message': 'Invalid URL'}})
+
+    def _enviar_metadatos(self, manejador, datos):
+        if manejador.headers.get('If-None-Match') == self.etag:
+            manejador.send_response(304)
+            manejador.send_header('Content-Length', '0')
+            manejador.end_headers()
+            return
+        self._enviar(manejador, datos, encabezados={'ETag': self.etag})
+
+    def _enviar(self, manejador, datos, codigo=200, encabezados=None):
+        cuerpo = json.dumps(datos).encode('utf-8')
+        manejador.send_response(codigo)
+        manejador.send_header('Content-Type', 'application/json')
+        manejador.send_header('Content-Length', str(len(cuerpo)))
+        for clave, valor in (encabezados or {}).items():
+            manejador.send_header(clave, valor)
+        manejador.end_headers()
+        manejador.wfile.write(cuerpo)
+
+    def _cortar(self, manejador):
+        """Anuncia un cuerpo chunked y corta la conexión a la mitad de un bloque."""
+        manejador.send_response(200)
+        manejador.send_header('Content-Type', 'application/json')
+        manejador.send_header('Transfer-Encoding', 'chunked')
+        manejador.end_headers()
+        manejador.wfile.write(b'400\r\n{"features": [')
+        manejador.wfile.flush()
+        manejador.close_connection = True
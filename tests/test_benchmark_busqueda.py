@@ -0,0 +1,39 @@
+import numpy as np
+
+from benchmark_busqueda import (comparar, es_escalable, escalar_csv, leer_filas_csv, percentil,
+                                resumen_latencias, rss_maximo_mb, suma_verificacion)
+
+
+def test_percentil_igual_a_numpy():
+    valores = list(np.random.default_rng(3).exponential(size=101))
+    for p in (0, 50, 95, 99, 100):
+        assert abs(percentil(valores, p) - np.percentile(valores, p)) < 1e-12
+    assert percentil([], 50) == 0.0
+
+
+def test_resumen_latencias_en_milisegundos():
+    assert resumen_latencias([0.001, 0.003]) == \
+        {'n': 2, 'p50_ms': 2.0, 'p95_ms': 2.9, 'p99_ms': 2.98, 'media_ms': 2.0}
+    assert resumen_latencias([])['media_ms'] == 0.0
+
+
+def test_escalar_csv_repite_las_filas(tmp_path):
+    origen, destino = tmp_path / 'Base_x.csv', tmp_path / 'Base_x_10.csv'
+    origen.write_bytes('MUNICIPIO,VALOR\nJardín,1\n"Turbo, Urabá",2\n'.encode('latin-1'))
+    escalar_csv(str(origen), str(destino), 3)
+    encabezado, filas = leer_filas_csv(str(destino))
+    assert encabezado == ['MUNICIPIO', 'VALOR'] and filas == [['Jardín', '1'], ['Turbo, Urabá', '2']] * 3
+    assert es_escalable('Base_Necesidades.csv') and not es_escalable('Municipios.csv')
+
+
+def test_comparar_cuenta_las_respuestas_distintas(capsys):
+    anterior = {'1': {'sumas': {'a': suma_verificacion('x'), 'b': suma_verificacion('y')}}}
+    actual = {'1': {'sumas': {'a': suma_verificacion('x'), 'b': suma_verificacion('z'), 'c': '0'}},
+              '10': {'sumas': {'a': '1'}}}
+    assert comparar(actual, anterior) == 1
+    assert "cambió la respuesta de 'b'" in capsys.readouterr().out
+
+
+def test_rss_maximo_del_proceso():
+    rss = rss_maximo_mb()
+    assert rss is None or 1 < rss < 1e5
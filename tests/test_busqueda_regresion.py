@@ -0,0 +1,67 @@
+"""
+Regresión de la búsqueda por texto: el top-k de cada consulta fija debe ser el
+mismo que devolvía la versión base (difflib.SequenceMatcher fila por fila).
+
+datos/busqueda_base.json guarda, por consulta, los bloques FUENTE de la
+versión base como [fuente, relevancia, nombre]. Los empates se comparan sin
+orden (la base ordenaba con un sort no estable), y el nombre solo en los
+bloques que no pueden estar empatados con filas que quedaron fuera del corte:
+los de puntaje único y mayor que el último del resultado y que el último de
+su tabla. Las consultas de identificadores no están: desde
+el índice de claves responden solo con las filas del identificador. Las que
+nombran veredas o municipios suman a lo sumo una fila de esas tablas (la base
+no las buscaba); sin ella, el resto es el comienzo del top-k de la base.
+"""
+import json
+import os
+import re
+from collections import Counter
+
+import pytest
+
+from app import rag
+
+BASE = os.path.join(os.path.dirname(__file__), 'datos', 'busqueda_base.json')
+ETIQUETAS_NOMBRE = ['Nombre Via', 'Necesidad', 'Proyectos', 'Vere Nombre', 'Mpio Nombre', 'Municipio']
+# Tablas que la base no buscaba (ver catalogo_tablas)
+DIVISION_POLITICA = {'Veredas', 'Municipios'}
+_BLOQUE = re.compile(r'FUENTE: (.+?) \(Relevancia: ([\d.]+)\)\n(.*?)(?=\n-{10,}|\Z)', re.S)
+
+with open(BASE, encoding='utf-8') as f:
+    ESPERADO = json.load(f)
+
+
+def ranking(texto):
+    """[fuente, relevancia, nombre] de cada bloque FUENTE de una respuesta."""
+    bloques = []
+    for fuente, relevancia, cuerpo in _BLOQUE.findall(texto):
+        campos = dict(re.findall(r'^- (.+?): (.*)$', cuerpo, re.M))
+        nombre = next((campos[e].strip() for e in ETIQUETAS_NOMBRE if e in campos), None)
+        bloques.append([fuente, float(relevancia), nombre])
+    return bloques
+
+
+@pytest.mark.parametrize('consulta', list(ESPERADO))
+def test_top_k_igual_a_la_base(consulta):
+    obtenido = ranking(rag.buscar_datos_vias_sin_cache(consulta))
+    esperado = ESPERADO[consulta]
+    division = [b for b in obtenido if b[0] in DIVISION_POLITICA]
+    if division:
+        assert len(division) <= len({b[0] for b in division})
+        obtenido = [b for b in obtenido if b[0] not in DIVISION_POLITICA]
+        esperado = esperado[:len(obtenido)]
+
+    def puntajes(bloques):
+        return sorted((-relevancia, fuente) for fuente, relevancia, _ in bloques)
+
+    assert puntajes(obtenido) == puntajes(esperado)
+
+    empates = Counter((fuente, relevancia) for fuente, relevancia, _ in esperado)
+    minimo_tabla = {}
+    for fuente, relevancia, _ in esperado:
+        minimo_tabla[fuente] = min(relevancia, minimo_tabla.get(fuente, relevancia))
+    nombres = {(fuente, relevancia): nombre for fuente, relevancia, nombre in obtenido}
+    for fuente, relevancia, nombre in esperado:
+        if (empates[(fuente, relevancia)] == 1 and relevancia > esperado[-1][1]
+                and relevancia > minimo_tabla[fuente]):
+            assert nombres[(fuente, relevancia)] == nombre, (fuente, relevancia)
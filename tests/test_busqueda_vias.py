@@ -0,0 +1,110 @@
+import os
+import signal
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app import busqueda_vias, rag
+from app.tablas_vias import normalize, registro_tablas
+
+
+CONSULTAS_POOL = [(['ceja'], 'via la ceja'), (['abejorral'], 'abejorral'),
+                  (['carmen', 'viboral'], 'el carmen de viboral')]
+
+
+def puntuar():
+    umbrales = [lambda: 0] * len(CONSULTAS_POOL)
+    return {archivo: [(posiciones.tolist(), scores.tolist()) for posiciones, scores, _ in resultados]
+            for archivo, resultados in busqueda_vias.puntuar_archivos_lote(rag.archivos_de_busqueda(),
+                                                                           CONSULTAS_POOL, umbrales)}
+
+
+@pytest.mark.parametrize('modo', ['hilos', 'procesos'])
+def test_pool_da_el_mismo_resultado_que_la_busqueda_secuencial(monkeypatch, modo):
+    monkeypatch.setattr(busqueda_vias, 'VIAS_POOL', 'no')
+    secuencial = puntuar()
+
+    monkeypatch.setattr(busqueda_vias, 'VIAS_POOL', modo)
+    monkeypatch.setattr(busqueda_vias, 'VIAS_WORKERS', 2)
+    monkeypatch.setattr(busqueda_vias, '_pool', None)
+    try:
+        assert puntuar() == secuencial
+    finally:
+        busqueda_vias._pool.shutdown()
+
+
+def test_pool_de_procesos_roto_se_reemplaza(monkeypatch):
+    monkeypatch.setattr(busqueda_vias, 'VIAS_POOL', 'no')
+    secuencial = puntuar()
+    monkeypatch.setattr(busqueda_vias, 'VIAS_POOL', 'procesos')
+    monkeypatch.setattr(busqueda_vias, 'VIAS_WORKERS', 2)
+    monkeypatch.setattr(busqueda_vias, '_pool', None)
+    try:
+        assert puntuar() == secuencial
+        roto = busqueda_vias._pool
+        # Un worker muerto (p. ej. por falta de memoria) rompe el pool
+        for proceso in list(roto._processes.values()):
+            os.kill(proceso.pid, signal.SIGKILL)
+        with pytest.raises(BrokenProcessPool):
+            roto.submit(os.getpid).result(timeout=30)
+
+        assert puntuar() == secuencial
+        assert busqueda_vias._pool is None
+        assert puntuar() == secuencial
+        assert busqueda_vias._pool is not roto
+    finally:
+        if busqueda_vias._pool is not None:
+            busqueda_vias._pool.shutdown()
+
+
+def test_tabla_que_no_responde_se_omite(monkeypatch):
+    monkeypatch.setattr(busqueda_vias, 'VIAS_POOL', 'no')
+    secuencial = puntuar()
+    lenta = rag.archivos_de_busqueda()[0]
+    original = busqueda_vias.mejores_de_tabla_lote
+
+    def mejores(archivo, *args):
+        if archivo == lenta:
+            time.sleep(1)
+        return original(archivo, *args)
+
+    monkeypatch.setattr(busqueda_vias, 'mejores_de_tabla_lote', mejores)
+    monkeypatch.setattr(busqueda_vias, 'VIAS_POOL', 'hilos')
+    monkeypatch.setattr(busqueda_vias, 'VIAS_WORKERS', 2)
+    monkeypatch.setattr(busqueda_vias, 'VIAS_TIMEOUT_TABLA', 0.2)
+    monkeypatch.setattr(busqueda_vias, '_pool', None)
+    try:
+        del secuencial[lenta]
+        assert puntuar() == secuencial
+    finally:
+        busqueda_vias._pool.shutdown()
+
+
+CONSULTAS_LOTE = ['vías en Abejorral', 'VIAS EN ABEJORRAL', 'cuantas vias hay en el oriente', 'radicado 2024010048235',
+                  'proyectos en turbo', 'la', 'via la ceja el tambo']
+
+
+def test_lote_igual_a_consultas_sueltas():
+    esperado = [rag.buscar_datos_vias_sin_cache(q) for q in CONSULTAS_LOTE]
+    assert rag.buscar_datos_vias_batch_sin_cache(CONSULTAS_LOTE) == esperado
+    assert rag.buscar_datos_vias_batch(CONSULTAS_LOTE) == esperado
+
+
+def test_lote_usa_las_consultas_ya_normalizadas():
+    # Con `normalizadas` el lote no vuelve a normalizar el texto original
+    normalizadas = [normalize(q) for q in CONSULTAS_LOTE]
+    obtenido = rag.buscar_datos_vias_batch_sin_cache(['?'] * len(CONSULTAS_LOTE), normalizadas)
+    assert obtenido == [rag.buscar_datos_vias_sin_cache(q) for q in CONSULTAS_LOTE]
+
+
+def test_identificador_se_resuelve_por_clave():
+    necesidades = registro_tablas.obtener_tabla('Base_Necesidades.csv')
+    radicado = str(necesidades.df['RADICADOS ASOCIADOS'].dropna().iloc[0])
+    respuesta = rag.buscar_datos_vias_sin_cache(radicado)
+    assert 'Relevancia: 500.00' in respuesta and radicado in respuesta
+    # Los IDs cortos solo cuentan si la consulta dice de qué son
+    filas, encontradas = necesidades.filas_por_clave(['1'], 'muestrame 1')
+    assert not filas and not encontradas
+    filas, _ = necesidades.filas_por_clave(['1'], 'necesidad 1')
+    assert list(filas) == necesidades.df.index[necesidades.df['ID_NECESIDAD'] == 1].tolist()
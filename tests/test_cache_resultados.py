@@ -0,0 +1,72 @@
+import pytest
+
+from app import rag
+from app.cache_resultados import CacheResultados, FALTA
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self):
+        return self.ahora
+
+
+def test_lru_vencimiento_y_version():
+    reloj = Reloj()
+    cache = CacheResultados(max_entradas=2, ttl=10, reloj=reloj)
+    cache.consultar('a', 1)
+    cache.guardar('a', 1, 'A')
+    cache.guardar('b', 1, 'B')
+    assert cache.consultar('a', 1) == 'A'
+    cache.guardar('c', 1, 'C')
+    # 'b' era la menos usada
+    assert cache.consultar('b', 1) is FALTA
+    reloj.ahora = 11
+    assert cache.consultar('a', 1) is FALTA
+    cache.guardar('c', 1, 'C')
+    assert cache.consultar('c', 2) is FALTA
+    assert cache.estadisticas()['vencidos'] == 1
+
+
+def test_no_guarda_si_calcular_falla():
+    cache = CacheResultados()
+
+    def falla():
+        raise RuntimeError('sin datos')
+
+    with pytest.raises(RuntimeError):
+        cache.obtener('a', 1, falla)
+    assert cache.obtener('a', 1, lambda: 'A') == 'A'
+
+
+@pytest.fixture
+def busqueda_que_falla(monkeypatch):
+    """preparar_busqueda falla mientras `fallas['activa']` sea verdadero, con una caché vacía."""
+    monkeypatch.setattr(rag, 'cache_datos_vias', CacheResultados())
+    original = rag.preparar_busqueda
+    fallas = {'activa': True}
+
+    def preparar(*args, **kwargs):
+        if fallas['activa']:
+            raise RuntimeError('tabla rota')
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(rag, 'preparar_busqueda', preparar)
+    return fallas
+
+
+def test_error_de_busqueda_no_queda_en_cache(busqueda_que_falla):
+    consulta = 'vías en Abejorral'
+    assert rag.buscar_datos_vias(consulta) == ""
+    busqueda_que_falla['activa'] = False
+    respuesta = rag.buscar_datos_vias(consulta)
+    assert respuesta and respuesta == rag.buscar_datos_vias_sin_cache(consulta)
+
+
+def test_error_en_lote_no_queda_en_cache(busqueda_que_falla):
+    consultas = ['vías en Abejorral', 'proyectos en turbo']
+    assert rag.buscar_datos_vias_batch(consultas) == ["", ""]
+    assert rag.cache_datos_vias.estadisticas()['entradas'] == 0
+    busqueda_que_falla['activa'] = False
+    assert rag.buscar_datos_vias_batch(consultas) == [rag.buscar_datos_vias_sin_cache(q) for q in consultas]
@@ -0,0 +1,93 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from app import cache_vias
+from app.cache_vias import CacheTablas, MapaFilas, guardar_npz, leer_npz, guardar_estados, leer_estados
+from app.tablas_vias import RegistroTablas, normalize
+
+TABLA = 'Base_Radicados.csv'
+
+
+def test_npz_conserva_tipos_y_vacios(tmp_path):
+    df = pd.DataFrame({
+        'texto': ['Peñol', None, 'vía ñ', ''],
+        'categoria': pd.Categorical(['a', 'b', None, 'a']),
+        'entero': pd.array([1, None, 3, 4], dtype='Int64'),
+        'real': np.array([1.5, np.nan, 0.0, -2.0], dtype=np.float32),
+        'fecha': pd.to_datetime(['2024-01-01', None, '2025-06-30', '2020-02-29']),
+    })
+    ruta = tmp_path / 'tabla.npz'
+    with open(ruta, 'wb') as f:
+        columnas = guardar_npz(df, f)
+    assert_frame_equal(leer_npz(ruta, columnas), df)
+
+
+def test_estados_de_indices_ida_y_vuelta(tmp_path):
+    estados = {'a': {'filas': {'peñol': np.array([1, 4], dtype=np.int32), '': np.array([0], dtype=np.int32),
+                               'vía': np.empty(0, dtype=np.int32)},
+                     'cadenas': ['á', 'b', '', 'ñandú'],
+                     'matriz': np.arange(6, dtype=np.int16).reshape(2, 3)},
+               'b': {'vacio': {}}}
+    ruta = tmp_path / 'indices.npz'
+    with open(ruta, 'wb') as f:
+        campos = guardar_estados(estados, f)
+    leidos = leer_estados(ruta, campos)
+    assert {k: v.tolist() for k, v in leidos['a']['filas'].items()} == {'peñol': [1, 4], '': [0], 'vía': []}
+    assert leidos['a']['cadenas'] == ['á', 'b', '', 'ñandú']
+    assert leidos['a']['matriz'].tolist() == estados['a']['matriz'].tolist()
+    assert dict(leidos['b']['vacio']) == {}
+
+
+def registro_en(tmp_path):
+    return RegistroTablas(str(tmp_path / 'datos'), cache=CacheTablas(str(tmp_path / 'cache')))
+
+
+def busquedas(tabla):
+    """Resultados de los índices de una tabla para algunas consultas."""
+    consultas = [(['carmen'], 'el carmen de viboral'), (['turbo'], 'turbo'), (['ceja'], 'via la ceja'),
+                 ([], tabla.valores_norm(tabla.name_col)[0][:-3])]
+    return ([tabla.candidatos(palabras, norm, 0.6).tolist() for palabras, norm in consultas],
+            [tabla.similitudes(tabla.name_col, norm, 0.6).tolist() for _, norm in consultas],
+            [tabla.parecidos(norm) for _, norm in consultas],
+            [sorted(tabla.filas_por_clave([str(v)], 'radicado')[0]) for v in tabla.df['RADICADO'].head(20)])
+
+
+def test_mapa_filas():
+    mapa = MapaFilas(['a', 'b'], np.array([3, 4, 7], dtype=np.int32), np.array([0, 2, 3]))
+    assert mapa['a'].tolist() == [3, 4] and mapa.get('b').tolist() == [7]
+    assert mapa.get('c') is None and mapa.get('c', 0) == 0
+    assert dict(mapa).keys() == {'a', 'b'}
+
+
+def test_tabla_e_indices_salen_de_la_cache(tmp_path):
+    os.makedirs(tmp_path / 'datos')
+    shutil.copy(os.path.join('data_vias_limpia', TABLA), tmp_path / 'datos')
+
+    construida = registro_en(tmp_path).obtener_tabla(TABLA)
+    assert sorted(os.listdir(tmp_path / 'cache')) == sorted(
+        TABLA + sufijo for sufijo in ['.feather' if cache_vias.HAY_FEATHER else '.npz', '.manifest.json',
+                                      '.indices.npz', '.indices.manifest.json'])
+
+    # Otro proceso (registro nuevo) toma la tabla y los índices de la caché
+    leida = registro_en(tmp_path).obtener_tabla(TABLA)
+    assert isinstance(leida.indice.tokens, MapaFilas)
+    assert_frame_equal(leida.df, construida.df)
+    assert busquedas(leida) == busquedas(construida)
+
+
+def test_csv_nuevo_invalida_la_cache(tmp_path):
+    os.makedirs(tmp_path / 'datos')
+    ruta = tmp_path / 'datos' / TABLA
+    shutil.copy(os.path.join('data_vias_limpia', TABLA), ruta)
+    registro_en(tmp_path).obtener_tabla(TABLA)
+
+    df = pd.read_csv(ruta, encoding='utf-8-sig')
+    df.loc[0, 'MUNICIPIO'] = 'Municipio Nuevo'
+    df.to_csv(ruta, index=False, encoding='utf-8-sig')
+    tabla = registro_en(tmp_path).obtener_tabla(TABLA)
+    assert not isinstance(tabla.indice.tokens, MapaFilas)
+    assert 0 in tabla.indice.filas_con_palabra(normalize('Nuevo')).tolist()
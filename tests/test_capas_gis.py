@@ -0,0 +1,47 @@
+import os
+
+import pandas as pd
+
+from app import capas_gis
+from app.capas_gis import CatalogoCapas, terminos, version_catalogo, obtener_catalogo
+
+
+def catalogo(**kwargs):
+    df = pd.DataFrame({'Nombre_Capa': ['Red vial primaria', 'Red vial terciaria', 'Municipios', 'Puentes'],
+                       'URL_Servicio': ['u1', 'u2', 'u3', 'u4'],
+                       'Alias': [None, None, None, 'viaductos']})
+    return CatalogoCapas(df, **kwargs)
+
+
+def test_terminos_sin_tildes_plurales_ni_palabras_vacias():
+    assert terminos('Muéstrame la capa de las Vías Terciarias 2024') == ['via', 'terciaria']
+    assert terminos('MPIO_NOMBRE') == ['mpio', 'nombre']
+
+
+def test_el_nombre_pesa_mas_que_alias_y_campos():
+    capas = catalogo(campos_por_capa={'Municipios': ['PUENTE_ID']})
+    assert [nombre for nombre, _, _ in capas.buscar('puentes')] == ['Puentes']
+    # El alias del catálogo y los de ALIAS_CAPAS cuentan
+    assert capas.buscar('viaductos')[0][:2] == ('Puentes', 'u4')
+    assert capas.buscar('caminos veredales')[0][0] == 'Red vial terciaria'
+    assert capas.buscar('nada que ver') == []
+
+
+def test_version_y_catalogo_se_renuevan_si_cambia_el_csv(tmp_path, monkeypatch):
+    monkeypatch.setattr(capas_gis, '_catalogo', None)
+    ruta = tmp_path / 'catalogo_capas.csv'
+    carpeta = tmp_path / 'datos'
+    os.makedirs(carpeta)
+    assert version_catalogo(str(ruta), str(carpeta)) is None
+
+    ruta.write_text('Nombre_Capa,ID,URL_Servicio\nPuentes,1,u1\n', encoding='utf-8')
+    (carpeta / 'Puentes_decodificado.csv').write_text('OBJECTID,MATERIAL\n1,acero\n', encoding='utf-8')
+    primero = obtener_catalogo(ruta=str(ruta), carpeta=str(carpeta))
+    assert obtener_catalogo(ruta=str(ruta), carpeta=str(carpeta)) is primero
+    # Los campos del CSV decodificado también se indexan
+    assert primero.buscar('material')[0][0] == 'Puentes'
+
+    ruta.write_text('Nombre_Capa,ID,URL_Servicio\nPuentes,1,u1\nVeredas,2,u2\n', encoding='utf-8')
+    segundo = obtener_catalogo(ruta=str(ruta), carpeta=str(carpeta))
+    assert segundo is not primero
+    assert segundo.buscar('veredas')[0][0] == 'Veredas'
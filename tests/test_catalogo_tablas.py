@@ -0,0 +1,53 @@
+from app.catalogo_tablas import DefinicionTabla, definicion_de, columnas_catalogo
+from app.tablas_vias import registro_tablas
+from app import rag
+
+
+def test_definicion_por_nombre_y_por_patron():
+    assert definicion_de('Base_Radicados.csv').codigo == 'RADICADO'
+    assert definicion_de('Red_vial_cuaternaria_decodificado.csv').nombre == 'NOMBRE_VIA'
+    assert definicion_de('Otra_tabla.csv') is None
+
+
+def test_primera_entrada_que_coincide():
+    catalogo = {'Red_*.csv': DefinicionTabla('A'), 'Red_vial*.csv': DefinicionTabla('B')}
+    assert definicion_de('Red_vial_primaria.csv', catalogo).nombre == 'A'
+
+
+def test_columnas_catalogo_sin_repetir():
+    columnas = columnas_catalogo()
+    assert len(columnas) == len(set(columnas))
+    assert {'NOMBRE_VIA', 'CODIGO_VIA', 'MUNICIPIO', 'VERE_NOMBRE'} <= set(columnas)
+
+
+def test_tabla_toma_sus_columnas_del_catalogo():
+    tabla = registro_tablas.obtener_tabla('Base_Necesidades.csv')
+    assert (tabla.name_col, tabla.code_col, tabla.loc_col) == ('NECESIDAD', 'RADICADOS ASOCIADOS', 'MUNICIPIO')
+    assert tabla.peso == 1.0
+
+
+def test_division_politica_solo_si_la_consulta_la_nombra():
+    archivos = rag.archivos_de_busqueda()
+    assert {'Veredas_decodificado.csv', 'Municipios_decodificado.csv'} <= set(archivos)
+    veredas = registro_tablas.obtener_tabla('Veredas_decodificado.csv')
+    assert veredas.peso_consulta('veredas de amalfi') == 1.0 and veredas.peso_consulta('vias de amalfi') == 0.0
+    # Y sigue alimentando el gazetteer
+    lugares = registro_tablas.gazetteer().buscar('vereda el carmen de amalfi')
+    assert {e.tipo for e in lugares} == {'vereda', 'municipio'}
+
+
+def test_consulta_por_vereda_trae_la_vereda():
+    respuesta = rag.buscar_datos_vias_sin_cache('vereda la española')
+    bloques = respuesta.split('FUENTE: ')[1:]
+    assert bloques[0].startswith('Veredas') and '- Vere Nombre: La Española' in bloques[0]
+    assert sum(b.startswith('Veredas') for b in bloques) == 1
+    # Con las columnas del catálogo, en su orden
+    assert bloques[0].index('Vere Nombre') < bloques[0].index('Mpio Nombre')
+
+
+def test_consulta_normal_no_cambia(monkeypatch):
+    consultas = ['vías en Jardín', 'via la ceja el tambo', 'necesidades en el carmen de viboral']
+    con_division = [rag.buscar_datos_vias_sin_cache(q) for q in consultas]
+    sin_division = [a for a in rag.archivos_de_busqueda() if not a.startswith(('Veredas', 'Municipios'))]
+    monkeypatch.setattr(rag, 'archivos_de_busqueda', lambda: sin_division)
+    assert [rag.buscar_datos_vias_sin_cache(q) for q in consultas] == con_division
@@ -0,0 +1,99 @@
+import os
+
+import pytest
+import requests
+
+from descarga_arcgis import EscritorFeatures, columnas_de, consultar, contar_registros, descargar_paginas
+
+# Sin esperas entre reintentos
+RAPIDO = {'reintentos': 2, 'espera': 0.0, 'timeout': 5}
+
+
+def descargar(servidor, **kwargs):
+    with requests.Session() as sesion:
+        paginas = list(descargar_paginas(servidor.url_capa, servidor.metadatos(), sesion=sesion,
+                                         **dict(RAPIDO, **kwargs)))
+    return [f['attributes']['OBJECTID'] for pagina in paginas for f in pagina]
+
+
+def test_cuenta_registros_con_return_count_only(servidor_arcgis):
+    with requests.Session() as sesion:
+        assert contar_registros(sesion, servidor_arcgis.url_capa, **RAPIDO) == 2500
+    assert len(servidor_arcgis.consultas(returnCountOnly='true')) == 1
+
+
+def test_pagina_por_result_offset_en_orden(servidor_arcgis):
+    assert descargar(servidor_arcgis, workers=3) == list(range(1, 2501))
+    offsets = sorted(int(p['resultOffset']) for p in servidor_arcgis.consultas(outFields='*'))
+    assert offsets == [0, 1000, 2000]
+
+
+def test_completa_paginas_cortadas_por_exceeded_transfer_limit(servidor_arcgis):
+    # La capa anuncia 1000 por página pero cada respuesta trae como mucho 300
+    servidor_arcgis.maximo = 300
+    assert descargar(servidor_arcgis, workers=2) == list(range(1, 2501))
+    consultas = servidor_arcgis.consultas(outFields='*')
+    # 1000 = 300 + 300 + 300 + 100 en las dos primeras páginas y 500 = 300 + 200 en la última
+    assert len(consultas) == 4 + 4 + 2
+    assert {'0', '300', '600', '900'} <= {p['resultOffset'] for p in consultas}
+
+
+def test_sin_total_pagina_secuencialmente(servidor_arcgis):
+    # El conteo falla todas las veces: se pagina de a una hasta una página incompleta
+    servidor_arcgis.fallas = ['400']
+    assert descargar(servidor_arcgis) == list(range(1, 2501))
+
+
+@pytest.mark.parametrize('falla', ['503', 'cortada', 'error'])
+def test_reintenta_fallas_transitorias(servidor_arcgis, falla):
+    servidor_arcgis.fallas = [falla]
+    with requests.Session() as sesion:
+        datos = consultar(sesion, servidor_arcgis.url_capa, {'where': '1=1', 'returnCountOnly': 'true'}, **RAPIDO)
+    assert datos == {'count': 2500}
+    assert len(servidor_arcgis.consultas()) == 2
+
+
+def test_descarga_se_recupera_de_un_503(servidor_arcgis):
+    servidor_arcgis.fallas = ['503', '503']
+    assert descargar(servidor_arcgis) == list(range(1, 2501))
+
+
+def test_no_reintenta_errores_permanentes(servidor_arcgis):
+    servidor_arcgis.fallas = ['400']
+    with requests.Session() as sesion, pytest.raises(requests.HTTPError):
+        consultar(sesion, servidor_arcgis.url_capa, {'where': '1=1'}, **RAPIDO)
+    assert len(servidor_arcgis.consultas()) == 1
+
+
+def test_agota_los_reintentos(servidor_arcgis):
+    servidor_arcgis.fallas = ['cortada'] * 3
+    with requests.Session() as sesion, pytest.raises(requests.RequestException):
+        consultar(sesion, servidor_arcgis.url_capa, {'where': '1=1'}, **RAPIDO)
+    assert len(servidor_arcgis.consultas()) == 3
+
+
+def test_escritor_con_columnas_fijas_y_dominios(tmp_path):
+    ruta = tmp_path / 'capa.csv'
+    columnas = columnas_de({'fields': [{'name': 'OBJECTID'}, {'name': 'TIPO'}, {'name': 'NOMBRE'}]})
+    with EscritorFeatures(str(ruta), columnas, {'TIPO': {1: 'Primaria'}}) as escritor:
+        escritor.escribir([{'attributes': {'OBJECTID': 1, 'TIPO': 1, 'NOMBRE': 'Vía Ñ'}}])
+        # Un campo que no está en los metadatos se ignora y uno que falta queda vacío
+        escritor.escribir([{'attributes': {'OBJECTID': 2, 'TIPO': 9, 'EXTRA': 'x'}}])
+        assert not ruta.exists()
+    assert escritor.filas == 2
+    assert ruta.read_text(encoding='utf-8-sig') == 'OBJECTID,TIPO,NOMBRE\n1,Primaria,Vía Ñ\n2,9,\n'
+    assert os.listdir(tmp_path) == ['capa.csv']
+
+
+def test_escritor_que_falla_no_deja_archivo(tmp_path):
+    ruta = tmp_path / 'capa.csv'
+    with pytest.raises(RuntimeError):
+        with EscritorFeatures(str(ruta)) as escritor:
+            escritor.escribir([{'attributes': {'OBJECTID': 1}}])
+            raise RuntimeError('se cortó la descarga')
+    assert os.listdir(tmp_path) == []
+
+    # Sin páginas tampoco queda archivo
+    with EscritorFeatures(str(ruta)):
+        pass
+    assert os.listdir(tmp_path) == []
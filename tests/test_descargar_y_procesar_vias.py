@@ -0,0 +1,40 @@
+import os
+
+import pandas as pd
+import pytest
+
+import descargar_y_procesar_vias as ingesta
+import metadatos_arcgis
+
+
+@pytest.fixture
+def ingesta_local(servidor_arcgis, tmp_path, monkeypatch):
+    """El script de ingesta escribiendo en tmp_path, con su propia caché de metadatos."""
+    monkeypatch.setattr(ingesta, 'OUTPUT_DIR', str(tmp_path))
+    monkeypatch.setattr(metadatos_arcgis, '_cliente', metadatos_arcgis.ClienteArcGIS(carpeta=str(tmp_path / 'cache')))
+    return {'nombre': 'Capa_prueba', 'url': servidor_arcgis.url_capa}
+
+
+def test_descarga_decodifica_y_guarda_la_capa(servidor_arcgis, ingesta_local, tmp_path):
+    servidor_arcgis.registros = 1234
+    ingesta.descargar_y_procesar(ingesta_local)
+
+    df = pd.read_csv(tmp_path / 'Capa_prueba_decodificado.csv', encoding='utf-8-sig')
+    assert list(df.columns) == ['OBJECTID', 'TIPO', 'NOMBRE']
+    assert df['OBJECTID'].tolist() == list(range(1, 1235))
+    assert df['TIPO'].head(2).tolist() == ['Secundaria', 'Primaria']
+    # Los metadatos se pidieron una vez, al servicio completo, y quedaron en la caché compartida
+    assert [ruta for ruta, _ in servidor_arcgis.pedidos if not ruta.endswith('/query')] == \
+        ['/arcgis/rest/services/Prueba/FeatureServer/layers']
+    assert os.listdir(tmp_path / 'cache')
+
+
+def test_descarga_fallida_no_deja_csv_y_se_reintenta(servidor_arcgis, ingesta_local, tmp_path):
+    # El conteo y la primera página responden; la siguiente es un error permanente
+    servidor_arcgis.fallas = [None, None, '400']
+    ingesta.descargar_y_procesar(ingesta_local)
+    assert sorted(os.listdir(tmp_path)) == ['cache']
+
+    ingesta.descargar_y_procesar(ingesta_local)
+    df = pd.read_csv(tmp_path / 'Capa_prueba_decodificado.csv', encoding='utf-8-sig')
+    assert df['OBJECTID'].tolist() == list(range(1, servidor_arcgis.registros + 1))
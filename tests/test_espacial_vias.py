@@ -0,0 +1,25 @@
+import numpy as np
+
+from app.espacial_vias import RADIO_CERCANIA_KM, RADIO_MAXIMO_KM, clave_lugar, obtener_espacial, radio_de_consulta
+from app.indices_vias import distancias_km
+
+
+def test_radio_de_consulta():
+    assert radio_de_consulta('necesidades a 5,5 km de jardin') == 5.5
+    assert radio_de_consulta('vias a 20 kilometros') == 20.0
+    assert radio_de_consulta('vias a 900 km') == RADIO_MAXIMO_KM
+    assert radio_de_consulta('cerca de turbo') == RADIO_CERCANIA_KM
+    assert clave_lugar('Don Matías') == clave_lugar('Donmatías')
+
+
+def test_cercanas_a_varios_puntos_usa_la_menor_distancia():
+    espacial = obtener_espacial()
+    assert obtener_espacial() is espacial
+    puntos = list(espacial.centros.values())[:3]
+    filas, distancias = espacial.cercanas(puntos, 10.0)
+
+    indice = espacial.indice
+    todas = np.min([distancias_km(lon, lat, indice.lons, indice.lats) for lon, lat in puntos], axis=0)
+    cerca = todas <= 10.0
+    assert sorted(filas.tolist()) == sorted(indice.filas[cerca].tolist())
+    assert np.all(np.diff(distancias) >= 0) and np.all(distancias <= 10.0)
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.estadisticas_vias import CuboEstadisticas, ResumenDinero, obtener_cubo
+from app.tablas_vias import registro_tablas, agregar_columnas_normalizadas
+
+
+def test_cubo_cuenta_y_suma_por_ambito():
+    df = agregar_columnas_normalizadas(pd.DataFrame({
+        'MUNICIPIO': ['Jardín', 'Jardín', 'Turbo', None],
+        'SUBREGION': ['Suroeste', 'Suroeste', 'Urabá', 'Urabá'],
+        'APORTE GOB': [100.0, 100.0, np.nan, 50.0],
+        'VALOR NECESIDAD SIF': ['$1,000.00', '$2,500.50', None, '$0'],
+    }))
+    cubo = CuboEstadisticas()
+    cubo.agregar_tabla('necesidades', df)
+
+    assert cubo.conteo('necesidades', 'global') == 4
+    assert cubo.conteo('necesidades', 'municipio', 'jardin') == 2
+    assert cubo.conteo('necesidades', 'subregion', 'uraba') == 2
+    assert cubo.conteo('necesidades', 'municipio', 'andes') == 0
+
+    aporte = cubo.dinero('necesidades', 'municipio', 'jardin', 'APORTE GOB')
+    assert (aporte.total, aporte.positivos, aporte.valor_unico, aporte.es_repetido) == (200.0, 2, 100.0, True)
+    assert cubo.dinero('necesidades', 'global', '', 'VALOR NECESIDAD SIF').total == 3500.5
+    assert cubo.dinero('necesidades', 'subregion', 'uraba', 'APORTE GOB').total == 50.0
+    assert cubo.dinero('necesidades', 'municipio', 'andes', 'APORTE GOB').total == 0.0
+    assert cubo.dinero('necesidades', 'municipio', 'jardin', 'OTRA') is None
+
+
+def test_resumen_sin_valor_unico():
+    resumen = ResumenDinero(np.array([0.0, 5.0, 7.0]))
+    assert (resumen.total, resumen.positivos, resumen.valor_unico, resumen.es_repetido) == (12.0, 2, None, False)
+
+
+def test_cubo_coincide_con_filtrar_la_tabla():
+    cubo = obtener_cubo()
+    assert obtener_cubo() is cubo
+    df = registro_tablas.obtener('Base_Necesidades.csv')
+    por_municipio = df['MUNICIPIO_norm'].value_counts()
+    for lugar, conteo in por_municipio.head(10).items():
+        assert cubo.conteo('necesidades', 'municipio', lugar) == conteo
+        assert cubo.dinero('necesidades', 'municipio', lugar, 'APORTE GOB').total == \
+            pytest.approx(df.loc[df['MUNICIPIO_norm'] == lugar, 'APORTE GOB'].fillna(0).sum())
+    assert cubo.conteo('necesidades', 'global') == len(df)
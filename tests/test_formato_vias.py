@@ -0,0 +1,46 @@
+import pandas as pd
+
+from app.formato_vias import PlanFuente, formatear_fase, formatear_fecha, formatear_moneda, plan_fuente
+from test_tablas_vias import escribir, registro_en
+
+CSV = ('OBJECTID,NOMBRE_VIA,FASE PROYECTO,VALOR TOTAL,PORCENTAJE VALOR\n'
+       '1,Vía Ñ,2,1234.5,12.5\n'
+       '2,,7,,\n')
+
+
+def test_formateadores():
+    assert formatear_fase(3) == '3 (Factibilidad)'
+    assert formatear_fase(pd.NA) == 'No definida'
+    assert formatear_fecha(pd.Timestamp('2024-02-05 13:45')) == '2024-02-05'
+    assert formatear_moneda('$1,000') == '$1,000.00'
+    assert formatear_moneda('n/a') == 'n/a'
+
+
+def test_plan_muestra_solo_columnas_visibles_con_valor(tmp_path):
+    registro = registro_en(tmp_path)
+    escribir(tmp_path, 'Vias_prueba_decodificado.csv', CSV)
+    plan = PlanFuente(registro.obtener_tabla('Vias_prueba_decodificado.csv'))
+
+    assert plan.formatear(0, 0.5, [('Km', '3')]) == (
+        'FUENTE: Vias prueba (Relevancia: 0.50)\n'
+        '- Nombre Via: Vía Ñ\n'
+        '- Fase Proyecto: 2 (Prefactibilidad)\n'
+        '- Valor Total: $1,234.50\n'
+        '- Porcentaje Valor: 12.5\n'
+        '- Km: 3\n')
+    # Sin OBJECTID, sin columnas *_norm y sin valores vacíos
+    assert plan.formatear(1, 1) == 'FUENTE: Vias prueba (Relevancia: 1.00)\n- Fase Proyecto: 7\n'
+
+
+def test_plan_se_recompila_solo_si_cambia_la_tabla(tmp_path):
+    registro = registro_en(tmp_path)
+    escribir(tmp_path, 'Vias_prueba_decodificado.csv', CSV)
+    vieja = registro.obtener_tabla('Vias_prueba_decodificado.csv')
+    plan = plan_fuente(vieja, registro)
+    assert plan_fuente(vieja, registro) is plan
+
+    escribir(tmp_path, 'Vias_prueba_decodificado.csv', CSV + '3,Otra,1,5,\n')
+    nueva = registro.obtener_tabla('Vias_prueba_decodificado.csv')
+    assert plan_fuente(nueva, registro).tabla is nueva
+    # Una búsqueda hecha sobre la versión anterior se sigue mostrando con su propia tabla
+    assert plan_fuente(vieja, registro).tabla is vieja
@@ -0,0 +1,172 @@
+import difflib
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.indices_vias import (IndiceInvertido, IndiceSimilitud, IndiceClaves, Gazetteer, SelectorTopK,
+                              IndiceEspacial, subsecuencia_comun, normalizar_clave, claves_de_valor,
+                              primer_lugar, distancias_km)
+
+
+def lcs(a, b):
+    anterior = [0] * (len(b) + 1)
+    for x in a:
+        actual = [0]
+        for j, y in enumerate(b):
+            actual.append(anterior[j] + 1 if x == y else max(anterior[j + 1], actual[j]))
+        anterior = actual
+    return anterior[-1]
+
+
+def test_subsecuencia_comun_igual_a_programacion_dinamica():
+    random.seed(0)
+    valores = [''.join(random.choice('abc ') for _ in range(random.randint(0, 150))) for _ in range(40)]
+    alfabeto = {c: i for i, c in enumerate('abc ')}
+    caracteres = np.full((len(valores), 150), -1, dtype=np.int16)
+    for i, v in enumerate(valores):
+        caracteres[i, :len(v)] = [alfabeto[c] for c in v]
+    consulta = 'abcab cba acb'
+    obtenido = subsecuencia_comun([alfabeto[c] for c in consulta], caracteres)
+    assert obtenido.tolist() == [lcs(consulta, v) for v in valores]
+
+
+def test_similitudes_iguales_a_sequence_matcher():
+    random.seed(1)
+    palabras = ['via', 'la', 'ceja', 'vereda', 'el', 'carmen', 'abejorral', 'san', 'jose', 'rio']
+    valores = [' '.join(random.choices(palabras, k=random.randint(1, 12))) for _ in range(300)]
+    valores += [None, np.nan, '', 'la ceja ' * 20]
+    indice = IndiceSimilitud(np.array(valores, dtype=object))
+    for consulta in ['via la ceja', 'vereda el carmen', 'abejorral', 'x', 'la ceja ' * 19]:
+        filas, sims = indice.similitudes(consulta, 0.6)
+        esperado = {i: difflib.SequenceMatcher(None, consulta, v).ratio()
+                    for i, v in enumerate(valores) if isinstance(v, str)}
+        assert dict(zip(filas.tolist(), sims.tolist())) == {i: r for i, r in esperado.items() if r > 0.6}
+
+
+def test_top_k_ordena_por_similitud():
+    indice = IndiceSimilitud(np.array(['la ceja', 'la vega', 'la ceja del tambo', None], dtype=object))
+    assert [fila for fila, _ in indice.top_k('la ceja', k=2)] == [0, 1]
+
+
+def test_caches_de_los_indices_entre_hilos():
+    # Cachés chicas para que los hilos las llenen y vacíen a la vez
+    random.seed(2)
+    palabras = ['via', 'la', 'ceja', 'vereda', 'el', 'carmen', 'abejorral', 'san', 'jose', 'rio']
+    valores = np.array([' '.join(random.choices(palabras, k=random.randint(1, 6))) for _ in range(500)],
+                       dtype=object)
+    consultas = ['via la ceja', 'vereda el carmen', 'abejorral', 'san jose', 'rio', 'el carmen']
+    esperado = {c: (IndiceSimilitud(valores).filas_sobre(c, 0.6).tolist(),
+                    IndiceInvertido([valores]).filas_con_palabra(c.split()[0]).tolist()) for c in consultas}
+
+    similitud = IndiceSimilitud(valores, max_cache=2)
+    invertido = IndiceInvertido([valores], max_cache=2)
+
+    def buscar(i):
+        consulta = consultas[i % len(consultas)]
+        return consulta, (similitud.filas_sobre(consulta, 0.6).tolist(),
+                          invertido.filas_con_palabra(consulta.split()[0]).tolist())
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for consulta, obtenido in pool.map(buscar, range(400)):
+            assert obtenido == esperado[consulta]
+
+
+def test_indice_invertido_igual_a_recorrer_la_tabla():
+    random.seed(3)
+    palabras = ['via', 'la', 'ceja', 'vereda', 'el', 'carmen', 'abejorral', 'san', 'jose', 'rio', 'sanjose']
+    campos = [[' '.join(random.choices(palabras, k=random.randint(1, 4))) if random.random() > 0.1 else None
+               for _ in range(300)] for _ in range(2)]
+    indice = IndiceInvertido(campos)
+    for consulta in ['via la ceja', 'san jose del rio', 'vere', 'carmen abejorral', 'nada']:
+        palabras_clave = [p for p in consulta.split() if len(p) > 2]
+        esperado = [fila for fila in range(300)
+                    if any(isinstance(campo[fila], str)
+                           and (any(p in campo[fila] for p in palabras_clave) or campo[fila] in consulta)
+                           for campo in campos)]
+        assert indice.candidatos(palabras_clave, consulta).tolist() == esperado
+
+
+def test_claves_normalizadas():
+    assert normalizar_clave(2024010048235.0) == '2024010048235'
+    assert normalizar_clave(' RAD-12.0? ') == 'rad-12.0'
+    assert normalizar_clave('2024.0') == '2024'
+    assert normalizar_clave(float('nan')) == ''
+    assert claves_de_valor('2024010048235, 2024010111694; X-1') == ['2024010048235', '2024010111694', 'x-1']
+    assert claves_de_valor(None) == []
+
+
+def test_indice_de_claves_por_columna():
+    indice = IndiceClaves({'RADICADO': np.array([2024010048235.0, None, 7], dtype=object),
+                           'RADICADOS ASOCIADOS': np.array(['7 2024010048235', '8', None], dtype=object)})
+    assert {c: f.tolist() for c, f in indice.buscar('2024010048235').items()} == \
+        {'RADICADO': [0], 'RADICADOS ASOCIADOS': [0]}
+    assert {c: f.tolist() for c, f in indice.buscar('7').items()} == {'RADICADO': [2], 'RADICADOS ASOCIADOS': [0]}
+    assert indice.buscar('9') == {}
+
+
+def test_gazetteer_coincidencia_mas_larga_y_palabras_completas():
+    gazetteer = Gazetteer()
+    gazetteer.agregar('subregion', 'Urabá', 'uraba')
+    gazetteer.agregar('municipio', 'San Pedro de Urabá', 'san pedro de uraba')
+    gazetteer.agregar('municipio', 'Andes', 'andes')
+    gazetteer.agregar('vereda', 'El Carmen', 'el carmen', 'Andes')
+    gazetteer.agregar('vereda', 'El Carmen', 'el carmen', 'Jardín')
+
+    entidades = gazetteer.buscar('vias en san pedro de uraba y grandes puentes de uraba')
+    assert [(e.tipo, e.nombre) for e in entidades] == [('municipio', 'San Pedro de Urabá'), ('subregion', 'Urabá')]
+    assert primer_lugar(entidades, 'subregion').inicio == len('vias en san pedro de uraba y grandes puentes de ')
+
+    vereda, = gazetteer.buscar('vereda el carmen')
+    assert vereda.municipios == ('Andes', 'Jardín')
+    assert gazetteer.buscar('andesito') == []
+
+
+def test_gazetteer_municipio_antes_que_vereda_con_el_mismo_nombre():
+    gazetteer = Gazetteer()
+    gazetteer.agregar('vereda', 'Jardín', 'jardin', 'Andes')
+    gazetteer.agregar('municipio', 'Jardín', 'jardin')
+    assert [e.tipo for e in gazetteer.buscar('jardin')] == ['municipio']
+
+
+def test_selector_top_k_igual_a_ordenar_todo():
+    random.seed(4)
+    ofrecidos = [(random.choice([1.0, 2.0, 2.5, 3.0, 7.0]), i) for i in range(200)]
+    selector = SelectorTopK(10)
+    assert selector.umbral() == float('-inf')
+    for score, i in ofrecidos:
+        selector.ofrecer(score, i)
+    # Orden estable: con scores iguales gana el que llegó primero
+    esperado = sorted(ofrecidos, key=lambda e: -e[0])[:10]
+    assert selector.mejores() == esperado
+    assert selector.umbral() == esperado[-1][0]
+
+
+def test_indice_espacial_igual_a_medir_todos_los_puntos():
+    rnd = np.random.default_rng(5)
+    lons = rnd.uniform(-77.2, -73.8, 3000)
+    lats = rnd.uniform(5.4, 8.9, 3000)
+    lons[::50] = np.nan
+    indice = IndiceEspacial(lons, lats)
+
+    for _ in range(40):
+        lon, lat = rnd.uniform(-77.2, -73.8), rnd.uniform(5.4, 8.9)
+        radio = rnd.choice([0.5, 5.0, 15.0, 100.0])
+        filas, distancias = indice.en_radio(lon, lat, radio)
+        todas = distancias_km(lon, lat, lons, lats)
+        esperadas = np.flatnonzero(todas <= radio)
+        assert sorted(filas.tolist()) == esperadas.tolist()
+        assert np.allclose(distancias, todas[filas]) and np.all(np.diff(distancias) >= 0)
+
+        caja = sorted(rnd.uniform(-77.2, -73.8, 2)) + sorted(rnd.uniform(5.4, 8.9, 2))
+        lon_min, lon_max, lat_min, lat_max = caja
+        dentro = (lons >= lon_min) & (lons <= lon_max) & (lats >= lat_min) & (lats <= lat_max)
+        assert indice.en_caja(lon_min, lat_min, lon_max, lat_max).tolist() == np.flatnonzero(dentro).tolist()
+
+
+def test_indice_espacial_incluye_el_borde_norte_del_radio():
+    # Justo dentro del radio, al norte y al este del punto de consulta
+    lats = [6.2 + 10 / 111.2, 6.2]
+    lons = [-75.5, -75.5 + 10 / (111.2 * np.cos(np.radians(6.2)))]
+    filas, distancias = IndiceEspacial(lons, lats).en_radio(-75.5, 6.2, 10.0)
+    assert sorted(filas.tolist()) == [0, 1] and np.all(distancias <= 10.0)
@@ -0,0 +1,39 @@
+from app.intenciones_vias import clasificar_consulta, despachar, rasgos_de
+from app.tablas_vias import registro_tablas
+
+
+def clasificar(consulta):
+    return clasificar_consulta(consulta, registro_tablas.gazetteer())
+
+
+def test_estadistica_de_dinero_por_municipio():
+    intencion = clasificar('¿Cuánto es el aporte de la Gobernación a las necesidades de Jardín?')
+    assert intencion.estadistica and not intencion.listado
+    assert intencion.metrica == 'aporte'
+    assert intencion.entidades == {'necesidad'}
+    assert (intencion.ambito, intencion.lugar.norm) == ('municipio', 'jardin')
+
+
+def test_listado_por_subregion_y_palabras_clave():
+    intencion = clasificar('Dame los radicados del Oriente')
+    assert intencion.listado and not intencion.estadistica
+    assert (intencion.ambito, intencion.lugar.norm) == ('subregion', 'oriente')
+    assert intencion.palabras_clave == ['radicados', 'oriente']
+
+
+def test_cercania_a_una_vereda_sin_municipio():
+    intencion = clasificar('necesidades cerca de la vereda el carmen')
+    assert intencion.cercania and intencion.ambito == 'global'
+    assert intencion.vereda is not None and intencion.vereda.norm == 'el carmen'
+
+
+def test_consulta_ya_normalizada():
+    gazetteer = registro_tablas.gazetteer()
+    assert clasificar_consulta('ignorada', gazetteer, 'vias en turbo') == clasificar('Vías en Turbo')
+
+
+def test_rasgos_y_despacho_por_prioridad():
+    assert rasgos_de('cuantas vias y proyectos') == {'estadistica', 'via', 'proyecto'}
+    manejadores = [('necesidad', 'n'), ('proyecto', 'p'), ('via', 'v')]
+    assert despachar(manejadores, clasificar('cuantas vias y proyectos')) == 'p'
+    assert despachar(manejadores, clasificar('hola')) is None
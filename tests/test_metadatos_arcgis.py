@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from metadatos_arcgis import ClienteArcGIS, ErrorArcGIS, dominios_codificados, separar_url_capa
+
+
+def pedidos_a(servidor, sufijo):
+    return [ruta for ruta, _ in servidor.pedidos if ruta.endswith(sufijo)]
+
+
+def test_separar_url_capa():
+    assert separar_url_capa('https://x/arcgis/rest/services/R10/FeatureServer/2/') == \
+        ('https://x/arcgis/rest/services/R10/FeatureServer', 2)
+    assert separar_url_capa('https://x/otra/cosa') == (None, None)
+
+
+def test_metadatos_de_la_capa_salen_del_servicio_y_de_la_cache(servidor_arcgis, tmp_path):
+    cliente = ClienteArcGIS(carpeta=str(tmp_path), ttl=3600)
+    metadatos = cliente.metadatos_capa(servidor_arcgis.url_capa)
+    assert metadatos['objectIdField'] == 'OBJECTID'
+    assert dominios_codificados(metadatos) == {'TIPO': {1: 'Primaria', 2: 'Secundaria'}}
+    assert cliente.nombre_capa(servidor_arcgis.url_capa) == 'Capa prueba'
+
+    # Otro cliente (otro script) con la misma carpeta no vuelve a consultar
+    otro = ClienteArcGIS(carpeta=str(tmp_path), ttl=3600)
+    assert otro.metadatos_capa(servidor_arcgis.url_capa) == metadatos
+    assert len(pedidos_a(servidor_arcgis, '/layers')) == 1
+    assert not pedidos_a(servidor_arcgis, '/0')
+
+
+def test_vencida_se_revalida_con_etag(servidor_arcgis, tmp_path):
+    cliente = ClienteArcGIS(carpeta=str(tmp_path), ttl=0)
+    primero = cliente.metadatos_capa(servidor_arcgis.url_capa)
+    assert cliente.metadatos_capa(servidor_arcgis.url_capa) == primero
+    assert len(pedidos_a(servidor_arcgis, '/layers')) == 2
+
+    # Si el servidor cambia (otro ETag) se usa la respuesta nueva
+    servidor_arcgis.etag = '"v2"'
+    servidor_arcgis.max_record_count = 500
+    assert cliente.metadatos_capa(servidor_arcgis.url_capa)['maxRecordCount'] == 500
+
+
+def test_sin_servidor_usa_la_copia_vencida(servidor_arcgis, tmp_path):
+    cliente = ClienteArcGIS(carpeta=str(tmp_path), ttl=0, timeout=2)
+    metadatos = cliente.metadatos_capa(servidor_arcgis.url_capa)
+    servidor_arcgis.cerrar()
+    assert cliente.metadatos_capa(servidor_arcgis.url_capa) == metadatos
+
+
+def test_error_de_arcgis(servidor_arcgis, tmp_path):
+    cliente = ClienteArcGIS(carpeta=str(tmp_path))
+    with pytest.raises(ErrorArcGIS):
+        cliente.obtener_json(servidor_arcgis.url_servicio + '/9')
+
+
+def test_pedidos_simultaneos_consultan_una_vez(servidor_arcgis, tmp_path):
+    cliente = ClienteArcGIS(carpeta=str(tmp_path), ttl=3600)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        metadatos = list(pool.map(lambda _: cliente.metadatos_capa(servidor_arcgis.url_capa), range(16)))
+    assert all(m == metadatos[0] for m in metadatos)
+    assert len(pedidos_a(servidor_arcgis, '/layers')) == 1
@@ -0,0 +1,52 @@
+from app.paginacion_vias import SesionListados, es_continuacion, tamano_pedido
+from app import rag
+
+
+class ListadoFalso:
+    def __init__(self, total):
+        self.total = total
+
+    def pagina(self, inicio, tamano):
+        return (inicio, min(inicio + tamano, self.total))
+
+
+def test_es_continuacion():
+    assert es_continuacion('ver mas')
+    assert es_continuacion('dame 20 mas')
+    assert es_continuacion('siguientes radicados')
+    assert not es_continuacion('mas vias en amalfi')
+    assert not es_continuacion('radicados de amalfi')
+
+
+def test_tamano_pedido():
+    assert tamano_pedido('dame 20 mas') == 20
+    assert tamano_pedido('dame 5000 mas') == 100
+    assert tamano_pedido('ver mas') is None
+
+
+def test_sesion_recorre_el_ultimo_listado():
+    sesion = SesionListados(tamano_pagina=10)
+    sesion.abrir(ListadoFalso(25), mostradas=10)
+    assert sesion.siguiente() == (10, 20)
+    assert sesion.siguiente(tamano=3) == (20, 23)
+    assert sesion.siguiente() == (23, 25)
+    assert sesion.siguiente() is None
+
+
+def test_sesion_descarta_los_cursores_viejos():
+    sesion = SesionListados(max_cursores=2)
+    viejo = sesion.abrir(ListadoFalso(50), 10)
+    sesion.abrir(ListadoFalso(50), 10)
+    sesion.abrir(ListadoFalso(50), 10)
+    assert sesion.siguiente(viejo) is None
+    assert sesion.siguiente() == (10, 20)
+
+
+def test_ver_mas_en_buscar_datos_vias():
+    sesion = SesionListados()
+    # Turbo tiene 22 radicados: páginas de 10, 10 y 2
+    primera = rag.buscar_datos_vias("cuales radicados tiene Turbo", sesion=sesion)
+    assert "LISTADO DE RADICADOS PARA TURBO:" in primera
+    assert "(11-20 de 22)" in rag.buscar_datos_vias("ver más", sesion=sesion)
+    assert "(21-22 de 22)" in rag.buscar_datos_vias("siguientes", sesion=sesion)
+    assert "Ya se mostraron" in rag.buscar_datos_vias("ver más", sesion=sesion)
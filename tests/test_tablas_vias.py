@@ -0,0 +1,145 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from app import tablas_vias
+from app.cache_vias import CacheTablas
+from app.tablas_vias import RegistroTablas
+
+
+def registro_en(tmp_path):
+    (tmp_path / 'datos').mkdir(exist_ok=True)
+    return RegistroTablas(str(tmp_path / 'datos'), cache=CacheTablas(str(tmp_path / 'cache')))
+
+
+def escribir(tmp_path, nombre, texto):
+    (tmp_path / 'datos' / nombre).write_text(texto, encoding='utf-8')
+
+
+def test_registro_lee_cada_csv_una_vez(tmp_path, monkeypatch):
+    registro = registro_en(tmp_path)
+    escribir(tmp_path, 'Otra.csv', 'MUNICIPIO,VALOR\nTurbo,1\nJardín,2\n')
+    lecturas = []
+    cargar = tablas_vias.cargar_tabla
+    monkeypatch.setattr(tablas_vias, 'cargar_tabla', lambda ruta: lecturas.append(ruta) or cargar(ruta))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        tablas = list(pool.map(lambda _: registro.obtener_tabla('Otra.csv'), range(16)))
+    assert len(lecturas) == 1
+    assert all(t is tablas[0] for t in tablas)
+    assert registro.obtener('Otra.csv') is tablas[0].df
+    assert registro.archivos() == ['Otra.csv']
+
+
+def test_registro_recarga_si_cambia_el_csv(tmp_path):
+    registro = registro_en(tmp_path)
+    escribir(tmp_path, 'Otra.csv', 'MUNICIPIO,VALOR\nTurbo,1\n')
+    primera = registro.obtener_tabla('Otra.csv')
+    version = registro.version_datos()
+
+    escribir(tmp_path, 'Otra.csv', 'MUNICIPIO,VALOR\nTurbo,1\nJardín,2\n')
+    segunda = registro.obtener_tabla('Otra.csv')
+    assert segunda is not primera and len(segunda.df) == 2
+    assert registro.version_datos() != version
+
+    (tmp_path / 'datos' / 'Otra.csv').unlink()
+    assert registro.obtener_tabla('Otra.csv') is None
+    assert registro.obtener_tabla('No_existe.csv') is None
+
+
+def test_derivado_se_reconstruye_con_sus_archivos(tmp_path):
+    registro = registro_en(tmp_path)
+    escribir(tmp_path, 'Otra.csv', 'MUNICIPIO\nTurbo\n')
+    construcciones = []
+
+    def construir(tabla):
+        construcciones.append(tabla)
+        return len(tabla.df)
+
+    assert registro.derivado('filas', ['Otra.csv'], construir) == 1
+    assert registro.derivado('filas', ['Otra.csv'], construir) == 1
+    escribir(tmp_path, 'Otra.csv', 'MUNICIPIO\nTurbo\nJardín\n')
+    assert registro.derivado('filas', ['Otra.csv'], construir) == 2
+    assert len(construcciones) == 2
+
+
+def test_normalize_quita_tildes_y_mayusculas():
+    assert tablas_vias.normalize('  Vía al CARMEN de Víboral ') == 'via al carmen de viboral'
+    assert tablas_vias.normalize('Peñol') == 'penol'
+    assert tablas_vias.normalize(12) == '12'
+
+
+def test_columnas_sombra_normalizadas():
+    df = pd.DataFrame({'MUNICIPIO': ['Jardín', None, 'Jardín'], 'NOMBRE_VIA': ['Vía Ñ', 'x', None],
+                       'VALOR': [1, 2, 3]})
+    df = tablas_vias.agregar_columnas_normalizadas(df)
+    assert df['MUNICIPIO_norm'].tolist()[::2] == ['jardin', 'jardin']
+    assert pd.isna(df['MUNICIPIO_norm'][1]) and pd.isna(df['NOMBRE_VIA_norm'][2])
+    assert df['NOMBRE_VIA_norm'][0] == 'via n'
+    assert 'VALOR_norm' not in df.columns
+
+
+def test_tabla_cargada_trae_sus_columnas_normalizadas():
+    tabla = tablas_vias.registro_tablas.obtener_tabla('Base_Necesidades.csv')
+    for col in tabla.columnas_busqueda():
+        esperado = [tablas_vias.normalize(v) if isinstance(v, str) else None for v in tabla.df[col].astype(object)]
+        obtenido = [v if isinstance(v, str) else None for v in tabla.valores_norm(col)]
+        assert obtenido == esperado
+
+
+def test_gazetteer_de_los_datos():
+    gazetteer = tablas_vias.registro_tablas.gazetteer()
+    assert gazetteer is tablas_vias.registro_tablas.gazetteer()
+    tipos = {e.norm: e.tipo for e in gazetteer.buscar('vias de el carmen de viboral en el oriente')}
+    assert tipos == {'el carmen de viboral': 'municipio', 'oriente': 'subregion'}
+
+
+def test_conversores_del_esquema():
+    assert tablas_vias.a_dinero(pd.Series(['$1,234.50', None, 'n/a', '7'])).tolist()[::3] == [1234.5, 7.0]
+    assert tablas_vias.a_dinero(pd.Series(['n/a'])).isna().all()
+    assert tablas_vias.a_numero(pd.Series(['6,439195', '-75.5', None])).tolist()[:2] == [6.439195, -75.5]
+    assert tablas_vias.a_entero(pd.Series([2024010048235.0, 3.5, None, '12'])).tolist() == \
+        [2024010048235, pd.NA, pd.NA, 12]
+    fechas = tablas_vias.a_fecha(pd.Series(['2024-02-05 00:00:00', '20/02/2025', 'mañana', None]))
+    assert fechas.dt.strftime('%Y-%m-%d').tolist()[:2] == ['2024-02-05', '2025-02-20']
+    assert fechas[2:].isna().all()
+
+
+def test_tablas_cargadas_con_tipos_nativos():
+    df = tablas_vias.registro_tablas.obtener('Base_Necesidades.csv')
+    # Enteros con vacíos (compactar los achica, p. ej. Int64 -> Int16)
+    assert df['ID_NECESIDAD'].dtype.name.startswith('Int') and df['FASE PROYECTO'].dtype.name == 'Int8'
+    assert df['VALOR NECESIDAD SIF'].dtype == 'float64'
+    assert pd.api.types.is_datetime64_any_dtype(df['FECHA RECEPCION NECESIDAD'])
+    assert pd.api.types.is_float_dtype(df['LATITUD'])
+
+
+def test_compactar_no_pierde_valores():
+    df = pd.DataFrame({
+        'OBJECTID': [1, 2, 3, 4],
+        'SUBREGION': ['Oriente', 'Oriente', 'Urabá', 'Oriente'],
+        'NOMBRE': ['a', 'b', 'c', 'd'],
+        'ID': pd.array([1, None, 3, 4], dtype='Int64'),
+        'LONGITUD': [1.5, 2.25, None, 0.5],
+        'LATITUD': [6.439195, 6.1, 6.2, 6.3],
+    })
+    compacta = tablas_vias.compactar(df.copy())
+
+    assert 'OBJECTID' not in compacta.columns
+    # Texto repetitivo como categoría; el texto casi único se queda como está
+    assert isinstance(compacta['SUBREGION'].dtype, pd.CategoricalDtype)
+    assert not isinstance(compacta['NOMBRE'].dtype, pd.CategoricalDtype)
+    assert compacta['ID'].dtype == 'Int8' and compacta['ID'].isna().tolist() == [False, True, False, False]
+    # float32 solo cuando todos los valores son exactos
+    assert compacta['LONGITUD'].dtype == 'float32' and compacta['LATITUD'].dtype == 'float64'
+    pd.testing.assert_frame_equal(compacta.astype(object), df.drop(columns='OBJECTID').astype(object),
+                                  check_dtype=False)
+
+
+def test_reporte_memoria(tmp_path):
+    registro = registro_en(tmp_path)
+    escribir(tmp_path, 'Otra.csv', 'MUNICIPIO,VALOR\nTurbo,1\nTurbo,2\nTurbo,3\n')
+    registro.obtener_tabla('Otra.csv')
+    reporte = registro.reporte_memoria()
+    assert reporte[['tabla', 'filas', 'columnas', 'categoricas']].values.tolist() == [['Otra.csv', 3, 3, 2]]
+    assert list(reporte.columns)[-1] == 'memoria_mb'
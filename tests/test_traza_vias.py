@@ -0,0 +1,54 @@
+import pytest
+
+from app import rag
+from app.cache_resultados import CacheResultados
+from app.traza_vias import SIN_TRAZA, TrazaBusqueda, quitar_observador, registrar_observador
+
+
+@pytest.fixture(autouse=True)
+def cache_vacia(monkeypatch):
+    monkeypatch.setattr(rag, 'cache_datos_vias', CacheResultados())
+
+
+def test_etapas_de_una_busqueda():
+    respuesta, traza = rag.buscar_datos_vias_con_traza('necesidades cerca de jardin')
+    assert respuesta == rag.buscar_datos_vias_sin_cache('necesidades cerca de jardin')
+    assert not traza.desde_cache and traza.segundos > 0
+
+    nombres = [e.nombre for e in traza.etapas]
+    assert nombres[:2] == ['carga', 'clasificacion'] and nombres[-1] == 'formato'
+    assert {'cercania', 'claves', 'puntuacion'} <= set(nombres)
+    # Una etapa de puntuación por tabla, que entre todas recorren las filas cargadas
+    puntuacion = [e for e in traza.etapas if e.nombre == 'puntuacion']
+    assert len({e.tabla for e in puntuacion}) == len(puntuacion)
+    assert sum(e.filas for e in puntuacion) == traza.etapas[0].filas
+    assert traza.etapas[-1].renderizadas > 0
+    assert list(traza.por_etapa()) == list(dict.fromkeys(nombres))
+    assert traza.como_dict()['etapas'][0]['nombre'] == 'carga'
+
+
+def test_respuesta_desde_la_cache_no_tiene_etapas():
+    primera, _ = rag.buscar_datos_vias_con_traza('vías en Abejorral')
+    segunda, traza = rag.buscar_datos_vias_con_traza('Vias en abejorral')
+    assert segunda == primera
+    assert traza.desde_cache and traza.etapas == []
+    assert '(caché)' in traza.resumen()
+
+
+def test_observador_recibe_la_traza_de_cada_busqueda():
+    recibidas = []
+    registrar_observador(recibidas.append)
+    try:
+        rag.buscar_datos_vias('proyectos en turbo')
+        rag.buscar_datos_vias('proyectos en turbo')
+    finally:
+        quitar_observador(recibidas.append)
+    assert [t.desde_cache for t in recibidas] == [False, True]
+    assert all(isinstance(t, TrazaBusqueda) for t in recibidas)
+
+
+def test_sin_traza_no_mide_nada():
+    with SIN_TRAZA.etapa('formato') as etapa:
+        etapa.renderizadas = 3
+    assert etapa.renderizadas == 0
+    SIN_TRAZA.agregar('puntuacion', 'x.csv', filas=1)